@@ -0,0 +1,150 @@
+#%% ===========================================================================
+# Importar librerías principales
+# =============================================================================
+from abc import ABC, abstractmethod   # Interfaz de los detectores
+import numpy as np                    # Operaciones matemáticas
+from scipy.signal import lfilter      # Promedio exponencial por bloques
+
+#%% ===========================================================================
+# Registro de detectores
+# =============================================================================
+# Nombre visible (combobox de la interfaz) -> clase del detector, en el orden
+# en que se registran
+DETECTORS = {}
+
+def register(cls):
+  """Decorador que añade un detector al registro con su nombre visible."""
+  DETECTORS[cls.name] = cls
+  return cls
+
+def create_detectors(n_channels=30):
+  """
+  Crea una instancia de cada detector registrado.
+  :param n_channels: Número de canales (sensores).
+  :return: Diccionario nombre -> detector.
+  """
+  return {name: cls(n_channels) for name, cls in DETECTORS.items()}
+
+class Detector(ABC):
+  """
+  Interfaz de los detectores. Cada detector recibe bloques (n, canales) en
+  orden, junto con las estadísticas de la ventana compartida (RollingStats)
+  ya actualizadas con el bloque, y devuelve qué canales dieron alarma.
+  """
+  name = ""                           # Nombre visible del detector
+
+  def __init__(self, n_channels=30):
+    """:param n_channels: Número de canales (sensores)."""
+    self.n_channels = n_channels      # Número de canales
+    self.reset()
+
+  def reset(self):
+    """Olvida el estado acumulado."""
+
+  @abstractmethod
+  def update(self, block, stats, threshold):
+    """
+    Procesa un bloque de muestras (cada detector debe definirlo).
+    :param block: Arreglo (n, canales) de muestras filtradas.
+    :param stats: RollingStats de la ventana, incluyendo el bloque.
+    :param threshold: Umbral de alarma (en unidades de los datos).
+    :return: Arreglo booleano (canales,) con los canales en alarma.
+    """
+
+#%% ===========================================================================
+# Detectores sobre la ventana móvil
+# =============================================================================
+@register
+class RMSDetector(Detector):
+  """Alarma si el máximo de la ventana supera su RMS más el umbral."""
+  name = "Algoritmo RMS"
+
+  def update(self, block, stats, threshold):
+    return stats.max > stats.rms + threshold
+
+@register
+class STDDetector(Detector):
+  """Alarma si una muestra supera la media de la ventana más k·σ."""
+  name = "Algoritmo STD"
+
+  def __init__(self, n_channels=30, k=6):
+    """:param k: Número de desviaciones estándar sobre la media."""
+    self.k = k                        # Desviaciones sobre la media
+    super().__init__(n_channels)
+
+  def update(self, block, stats, threshold):
+    limit = stats.mean + self.k * stats.std       # límite de cada canal
+    return (block > limit).any(axis=0)
+
+@register
+class CUSUMDetector(Detector):
+  """
+  CUSUM de dos lados respecto a la media de la ventana: acumula las
+  desviaciones que exceden una holgura y da alarma al superar el límite.
+  """
+  name = "Algoritmo CUSUM"
+
+  def __init__(self, n_channels=30, slack=0.25, limit=2.0):
+    """
+    :param slack: Holgura por muestra, como fracción del umbral.
+    :param limit: Límite de decisión, como múltiplo del umbral.
+    """
+    self.slack = slack                # Holgura relativa al umbral
+    self.limit = limit                # Límite relativo al umbral
+    super().__init__(n_channels)
+
+  def reset(self):
+    self.high = np.zeros(self.n_channels)   # suma acumulada positiva
+    self.low = np.zeros(self.n_channels)    # suma acumulada negativa
+
+  def update(self, block, stats, threshold):
+    deviation = block - stats.mean          # desviación de cada muestra
+    slack = self.slack * threshold
+    limit = self.limit * threshold
+    alarm = np.zeros(self.n_channels, dtype=bool)
+    for row in deviation:                   # recursión por muestra
+      self.high = np.maximum(0, self.high + row - slack)
+      self.low = np.maximum(0, self.low - row - slack)
+      hit = (self.high > limit) | (self.low > limit)
+      self.high[hit] = self.low[hit] = 0    # reiniciar tras la alarma
+      alarm |= hit
+    return alarm
+
+#%% ===========================================================================
+# Detectores con estado propio
+# =============================================================================
+@register
+class EWMADetector(Detector):
+  """Alarma si una muestra se aleja más que el umbral de su promedio EWMA."""
+  name = "Algoritmo EWMA"
+
+  def __init__(self, n_channels=30, alpha=0.05):
+    """:param alpha: Peso de la muestra nueva en el promedio."""
+    self.alpha = alpha                # Factor de suavizado
+    super().__init__(n_channels)
+
+  def reset(self):
+    self.zi = None                    # estado del filtro (1, canales)
+
+  def update(self, block, stats, threshold):
+    a = self.alpha
+    if self.zi is None:               # arrancar en la primera muestra
+      self.zi = (1 - a) * block[:1]
+    previous = self.zi / (1 - a)      # promedio antes del bloque
+    ewma, self.zi = lfilter([a], [1, a - 1], block, axis=0, zi=self.zi)
+    predicted = np.vstack((previous, ewma[:-1]))  # promedio previo a cada fila
+    return (np.abs(block - predicted) > threshold).any(axis=0)
+
+@register
+class RateDetector(Detector):
+  """Alarma si el cambio entre muestras consecutivas supera el umbral."""
+  name = "Algoritmo Derivada"
+
+  def reset(self):
+    self.last = None                  # última muestra del bloque anterior
+
+  def update(self, block, stats, threshold):
+    previous = block[:1] if self.last is None else self.last
+    steps = np.diff(block, axis=0, prepend=previous)  # cambios por muestra
+    self.last = block[-1:].copy()
+    return (np.abs(steps) > threshold).any(axis=0)
@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 from matplotlib.colors import LinearSegmentedColormap
 from matplotlib.colors import BoundaryNorm
 import numpy as np
+import time
+from layout import DEFAULT_LAYOUT   # Cuerpos y sensores de la herramienta
 
 import matplotlib as mpl
 
@@ -42,7 +44,7 @@ colors1 = [(0, (0, 0, 0)),
            (0.5, (0, 0.5, 0)),
           (1, (0, 1, 0))]     
 cmap1 = LinearSegmentedColormap.from_list('custom_cmap', colors1, N=2)
-labels = [f's{i+1}' for i in range(10)]
+labels = DEFAULT_LAYOUT.labels  # Etiquetas de la herramienta estándar
 label= 'Campo Magnético [kA/m]'
 
 colors2 = [(0, (0, 1, 0)),      # Green
@@ -57,77 +59,294 @@ cmap2 = LinearSegmentedColormap.from_list('custom_cmap', colors2,
 #%% ===========================================================================
 # Scan A
 # =============================================================================
-def ScanA_create(y_min, y_max, t_max):
+def create_body_axes(layout, figsize):
+  """
+  Figura con un eje por cuerpo; el cuerpo 1 queda abajo (ax[n - 1]).
+  layout: ToolLayout de la herramienta
+  figsize: Tamaño de la figura
+  """
+  fig, ax = plt.subplots(layout.n_bodies, 1, figsize=figsize, dpi=150,
+                         sharex=True, squeeze=False)
+  return fig, ax[:, 0]  # arreglo de ejes también con un solo cuerpo
+
+def ScanA_create(y_min, y_max, t_max, layout=DEFAULT_LAYOUT):
   """
   Crea la figura y los ejes para la visualización de Scan A.
   y_min: Valor mínimo en el eje y
   y_max: Valor máximo en el eje y
   t_max: Valor máximo en el eje x (tiempo)
+  layout: ToolLayout de la herramienta (un eje por cuerpo)
   """
-  fig, ax = plt.subplots(3, 1, figsize=(6, 4), dpi=150, sharex=True)
+  n = layout.n_bodies
+  fig, ax = create_body_axes(layout, (6, 4))
   fig.subplots_adjust(left=0.12, right=0.86, top=0.93, bottom=0.1, hspace=0.07)  
-  ax[2].set_xlabel("tiempo [s]")
-  for i in range(3):
-    ax[2-i].set_ylabel(f"Cuerpo {i+1}")
-    ax[2-i].set_ylim([y_min, y_max])
+  ax[n-1].set_xlabel("tiempo [s]")
+  for i in range(n):
+    ax[n-1-i].set_ylabel(f"Cuerpo {i+1}")
+    ax[n-1-i].set_ylim([y_min, y_max])
   ax[0].set_xlim([0, t_max])
-  ax[0].legend(labels, loc='upper right', bbox_to_anchor=(1.19, 0.5), ncol=1)
+  ax[0].legend(layout.labels, loc='upper right', bbox_to_anchor=(1.19, 0.5),
+               ncol=1)
   return fig, ax
 
-def ScanA_update(fig, ax, y_min, y_max, t_max, data, sampling_rate, auto_scale):
+#%% ===========================================================================
+# Historia de visualización
+# =============================================================================
+class DisplayHistory:
   """
-  Actualiza la figura y los ejes para la visualización de Scan A.
-  fig: Figura creada previamente
-  ax: Ejes creados previamente
-  y_min: Valor mínimo en el eje y
-  y_max: Valor máximo en el eje y  
-  t_max: Valor máximo en el eje x (tiempo)
-  data: Datos a visualizar
-  sampling_rate: Frecuencia de muestreo
-  auto_scale: Si es 1, se ajusta automáticamente el rango en y
+  Historia de capacidad fija para las gráficas. Cada fila se escribe en i e
+  i + capacidad de un buffer de doble largo, así la ventana de las últimas
+  filas siempre es una vista contigua: anexar no copia la historia completa
+  (como np.vstack) y no reserva memoria en cada cuadro.
   """
-  len_data = len(data)
-  t = np.linspace(0, len_data-1, num=len_data)/sampling_rate
-
-  y_min, y_max = sorted([y_min, y_max])
-
-  for i in range(3):
-    while ax[2-i].lines:
-      ax[2-i].lines[0].remove()
-    data_plot = data[:, i*10: (i+1)*10] # Seleccionar datos de un cuerpo
-    ax[2-i].plot(t, data_plot[:, ::-1]) # invertir señales para ajustar al label
-    ax[2-i].set_xlim([0, t.max()])
-    if auto_scale==1:
-      ax[2-i].set_ylim([data.min(), data.max()])
-    elif auto_scale==2:
-      ax[2-i].set_ylim([data_plot.min(), data_plot.max()])
-    else:
-      ax[2-i].set_ylim([y_min, y_max])
-  ax[0].legend(labels[::-1], loc='upper right', bbox_to_anchor=(1.19, 0.5),  ncol=1)
-  return fig, ax
+  def __init__(self, capacity, n_channels=30):
+    """
+    capacity: Filas que se conservan (muestras de la ventana de tiempo)
+    n_channels: Número de canales (sensores)
+    """
+    self.n_channels = n_channels
+    self.capacity = 0
+    self.count = 0                    # filas escritas en total
+    self.buffer = np.full((0, n_channels), np.nan)
+    self.resize(capacity)
+
+  def resize(self, capacity):
+    """Cambia la capacidad conservando las filas más recientes."""
+    capacity = max(1, int(capacity))
+    if capacity == self.capacity:
+      return
+    old = self.view().copy() if self.count else None
+    self.capacity = capacity
+    self.buffer = np.full((2 * capacity, self.n_channels), np.nan)
+    self.count = 0
+    if old is not None:
+      self.append(old)
+
+  def clear(self):
+    """Olvida todas las filas."""
+    self.buffer.fill(np.nan)
+    self.count = 0
+
+  def __len__(self):
+    return min(self.count, self.capacity)
+
+  def append(self, rows):
+    """
+    Añade filas al final de la historia.
+    rows: Arreglo (n, canales) en orden cronológico
+    """
+    rows = np.asarray(rows)
+    skipped = max(0, len(rows) - self.capacity)   # filas que no caben
+    rows = rows[skipped:]
+    if len(rows) == 0:
+      return
+    idx = (self.count + skipped + np.arange(len(rows))) % self.capacity
+    self.buffer[idx] = rows
+    self.buffer[idx + self.capacity] = rows       # copia espejo
+    self.count += skipped + len(rows)
+
+  def window(self):
+    """Vista (capacidad, canales): se llena desde el inicio y luego corre."""
+    head = self.count % self.capacity if self.count >= self.capacity else 0
+    return self.buffer[head:head + self.capacity]
+
+  def view(self):
+    """Vista (len, canales) de las filas escritas, de la más antigua a la última."""
+    return self.window()[:len(self)]
+
+#%% ===========================================================================
+# Renderizado con blitting
+# =============================================================================
+def autoscale(current, lo, hi, margin=0.05, shrink=0.5):
+  """
+  Límites con histéresis: se amplían si los datos salen del rango y se
+  reducen solo si ocupan menos de `shrink` del rango actual.
+  current: Límites actuales (min, max)
+  lo, hi: Mínimo y máximo de los datos
+  """
+  span = current[1] - current[0]
+  if lo >= current[0] and hi <= current[1] and (hi - lo) >= shrink * span:
+    return current            # los límites actuales siguen sirviendo
+  pad = max(hi - lo, 1e-6) * margin
+  return (lo - pad, hi + pad)
+
+def envelope(data, step, start=0):
+  """
+  Decimación para visualización: reduce cada canal a pares (mínimo, máximo)
+  por grupo de `step` muestras, de modo que los picos siguen visibles con
+  un número de puntos acotado por el ancho del lienzo. Los grupos se alinean
+  al índice absoluto de las muestras para que no oscilen al correr la ventana.
+  data: Arreglo (n, canales) en orden cronológico
+  step: Muestras por grupo (>= 1)
+  start: Índice absoluto de data[0]
+  return: (idx, env) con los índices relativos de cada punto (2 por grupo) y
+    el arreglo (2 * grupos, canales) alternando mínimo y máximo
+  """
+  first = -start % step                   # inicio del primer grupo completo
+  edges = np.arange(first, len(data), step)
+  if first:
+    edges = np.concatenate(([0], edges))  # grupo parcial al inicio
+  env = np.empty((2 * len(edges), data.shape[1]), dtype=data.dtype)
+  env[0::2] = np.fmin.reduceat(data, edges, axis=0)   # ignora los huecos
+  env[1::2] = np.fmax.reduceat(data, edges, axis=0)
+  return np.repeat(edges, 2), env
+
+class BlitRenderer:
+  """
+  Base de los gráficos con artistas persistentes: los artistas animados se
+  dibujan sobre el fondo estático guardado (blitting) y el dibujo completo
+  solo se hace cuando cambian los límites o la escala.
+  """
+  def __init__(self, fig, ax, canvas):
+    """
+    fig: Figura del gráfico
+    ax: Ejes de la figura (3 cuerpos)
+    canvas: Lienzo de la figura (FigureCanvasTkAgg)
+    """
+    self.fig, self.ax, self.canvas = fig, ax, canvas
+    self.artists = []                 # (eje, artista) animados
+    self.background = None            # fondo estático (sin los artistas)
+    self.cid = canvas.mpl_connect('draw_event', self.on_draw)
+
+  def on_draw(self, event):
+    """Guarda el fondo tras un dibujo completo y pinta los artistas encima."""
+    self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+    self.draw_artists()
+
+  def draw_artists(self):
+    """Dibuja los artistas animados sobre el lienzo."""
+    for ax, artist in self.artists:
+      ax.draw_artist(artist)
+
+  def disconnect(self):
+    """Desconecta el renderizador del lienzo."""
+    self.canvas.mpl_disconnect(self.cid)
+
+  def draw(self, full=False):
+    """
+    Dibuja el cuadro: completo si cambiaron los límites o no hay fondo, si
+    no restaura el fondo y redibuja solo los artistas de los ejes.
+    """
+    if full or self.background is None:
+      self.canvas.draw()                # on_draw guarda el fondo
+      self.canvas.blit(self.fig.bbox)
+      return
+    self.canvas.restore_region(self.background)
+    self.draw_artists()
+    for ax in self.ax:
+      self.canvas.blit(ax.bbox)
+
+class ScanARenderer(BlitRenderer):
+  """
+  Scan A con artistas persistentes: las líneas y la leyenda se crean una
+  sola vez y cada cuadro solo cambia sus datos (set_data). Si la ventana
+  tiene más muestras que dos por pixel del eje se dibuja su envolvente.
+  """
+  def __init__(self, fig, ax, canvas, layout=DEFAULT_LAYOUT):
+    """
+    fig: Figura creada con ScanA_create
+    ax: Ejes de la figura (uno por cuerpo)
+    canvas: Lienzo de la figura (FigureCanvasTkAgg)
+    layout: ToolLayout de la herramienta
+    """
+    super().__init__(fig, ax, canvas)
+    self.layout = layout
+    n = layout.n_bodies
+    self.lines = []             # líneas de cada cuerpo, último sensor al primero
+    for i in range(n):
+      self.lines.append(ax[n-1-i].plot(np.zeros((0, layout.n_sensors)),
+                                       animated=True))
+      self.artists += [(ax[n-1-i], line) for line in self.lines[i]]
+    ax[0].legend(layout.labels[::-1], loc='upper right',
+                 bbox_to_anchor=(1.19, 0.5), ncol=1)
+    self.ylims = [ax[n-1-i].get_ylim() for i in range(n)] # límites actuales
+    self.t_max = ax[0].get_xlim()[1]  # ventana de tiempo actual
+    self.t = np.zeros(0)              # eje de tiempo reutilizado
+
+  def set_data(self, data, sampling_rate, t_max, y_min, y_max, auto_scale,
+               start=0):
+    """
+    Actualiza las líneas y los límites sin dibujar.
+    data: Datos (n, canales) a visualizar o None para solo revisar los límites
+    sampling_rate: Frecuencia de muestreo
+    t_max: Ventana de tiempo [s]
+    y_min, y_max: Límites manuales del eje y
+    auto_scale: 1 escala común, 2 escala por cuerpo, 0 límites manuales
+    start: Índice absoluto de data[0] (alinea los grupos de la envolvente)
+    return: True si cambiaron los límites (requiere dibujo completo)
+    """
+    n = self.layout.n_bodies
+    changed = False
+    if t_max != self.t_max:             # cambió la ventana de tiempo
+      self.t_max = t_max
+      self.ax[0].set_xlim([0, t_max])
+      changed = True
+    if data is not None and len(data):
+      pixels = max(1, int(self.ax[0].bbox.width))     # ancho del eje
+      step = -(-int(t_max * sampling_rate) // pixels)  # muestras por pixel
+      if step > 1 and len(data) > 2 * pixels:         # envolvente min/max
+        idx, data = envelope(data, step, start)
+        t = idx / sampling_rate
+      else:
+        if len(self.t) < len(data):     # eje de tiempo para la ventana
+          self.t = np.arange(len(data)) / sampling_rate
+        t = self.t[:len(data)]
+      for i in range(n):
+        data_plot = data[:, self.layout.body_slice(i)][:, ::-1] # invertidos
+        for k, line in enumerate(self.lines[i]):
+          line.set_data(t, data_plot[:, k])
+    for i in range(n):
+      if auto_scale and data is not None and len(data):
+        block = data if auto_scale == 1 else data[:, self.layout.body_slice(i)]
+        lo, hi = np.nanmin(block), np.nanmax(block)   # sin los huecos
+        ylim = self.ylims[i] if np.isnan(lo) else autoscale(self.ylims[i], lo, hi)
+      elif auto_scale:
+        ylim = self.ylims[i]
+      else:
+        ylim = tuple(sorted([y_min, y_max]))
+      if ylim != self.ylims[i]:
+        self.ylims[i] = ylim
+        self.ax[n-1-i].set_ylim(ylim)
+        changed = True
+    return changed
+
+  def render(self, data, sampling_rate, t_max, y_min, y_max, auto_scale,
+             start=0):
+    """
+    Equivale a set_data seguido de draw; no dibuja si no hay cambios.
+    return: True si se dibujó
+    """
+    full = self.set_data(data, sampling_rate, t_max, y_min, y_max, auto_scale,
+                         start)
+    if full or data is not None:
+      self.draw(full)
+      return True
+    return False
 
 #%% ===========================================================================
 # Scan C
 # =============================================================================
-def ScanC_create(z_min, z_max, t_max):
+def ScanC_create(z_min, z_max, t_max, layout=DEFAULT_LAYOUT):
   """
   Crea la figura y los ejes para la visualización de Scan C.
   z_min: Valor mínimo en el eje z
   z_max: Valor máximo en el eje z
   t_max: Valor máximo en el eje x (tiempo)
+  layout: ToolLayout de la herramienta (un eje por cuerpo)
   """
-  n_y = 10     # Número de puntos en el eje y
-  y = np.linspace(1, 10, n_y)
-  fig, ax = plt.subplots(3, 1, figsize=(6, 4), dpi=150, sharex=True)
+  n = layout.n_bodies
+  n_y = layout.n_sensors     # Número de puntos en el eje y
+  y = np.linspace(1, n_y, n_y)
+  fig, ax = create_body_axes(layout, (6, 4))
   fig.subplots_adjust(left=0.10, right=1, top=0.98, bottom=0.10, 
     hspace=0.04)
-  ax[2].set_xlabel("tiempo [s]")
+  ax[n-1].set_xlabel("tiempo [s]")
   
-  for i in range(3):
-    ax[2 - i].set_ylabel(f"Cuerpo {i + 1}")
-    ax[2 - i].set_ylim([0.5, 10.5])
-    ax[2 - i].set_yticks(y)
-    ax[2 - i].set_yticklabels(labels)
+  for i in range(n):
+    ax[n-1 - i].set_ylabel(f"Cuerpo {i + 1}")
+    ax[n-1 - i].set_ylim([0.5, n_y + 0.5])
+    ax[n-1 - i].set_yticks(y)
+    ax[n-1 - i].set_yticklabels(layout.labels)
 
   # Crear un ScalarMappable para la colorbar
   norm = plt.Normalize(z_min, z_max)
@@ -152,104 +371,138 @@ def ScanC_create(z_min, z_max, t_max):
 
   return fig, ax
 
-def ScanC_update(fig, ax, z_min, z_max, t_max, data, sampling_rate, auto_scale):
+class ScanCRenderer(BlitRenderer):
   """
-  Actualiza la figura y los ejes para la visualización de Scan C.
-  fig: Figura creada previamente
-  ax: Ejes creados previamente
-  z_min: Valor mínimo en el eje z
-  z_max: Valor máximo en el eje z
-  t_max: Valor máximo en el eje x (tiempo)
-  data: Datos a visualizar
-  sampling_rate: Frecuencia de muestreo
-  auto_scale: Si es 1, se ajusta automáticamente el rango en z
+  Scan C con una imagen persistente (imshow) por cuerpo. Las muestras nuevas
+  se guardan en una DisplayHistory, cuya ventana siempre es una vista
+  contigua que se entrega a set_array sin copiar ni triangular.
   """
-  n_y = 10  # Filas fijas
-  y = np.linspace(1, 10, n_y)
-  M = int(t_max * sampling_rate)  # Columnas por cuerpo
-  cuerpos = 3
-  # Actualizar geometría temporal
-  len_data = len(data)
-  t = np.linspace(0, len_data-1, num=len_data)/sampling_rate
-  X, Y = np.meshgrid(t, y)
-
-  # Determinar límites globales
-  if auto_scale:
-    vmin, vmax = data.min(), data.max()
-  else:
-    vmin, vmax = sorted([z_min, z_max])
-
-  # Asegurar que haya al menos 2 valores distintos para evitar errores
-  if vmin == vmax:
-      vmax += 1e-6  # Pequeño incremento para evitar colapso
-
-  num_colors = 7  # Debe coincidir con N=7 del cmap2
-  boundaries = np.linspace(vmin, vmax, num=num_colors + 1)  # 8 límites para 7 colores
-  norm = BoundaryNorm(boundaries=boundaries, ncolors=num_colors)  # ncolors=7
+  def __init__(self, fig, ax, canvas, t_max, sampling_rate,
+               layout=DEFAULT_LAYOUT):
+    """
+    fig: Figura creada con ScanC_create
+    ax: Ejes de la figura (uno por cuerpo)
+    canvas: Lienzo de la figura (FigureCanvasTkAgg)
+    t_max: Ventana de tiempo [s]
+    sampling_rate: Frecuencia de muestreo
+    layout: ToolLayout de la herramienta
+    """
+    super().__init__(fig, ax, canvas)
+    self.layout = layout
+    self.sampling_rate = sampling_rate
+    self.norm = fig.sm.norm           # normalización de la colorbar
+    self.zlim = None                  # límites de la BoundaryNorm actual
+    self.images = []                  # imagen de cada cuerpo
+    n = layout.n_bodies
+    for i in range(n):
+      image = ax[n-1-i].imshow(np.full((layout.n_sensors, 1), np.nan),
+        cmap=cmap2, norm=self.norm, aspect='auto', origin='lower', alpha=0.9,
+        interpolation='nearest', animated=True)
+      self.images.append(image)
+      self.artists.append((ax[n-1-i], image))
+    self.t_max = None
+    self.history = DisplayHistory(t_max * sampling_rate,  # muestras visibles
+                                  layout.n_channels)
+    self.set_window(t_max)
 
-  # Ajustar datos si es necesario
-  data = data[:, :cuerpos*M]  # Truncar a máximo de columnas esperadas
-
-  # Lista para guardar los últimos mappables
-  mappables = []
-
-  for i in range(cuerpos): 
-    Z = data[:, i*n_y:(i+1)*n_y].T
-    
-    # Limpiar contornos anteriores
-    for coll in ax[2-i].collections:
-      coll.remove()
+  def set_window(self, t_max):
+    """Cambia la ventana de tiempo conservando las últimas muestras."""
+    self.t_max = t_max
+    self.history.resize(t_max * self.sampling_rate)
+    for image in self.images:
+      image.set_extent([0, t_max, 0.5, self.layout.n_sensors + 0.5])
+    self.ax[0].set_xlim([0, t_max])
+    self.update_images()
 
-    # Dibujar nuevos contornos
-    cs = ax[2-i].contourf(X, Y, Z, cmap=cmap2, alpha=0.9, norm=norm)
-    mappables.append(cs)  # Guardar referencia al último mappable
+  def update_images(self):
+    """Entrega la ventana actual (vista, sin copiar) a las imágenes."""
+    window = self.history.window()
+    for i, image in enumerate(self.images):
+      image.set_array(window[:, self.layout.body_slice(i)].T)
 
-  ax[0].set_xlim([0, t.max()])
+  def append(self, rows):
+    """
+    Añade muestras nuevas a la ventana.
+    rows: Arreglo (n, canales) en orden cronológico
+    """
+    self.history.append(rows)
+    self.update_images()
 
-  # Actualizar colorbar existente (sin crear/eliminar)
-  if hasattr(fig, 'sm'):
-    fig.sm.set_norm(norm)  # Actualizar la normalizacion
-    fig.cbar.update_normal(fig.sm)  # Actualizar la colorbar
+  def set_limits(self, z_min, z_max, auto_scale):
+    """
+    Ajusta la BoundaryNorm (7 colores) de las imágenes y la colorbar.
+    return: True si cambiaron los límites (requiere dibujo completo)
+    """
+    if auto_scale and len(self.history):
+      view = self.history.view()
+      lo, hi = np.nanmin(view), np.nanmax(view)
+      if np.isnan(lo):                # solo huecos
+        return False
+      zlim = autoscale(self.zlim, lo, hi) if self.zlim else (lo, hi)
+    elif auto_scale:
+      return False
+    else:
+      zlim = tuple(sorted([z_min, z_max]))
+    if zlim == self.zlim:
+      return False
+    self.zlim = zlim
+    vmin, vmax = zlim
+    if vmin == vmax:
+      vmax += 1e-6  # Pequeño incremento para evitar colapso
+    num_colors = 7  # Debe coincidir con N=7 del cmap2
+    boundaries = np.linspace(vmin, vmax, num=num_colors + 1)  # 8 límites
+    self.norm = BoundaryNorm(boundaries=boundaries, ncolors=num_colors)
+    for image in self.images:
+      image.set_norm(self.norm)
+    self.fig.sm.set_norm(self.norm)   # Actualizar la normalizacion
+    self.fig.cbar.update_normal(self.fig.sm)  # Actualizar la colorbar
+    return True
 
-  ## Limpiar colorbar anterior si existe
-  #if hasattr(fig, 'cbar_ax'):
-  #  fig.cbar_ax.clear()
-  #
-  #  # Crear nueva colorbar con los límites actualizados
-  #  #cbar_ax = fig.add_axes([0.87, 0.15, 0.03, 0.7])  # [left, bottom, width, height]
-  #  sm = plt.cm.ScalarMappable(cmap=cmap2, norm=norm)
-  #  sm.set_array([])  # No se necesita un array real, solo los límites de norm
-  #  cbar = fig.colorbar(sm, cax=fig.cbar_ax)
-  #  cbar.set_label(label)  # Usar la variable global label
-  
-  return fig, ax
+  def render(self, rows, t_max, z_min, z_max, auto_scale):
+    """
+    Añade las muestras nuevas y dibuja; no dibuja si no hay cambios.
+    rows: Arreglo (n, canales) de muestras nuevas o None
+    return: True si se dibujó
+    """
+    full = False
+    if t_max != self.t_max:           # cambió la ventana de tiempo
+      self.set_window(t_max)
+      full = True
+    if rows is not None:
+      self.append(rows)
+    full = self.set_limits(z_min, z_max, auto_scale) or full
+    if full or rows is not None:
+      self.draw(full)
+      return True
+    return False
 
 #%% ===========================================================================
 # Plot Alarma
 # =============================================================================
-def Alarm_create():
-  # Configuración de la figura y ejes
-  fig, ax = plt.subplots(3, 1, figsize=(1, 4), dpi=150, sharex=True)
+def Alarm_create(layout=DEFAULT_LAYOUT):
+  # Configuración de la figura y ejes (un eje por cuerpo)
+  fig, ax = create_body_axes(layout, (1, 4))
   fig.subplots_adjust(left=0.3, right=0.9, top=0.93, 
                             bottom=0.1, hspace=0.007)
 
   # Preparación de datos para pcolormesh (necesitan ser 2D)
   # Bordes en X (debe tener 1 elemento más que la dimensión de los datos)
+  n_y = layout.n_sensors  # Celdas verticales (una por sensor)
   x_edges = np.array([0.8, 1.2])  
-  y_edges = np.linspace(0.3, 10.8, 11)  # 11 bordes para 10 celdas verticales
+  y_edges = np.linspace(0.3, n_y + 0.8, n_y + 1)  # n + 1 bordes para n celdas
 
   X_alarm, Y_alarm = np.meshgrid(x_edges, y_edges)  # Crear mallas para pcolormesh
-  Z_alarm = np.array([[0],[0],[0],[0],[0],[0],[0],[0],[0],[0]])
+  Z_alarm = np.zeros((n_y, 1))
 
-  for i in range(3):
+  for i in range(layout.n_bodies):
     # Crear el gráfico de mapa de colores
     ax[i].pcolormesh(X_alarm, Y_alarm, Z_alarm, shading='flat', cmap=cmap1)
     
     # Configuración de ejes (similar al original)
     ax[i].set_ylabel(f"Cuerpo {i+1}")         # Nombrar ejes
-    ax[i].set_ylim([0.3, 10.8])               # Limites del eje y
-    ax[i].set_yticks(np.linspace(1, 10, 10))  # Ticks en el eje y
-    ax[i].set_yticklabels(labels, fontsize=8) # Etiquetas en el eje y
+    ax[i].set_ylim([0.3, n_y + 0.8])          # Limites del eje y
+    ax[i].set_yticks(np.linspace(1, n_y, n_y))  # Ticks en el eje y
+    ax[i].set_yticklabels(layout.labels, fontsize=8) # Etiquetas en el eje y
     ax[i].set_xlim([0.8, 1.2])                # Limites del eje x
     ax[i].set_xticks([1])                     # ticks en el eje x
     ax[i].set_xticklabels([])  # Etiquetas en el eje x
@@ -257,15 +510,92 @@ def Alarm_create():
   return fig, ax, X_alarm, Y_alarm  # Devolver fig, ax y mallas
 
 def Alarm_update(ax, X_alarm, Y_alarm, data):
-  """#Actualizar los 3 subplots de alarmas con nuevos datos"""
-  for i in range(3): # Recorrer los 3 subplots
+  """#Actualizar los subplots de alarmas (uno por cuerpo) con nuevos datos"""
+  n = len(data)
+  for i in range(n): # Recorrer los subplots
     # Limpiar solo el contenido del gráfico, no la configuración
-    for coll in ax[2-i].collections: # Recorrer los objetos del gráfico
+    for coll in ax[n-1-i].collections: # Recorrer los objetos del gráfico
       coll.remove()                   # Eliminar el objeto
     # Crear nuevo gráfico con datos aleatorios
-    ax[2-i].pcolormesh(X_alarm, Y_alarm, data[i],  shading='flat',cmap=cmap1)
+    ax[n-1-i].pcolormesh(X_alarm, Y_alarm, data[i],  shading='flat',cmap=cmap1)
   return ax       # Devolver ejes actualizados
 
+#%% ===========================================================================
+# Planificador de cuadros
+# =============================================================================
+class RenderScheduler:
+  """
+  Llama periódicamente a la función de cuadro con root.after. Si no hubo
+  nada que dibujar el cuadro no cuesta nada; si el dibujo excede el
+  presupuesto (una fracción del intervalo) baja la frecuencia de cuadros y
+  la recupera cuando el dibujo vuelve a ser rápido. Informa los fps logrados
+  y el tiempo de dibujo.
+  """
+  def __init__(self, root, render, fps=30, min_fps=5, budget=0.5,
+               report_every=10.0):
+    """
+    root: Ventana de Tk
+    render: Función de cuadro; devuelve True si dibujó
+    fps: Frecuencia de cuadros máxima
+    min_fps: Frecuencia de cuadros mínima
+    budget: Fracción del intervalo que puede ocupar el dibujo
+    report_every: Segundos entre reportes (0 para no reportar)
+    """
+    self.root, self.render = root, render
+    self.min_interval = 1 / fps         # intervalo a la frecuencia máxima
+    self.max_interval = 1 / min_fps     # intervalo a la frecuencia mínima
+    self.budget = budget                # fracción del intervalo para dibujar
+    self.report_every = report_every    # intervalo entre reportes
+    self.interval = self.min_interval   # intervalo actual [s]
+    self.draw_time = 0.0                # tiempo de dibujo promedio (EWMA) [s]
+    self.fps = 0.0                      # cuadros dibujados por segundo
+    self.job = None                     # llamada programada de Tk
+    self.frames = 0                     # cuadros dibujados desde el reporte
+    self.frame_time = 0.0               # tiempo de dibujo desde el reporte
+    self.last_report = time.perf_counter()
+
+  def start(self):
+    """Inicia los cuadros."""
+    if self.job is None:
+      self.job = self.root.after(0, self.tick)
+
+  def stop(self):
+    """Detiene los cuadros."""
+    if self.job is not None:
+      self.root.after_cancel(self.job)
+      self.job = None
+
+  def tick(self):
+    """Un cuadro: dibuja si hay cambios y programa el siguiente."""
+    start = time.perf_counter()
+    try:
+      drawn = self.render()
+    except Exception as e:
+      print(f"Error al dibujar: {e}")
+      drawn = False
+    now = time.perf_counter()
+    if drawn:                           # solo los cuadros dibujados cuentan
+      elapsed = now - start
+      self.frames += 1
+      self.frame_time += elapsed
+      self.draw_time += 0.2 * (elapsed - self.draw_time)
+      # intervalo en el que el dibujo ocupa a lo sumo el presupuesto
+      self.interval = min(self.max_interval,
+                          max(self.min_interval, self.draw_time / self.budget))
+    if self.report_every and now - self.last_report >= self.report_every:
+      self.report(now)
+    delay = max(1, int((self.interval - (now - start)) * 1000))
+    self.job = self.root.after(delay, self.tick)
+
+  def report(self, now):
+    """Calcula e imprime los fps y el tiempo de dibujo desde el último reporte."""
+    self.fps = self.frames / (now - self.last_report)
+    if self.frames:
+      print(f"Gráficos: {self.fps:.1f} fps, dibujo "
+            f"{self.frame_time / self.frames * 1000:.1f} ms, "
+            f"intervalo {self.interval * 1000:.0f} ms")
+    self.frames, self.frame_time, self.last_report = 0, 0.0, now
+
 #%% ===========================================================================
 # Verification function
 # =============================================================================
@@ -10,9 +10,12 @@ import numpy as np                  # Procesamiento numérico
 from tkinter import font, ttk       # Fonts and combobox
 # procesamiento de datos
 import multiprocessing
-from multiprocessing import Process, Queue, Event, Manager
+from multiprocessing import Process, Event
 from queue import Empty  # Para capturar la excepción en get(timeout=...)
-from objects import DataAdquisition, DataSaver, DataAlarm
+from objects import DataAdquisition, DataSaver, DataAlarm, SharedSampleRing
+from objects import AlarmControl, DisplayDecimator
+from detectors import DETECTORS  # Detectores de alarma registrados
+from layout import ToolLayout    # Cuerpos y sensores de la herramienta
 # Para ejecutar la conexión en un hilo separado
 import threading    # Para ejecutar la conexión en un hilo separado
 import time         # Para simular la búsqueda de conexión
@@ -25,7 +28,14 @@ from functions import *   # Importar todas las funciones de functions.py
 # ==========================================================================
 class MainInterFace:
   """Clase principal para la interfaz gráfica de usuario"""
-  def __init__(self, root):
+  def __init__(self, root, replay_path=None, replay_speed=1.0, layout=None):
+    """
+    :param root: Ventana principal.
+    :param replay_path: Grabación a reproducir en lugar de leer los puertos.
+    :param replay_speed: Múltiplo del tiempo real; 0 lo más rápido posible.
+    :param layout: ToolLayout de la herramienta (3 cuerpos x 10 sensores por 
+      defecto).
+    """
     # Initialize main window and configure fonts
     self.root = root                            # Ventana principal
     self.root.title("Adquisición de Datos MFL") # Título de la ventana
@@ -34,6 +44,7 @@ class MainInterFace:
     self.color_desable_letter = "#fc0000"
     self.root.configure(bg=self.color_frame)  # configurar color 
     self.setup_fonts()                          # Configurar fuentes
+    self.layout = layout or ToolLayout()        # Cuerpos y sensores
 
     # inicialización de colas, eventos y procesos
     self.queue_save = None        # Cola para guardar datos
@@ -42,18 +53,23 @@ class MainInterFace:
     self.stop_event = None        # Evento de parada
     self.data_adquisition = None  # Proceso de adquisición de datos
     self.data_saver = None        # Proceso de guardado de datos
-    self.data_plot = None         # Datos para graficar
+    self.renderer = None          # Renderizador de Scan A
     self.data_process = None      # Proceso de alarma de dat#e8ede8os
 
+    # Fuente de datos grabada (None para los puertos seriales)
+    self.replay_path = replay_path    # Grabación .mfl o .csv
+    self.replay_speed = replay_speed  # Velocidad de reproducción
+
     # banderas para ejecutar Procesos
     self.enable_save = Event()    # Activar/desactivar guardado
     self.enable_plot = Event()    # Activar/desactivar gráficos
     self.enable_process = Event() # Activar/desactivar alarma
 
-    # Memoria compartida para alarmas en multiproceso
-    self.manager = Manager()      # Variable compartida entre procesos
-    self.shared_alarms = self.manager.dict()  # Estatus alamra de los 30 sensores
-    self.shared_alarms.update({ i:np.array([[0]] * 10) for i in range(3) })              
+    # Memoria compartida para alarmas en multiproceso: umbral, detector,
+    # ventana y estatus de alarma de todos los sensores
+    self.alarm_control = AlarmControl(self.layout.n_channels, threshold=40.0,
+                                      window=20)
+    self.alarm_generation = -1    # Última generación dibujada
 
     # Initialize variables de los gráficos e interface
     self.time_scale = tk.IntVar(value=4)    # Ventana de tiempo inicial  
@@ -62,6 +78,7 @@ class MainInterFace:
     self.file_name = tk.StringVar(value="") # Nombre de archivo para guardar
     self.plot_type = tk.StringVar(value="Scan A") # Tipo de gráfico inicia
     self.alg_type = tk.StringVar(value="Algoritmo RMS") # Tipo de algoritmo
+    self.detector_counts = tk.StringVar(value="")   # Alarmas por detector
 
     # Initialize variables para desabilitar sensores
     self.disabled_bodies = [tk.StringVar(value="") for _ in range(10)]
@@ -76,23 +93,25 @@ class MainInterFace:
     #  Variables compartidas para la adquisición de datos  
     self.acquisition_active = multiprocessing.Value('b', False)  # booleana compartida
 
-    # Crear una variable compartida en el manager para el algoritmo
-    self.manager_namespace = self.manager.Namespace()
-    self.manager_namespace.algorithm = self.alg_type.get()
-
-    # Vincular el cambio en el combobox para actualizar la variable compartida
+    # Vincular el cambio en el combobox para actualizar el bloque compartido
     def update_shared_algorithm(*args):       #
-      self.manager_namespace.algorithm = self.alg_type.get()
+      self.alarm_control.algorithm = list(DETECTORS).index(self.alg_type.get())
     self.alg_type.trace_add("write", update_shared_algorithm)
+    update_shared_algorithm()
 
     # Configuraciones iniciales
     self.sampling_rate = 300      # Frecuencia de muestreo de los sensores
+    self.max_time = {"Scan A": 120, "Scan C": 60} # Ventana máxima [s]
+    self.display = DisplayDecimator(self.layout.n_channels, # Reducción del plot
+      self.sampling_rate, display_rate=100, mode="decimate")  # en la adquisición
+    self.data_plot = DisplayHistory(4 * self.display.rate,  # Datos para graficar
+      self.layout.n_channels)
     self.auto_scale = 1           # Autoescala activada por defecto
     self.hex_color = "#e8ede8"    # color default de botón desactivado
     
-    # Reemplazar la variable Tkinter con una compartida
-    self.alarm_threshold = multiprocessing.Value('d', 40.0)
+    # La variable Tkinter se copia al bloque de control compartido
     self.alarm_threshold_tk = tk.DoubleVar(value=40.0)  # Usar StringVar en lugar de DoubleVar
+    self.alarm_window_tk = tk.IntVar(value=20)          # Ventana de análisis [muestras]
     
     # Configuración inicial de la GUI
     self.create_frames()          # Crear estructura de la interfaz
@@ -103,8 +122,11 @@ class MainInterFace:
     self.create_image_display()   # Imagen estática
     self.create_disable_frame()  # Frame para desabilitar sensores
 
-    # Start the data acquisition and plot update
-    self.update_plot_real_time()  # Update every 100 ms for smooth real-time effect
+    # Cuadros de los gráficos a 30 fps como máximo, reduciendo la frecuencia
+    # si el dibujo no cabe en el presupuesto de tiempo
+    self.scheduler = RenderScheduler(self.root, self.update_plot_real_time,
+      fps=30)
+    self.scheduler.start()
 
   def setup_fonts(self):
     """Configura la fuente predeterminada para todos los widgets."""
@@ -114,7 +136,7 @@ class MainInterFace:
 
   def validate_time_scale(self, *args):
     """Valida el valor de time_scale y lo ajusta si es necesario."""
-    max_time = 10 if self.plot_type.get() == "Scan A" else 4
+    max_time = self.max_time[self.plot_type.get()]
     if self.time_scale.get() > max_time:
       self.time_scale.set(max_time)
 
@@ -186,6 +208,10 @@ class MainInterFace:
     # | |          Ventana               | |Min | |Min | |Max | |Max | |
     # | |          (col0-3)              | |(c2)| |(c3)| |(c4)| |(c5)| |
     # | +--------------------------------+ +----+ +----+ +----+ +----+ |
+    # | [Row 3]                                                      | |
+    # | +------------------------------------------------------------+ |
+    # | |          Label Alarmas por detector (cols 0-5)             | |
+    # | +------------------------------------------------------------+ |
     # +---------------------------------------------------+
     # Control para seleccionar el tipo de scan (grafico) a ser usado
     ttk.Combobox(self.plot_data_frame, textvariable=self.plot_type, 
@@ -193,8 +219,7 @@ class MainInterFace:
                     row=0, column=0, columnspan=2, padx=5)
     
     ttk.Combobox(self.plot_data_frame, textvariable=self.alg_type, 
-                  values=["Algoritmo RMS", #"Algoritmo STD"
-                          ], state="readonly").grid(
+                  values=list(DETECTORS), state="readonly").grid(
                     row=0, column=4, columnspan=2, padx=5)
 
     # Control de la ventana de tiempo
@@ -247,6 +272,13 @@ class MainInterFace:
       state=self.scale_widgets_state)   # Estado de la entrada
     self.entry_ymax.grid(row=2, column=5, padx=5)
 
+    # Alarmas acumuladas por cada detector (todos corren en paralelo)
+    tk.Label(
+      self.plot_data_frame, textvariable=self.detector_counts,
+      bg=self.color_frame, 
+      fg=self.color_frame_letter,
+      ).grid(row=3, column=0, columnspan=6, padx=5, sticky='ew')
+
   def create_control_buttons(self):
     """Crea los botones de control en el frame de control"""
     # -----------------------------------------------------
@@ -269,6 +301,11 @@ class MainInterFace:
     # | |Guardar | |Archivo | |        | | (cols 3-5)   | |
     # | | (col0) | |(col1-2)| |        | |              | |
     # | +--------+ +--------+ +--------+ +--------------+ |
+    # | [Row 3]                                         | |
+    # | +-----------------+ +--------+                    |
+    # | | Label Ventana   | | Entry  |                    |
+    # | | (cols 0-2)      | |Ventana |                    |
+    # | +-----------------+ +--------+                    |
     # +---------------------------------------------------+
     # Botón de Conección principal ---------------------------------------
     self.btn_conect = tk.Button(self.control_frame, 
@@ -326,6 +363,18 @@ class MainInterFace:
                                width=15, textvariable=self.file_name)
     self.save_entry.grid(row=2, column=3, pady=5, columnspan=3)
 
+    # Ventana de análisis de la alarma ------------------------------------------
+    self.label_window = tk.Label(self.control_frame, text="Ventana alarma", 
+                                 bg=self.color_frame, 
+                                 fg=self.color_frame_letter,
+                                )
+    self.label_window.grid(row=3, column=0, padx=5, columnspan=3)
+    self.entry_window = tk.Entry(self.control_frame, width=5, 
+                                 textvariable=self.alarm_window_tk)
+    self.alarm_window_tk.trace_add("write",   # Modificar la variable compartida
+                                   self.update_alarm_window)
+    self.entry_window.grid(row=3, column=3, padx=5, pady=5)
+
   def toggle_autoscale(self):
     """Activa o desactiva la autoescala del gráfico principal."""
     # Toggle autoscale for plot
@@ -354,9 +403,15 @@ class MainInterFace:
       # Cambiar a estado "Conectando" y deshabilitar botón
       self.btn_conect.config(text="Conectando", bg="yellow", state="disabled")
       # Crear nuevas colas y evento
-      self.queue_save = Queue()       # Cola para guardar datos
-      self.queue_plot = Queue()       # Cola para graficar datos
-      self.queue_process = Queue()    # Cola para alarma de datos  
+      # Anillos de memoria compartida (20 s de datos a 300 Hz)
+      n_channels = self.layout.n_channels     # Sensores de la herramienta
+      self.queue_save = SharedSampleRing(     # Datos crudos para guardar
+        n_channels, 6000, np.uint16, consumers=("saver",))
+      self.queue_plot = SharedSampleRing(     # Datos reducidos para graficar
+        n_channels, int(20 * self.display.rate), np.float32,
+        consumers=("plot",))
+      self.queue_process = SharedSampleRing(  # Datos filtrados para la alarma
+        n_channels, 6000, np.float32, consumers=("alarm",))
       self.stop_event = Event()       # Evento de parada
       self.enable_plot.set()          # Activar gráficos
       
@@ -369,7 +424,12 @@ class MainInterFace:
           enable_plot=self.enable_plot,       # Activar/desactivar gráficos
           enable_process=self.enable_process, # Activar/desactivar alarma
           enable_save=self.enable_save,       # Activar/desactivar guardado
-          acquisition_active=self.acquisition_active  # variable compartida
+          acquisition_active=self.acquisition_active, # variable compartida
+          replay_path=self.replay_path,       # Grabación a reproducir
+          replay_speed=self.replay_speed,     # Velocidad de reproducción
+          display=self.display,               # Reducción para el plot
+          layout=self.layout,                 # Cuerpos, sensores y trama
+          sampling_rate=self.sampling_rate,   # Grilla de tiempo común
       )
 
       # Iniciar procesos
@@ -393,6 +453,10 @@ class MainInterFace:
       if self.data_adquisition is not None:
           self.data_adquisition.join(timeout=1)
       
+      # Liberar la memoria compartida
+      for ring in (self.queue_save, self.queue_plot, self.queue_process):
+        ring.close()
+
       # Limpiar referencias
       self.data_adquisition = None    # Proceso de adquisición de datos
       self.data_saver = None          # Proceso de guardado de datos
@@ -409,21 +473,18 @@ class MainInterFace:
       self.data_process = DataAlarm(  # Proceso de alarma de datos
                                     self.queue_process,   # Cola para alarma de datos
                                     self.enable_process,  # Evento de inicio/parada
-                                    self.alarm_threshold, # Umbral de alarma
-                                    self.shared_alarms,    # Variable compartida
-                                    self.manager_namespace  # tipo de algoritmo
+                                    self.alarm_control,   # Umbral, algoritmo, ventana y alarmas
+                                    layout=self.layout,   # Sensores de la herramienta
                                     )
       self.data_process.start()     # Iniciar proceso de alarma de datos
       self.btn_conect.config(state="disable") # Deshabilitar el botón de desconexión
     else:
       self.btn_alarm.config(text="Alarma", bg=self.hex_color, fg="black")
-      self.enable_process.clear()       # Señala a DataSaver que debe salir
-      while not self.queue_process.empty():
-        self.queue_process.get_nowait()
       if self.data_process is not None: # Si el proceso existe
-        self.data_process.join(timeout=1)        # Espera a que finalice
+        self.data_process.stop(timeout=1) # Señalar, despertar y esperar
         self.data_process = None        # Limpiar referencia
-      #self.manager.shutdown()  # Cerrar el Manager al detener el proceso
+      self.enable_process.clear()       # Desactivar la fila de alarma
+      self.queue_process.seek_end("alarm")  # Descartar filas pendientes
       if self.btn_save.config('text')[-1] == "Guardar": # Si no esta guardando datos
         self.btn_conect.config(state="normal")   # Habilitar el botón de desconexión
 
@@ -433,16 +494,19 @@ class MainInterFace:
       self.btn_save.config(text="Guardando", bg="green", fg="white")  # Configurar botón
       self.enable_save.set()        # Activar proceso de guardado
       self.data_saver = DataSaver(self.queue_save,  # Proceso de guardado de datos
-        self.enable_save, name=str(self.file_name.get())  # Nombre de archivo
+        self.enable_save, name=str(self.file_name.get()),  # Nombre de archivo
+        metadata={"filter": self.data_adquisition.filters.describe()},
+        layout=self.layout,           # Columnas del archivo
+        sampling_rate=self.sampling_rate,   # Frecuencia de la grabación
       )
       self.data_saver.start()     # Iniciar proceso de guardado
       self.btn_conect.config(state="disable")  # Deshabilitar el botón de desconexión
     else:
       self.btn_save.config(text="Guardar", bg=self.hex_color, fg="black")
-      self.enable_save.clear()  # Señala a DataSaver que debe salir
       if self.data_saver is not None: # Si el proceso existe
-        self.data_saver.join()        # Espera a que finalice
+        self.data_saver.stop()        # Señalar, despertar y esperar
         self.data_saver = None        # Limpiar referencia
+      self.enable_save.clear()  # Desactivar la fila de guardado
       if self.btn_alarm.config('text')[-1] == "Alarma": # Si la alarma no esta activa
         self.btn_conect.config(state="normal")  # Habilitar el botón de desconexión
 
@@ -458,16 +522,26 @@ class MainInterFace:
     mag_max = verify_empty(self.mag_max, 3000)     # Obtener el límite superior
 
     # Obtener la ventana de tiempo, Configuración de la figura y ejes
-    self.fig, self.ax = create_plot(mag_min,  mag_max, time_scale)
+    self.fig, self.ax = create_plot(mag_min,  mag_max, time_scale, self.layout)
 
     self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_graf_frame)
+    # Artistas persistentes (líneas o imágenes) dibujados con blitting
+    if scan_type == "Scan A":
+      self.renderer = ScanARenderer(self.fig, self.ax, self.canvas,
+        self.layout)
+    else:
+      self.renderer = ScanCRenderer(self.fig, self.ax, self.canvas,
+        time_scale, self.display.rate, self.layout)
+      if len(self.data_plot):     # Continuar con la historia reciente
+        self.renderer.append(self.data_plot.view())
     self.canvas.draw()
     self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
 
   def create_plot_alarm(self):
     """Crea el gráfico de alarmas en el frame plot_graf_alarm"""
     # Configuración de la figura y ejes
-    self.fig2, self.ax2, self.X_alarm, self.Y_alarm = Alarm_create()
+    self.fig2, self.ax2, self.X_alarm, self.Y_alarm = Alarm_create(
+      self.layout)
 
     # Crear el gráfico de alarmas
     self.canvas2 = FigureCanvasTkAgg(self.fig2, master=self.plot_graf_alarm)
@@ -475,104 +549,126 @@ class MainInterFace:
     self.canvas2.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
 
   def update_plot_main(self):
-    """Actualiza el gráfico principal con los datos de la cola."""
+    """
+    Actualiza el gráfico principal con los datos de la cola.
+    :return: True si se dibujó un cuadro.
+    """
     # verificación de la escala de tiempo	
 
     time_scale = verify_empty(self.time_scale, 4)  # Obtener la escala de tiempo
     mag_min = verify_empty(self.mag_min, 2000)     # Obtener el límite inferior
     mag_max = verify_empty(self.mag_max, 3000)     # Obtener el límite superior
 
-    # Actualizar el gráfico principal con los datos de la cola
+    # Vaciar primero todo lo pendiente en el anillo
+    new_rows = []                   # Bloques llegados en este ciclo
     if self.queue_plot is not None: # Si hay datos en la cola
       while True:             # Mientras haya datos en la cola
         try:                # Intentar obtener datos de la cola 
-          data = self.queue_plot.get_nowait()   # Obtener datos de la cola
-          data_array = np.column_stack(         # Convertir datos a array
-              [np.array(data[key])[-10:] for key in sorted(data.keys())]
-          )
-          
-          # Calcular en numero e muestras en el eje del tiempo
-          max_samples = time_scale * self.sampling_rate
-
-          # determinar sensores a desabilitar - VERSIÓN MÁS EFICIENTE
-          disable_indices = set()
-          for body, sensor in zip(self.disabled_bodies, 
-                                  self.disabled_sensors):
-            body_val = body.get()       # nombre del cuerpo
-            sensor_val = sensor.get()   # nombre deln sensor
-            if body_val and sensor_val:  # si los dos existen
-              body_idx = int(body_val[1]) - 1       # B1->0, B2->1, B3->2
-              sensor_idx = int(sensor_val[1:]) - 1  # s1->0, s2->1, ..., s10->9
-              disable_indices.add(body_idx * 10 + sensor_idx)
-
-          #print("Sensores deshabilitados:", sorted(disable_indices))
-
-          # Reemplazar sensores deshabilitados por la media de los activos
-          if disable_indices:  # Solo si hay sensores deshabilitados
-            disable_indices_list = list(disable_indices)
-            # Crear máscara de sensores activos (no deshabilitados)
-            active_mask = np.ones(data_array.shape[1], dtype=bool)
-            active_mask[disable_indices_list] = False
-            
-            # Calcular media de sensores activos para cada fila
-            if np.any(active_mask):  # Verificar que hay al menos un sensor activo
-              active_mean = np.mean(data_array[:, active_mask], axis=1, keepdims=True)
-              # Reemplazar columnas deshabilitadas con la media
-              data_array[:, disable_indices_list] = active_mean
-
-          #print("Data array shape:", data_array.shape)
-
-          # Actualizar los datos del gráfico
-          if self.data_plot is None:  # Si no hay datos, asignar los nuevos
-            self.data_plot = data_array
-          else:                       # Si hay datos, apilarlos
-            self.data_plot = np.vstack((self.data_plot, data_array))
-
-          # Limitar el número de muestras en el eje del tiempo
-          if len(self.data_plot) > max_samples:
-            self.data_plot = self.data_plot[-max_samples:]
-          
-          #Seleccionar el tipo de gráfico
-          if self.plot_type.get() == "Scan A":
-            update_plot = ScanA_update  # Actualizar gráfico Scan A
-          else:
-            update_plot = ScanC_update  # Actualizar gráfico Scan C
-          
-          # Actualizar el gráfico principal
-          self.fig, self.ax = update_plot(self.fig, self.ax, 
-            mag_min, mag_max, time_scale, 
-            self.data_plot, self.sampling_rate, self.auto_scale
-          )
+          data = self.queue_plot.get_nowait("plot") # Vista (n, 30) del anillo
+          new_rows.append(data.astype(float))   # Copia, ya reducida
         except Empty:   # Si no hay datos en la cola, salir del bucle
           break         # Salir del bucle while
-    self.canvas.draw() 
+
+    # Procesar una sola vez todos los bloques recibidos
+    data_array = np.vstack(new_rows) if new_rows else None
+    if data_array is not None:
+      # Calcular en numero e muestras en el eje del tiempo
+      max_samples = time_scale * self.display.rate
+
+      # determinar sensores a desabilitar - VERSIÓN MÁS EFICIENTE
+      body_idx, sensor_idx = [], []
+      for body, sensor in zip(self.disabled_bodies, 
+                              self.disabled_sensors):
+        body_val = body.get()       # nombre del cuerpo
+        sensor_val = sensor.get()   # nombre deln sensor
+        if body_val and sensor_val:  # si los dos existen
+          body_idx.append(int(body_val[1:]) - 1)     # B1->0, B2->1, ...
+          sensor_idx.append(int(sensor_val[1:]) - 1) # s1->0, s2->1, ...
+      disable_indices = set(self.layout.channels(body_idx, sensor_idx).tolist())
+
+      #print("Sensores deshabilitados:", sorted(disable_indices))
+
+      # Reemplazar sensores deshabilitados por la media de los activos
+      if disable_indices:  # Solo si hay sensores deshabilitados
+        disable_indices_list = list(disable_indices)
+        # Crear máscara de sensores activos (no deshabilitados)
+        active_mask = np.ones(data_array.shape[1], dtype=bool)
+        active_mask[disable_indices_list] = False
+        
+        # Calcular media de sensores activos para cada fila
+        if np.any(active_mask):  # Verificar que hay al menos un sensor activo
+          active_mean = np.nanmean(data_array[:, active_mask], axis=1, keepdims=True)
+          # Reemplazar columnas deshabilitadas con la media
+          data_array[:, disable_indices_list] = active_mean
+
+      #print("Data array shape:", data_array.shape)
+
+      # Actualizar los datos del gráfico (capacidad fija, sin copiar)
+      self.data_plot.resize(max_samples)  # conserva lo reciente si cambia
+      self.data_plot.append(data_array)
+
+    # Actualizar el gráfico principal una vez por cuadro (blitting)
+    if isinstance(self.renderer, ScanARenderer):  # Scan A: ventana completa
+      return self.renderer.render(
+        self.data_plot.view() if data_array is not None else None,
+        self.display.rate, time_scale, mag_min, mag_max, self.auto_scale,
+        start=self.data_plot.count - len(self.data_plot))
+    else:                           # Scan C: solo las columnas nuevas
+      return self.renderer.render(data_array,
+        time_scale, mag_min, mag_max, self.auto_scale)
 
   def update_plot_alarm(self):
-    """Actualiza el gráfico de alarmas con los datos de la cola."""
-    try:      # Intentar obtener datos del manager
+    """
+    Actualiza el gráfico de alarmas con el estado compartido.
+    :return: True si se dibujó.
+    """
+    try:      # Intentar obtener el estado del bloque compartido
+      state = self.alarm_control.read()
+      if state is None:             # escritura inconclusa: saltar el cuadro
+        return False
+      generation, alarms, counts = state
+      # conteo de cada detector para compararlos en vivo (solo texto)
+      text = "Alarmas: " + "  ".join(f"{name.replace('Algoritmo ', '')} {count}"
+        for name, count in zip(DETECTORS, counts.tolist()))
+      if text != self.detector_counts.get():
+        self.detector_counts.set(text)
+      if generation == self.alarm_generation: # Sin cambios desde el último
+        return False                          #   dibujo
+      self.alarm_generation = generation
       self.ax2 = Alarm_update(self.ax2, self.X_alarm, self.Y_alarm,
-        self.shared_alarms) # Actualizar el gráfico de alarmas
+        self.layout.by_body(alarms)[..., None]) # Actualizar el gráfico de alarmas
       self.canvas2.draw()   # Dibujar el gráfico de alarmas
-    except Empty:
-      pass  # No hay datos en la cola, no hacer nada  
+      return True
     except Exception as e: 
       print(f"Error en update_plot_alarm: {e}")
+      return False
       
   def update_plot_real_time(self):
-    """Actualiza los gráficos en tiempo real."""
-    self.update_plot_main() # Actualizar el gráfico principal
+    """
+    Cuadro de los gráficos en tiempo real (llamado por RenderScheduler).
+    :return: True si se dibujó algo.
+    """
+    drawn = self.update_plot_main() # Actualizar el gráfico principal
     if self.enable_process.is_set():  # Si la alarma está activada
-      self.update_plot_alarm()        # Actualizar el gráfico de alarmas
-    self.root.after(int(15/300*1000),               # Actualizar cada 33 ms (30 Hz)   
-                    self.update_plot_real_time)  
+      drawn = self.update_plot_alarm() or drawn # Gráfico de alarmas
+    return drawn
 
   def update_alarm_threshold(self, *args):
     """Actualiza el valor de la alarma en la variable compartida."""
     try: # Intentar obtener el nuevo valor de la alarma
       new_value = float(self.alarm_threshold_tk.get())  # Obtener el nuevo valor
-      self.alarm_threshold.value = new_value            # Actualizar la variable compartida
+      self.alarm_control.threshold = new_value          # Actualizar el bloque compartido
     except ValueError:                  # Si hay un error
       pass  # Ignora valores inválidos 
+
+  def update_alarm_window(self, *args):
+    """Actualiza la ventana de análisis de la alarma en la variable compartida."""
+    try: # Intentar obtener el nuevo largo de la ventana
+      new_value = int(self.alarm_window_tk.get())   # Obtener el nuevo valor
+    except (ValueError, tk.TclError):   # Texto vacío o no entero
+      return                            # Ignora valores inválidos
+    if new_value >= 2:                  # Se necesitan dos muestras para la desviación
+      self.alarm_control.window = new_value         # Actualizar el bloque compartido
       
   def create_image_display(self):
     """Crea un marco para mostrar una imagen estática."""
@@ -589,8 +685,8 @@ class MainInterFace:
 
   def create_disable_frame(self):
     """Crea un marco para poder desabilitar hasta 6 sensores de la herramienta MFL """
-    bodies = [""] + [f"B{i}" for i in range(1, 4)]
-    sensors = [""] + [f"s{i}" for i in range(1, 11)]
+    bodies = [""] + [f"B{i}" for i in range(1, self.layout.n_bodies + 1)]
+    sensors = [""] + self.layout.labels
 
     tk.Label(self.deseable_frame, text="Desabilitar",  font=("TkDefaultFont", 15),
         bg=self.color_frame, fg="white").grid(row=0, column=0, padx=2, columnspan=2)
@@ -625,14 +721,18 @@ class MainInterFace:
     self.fig.clear()                                  # Limpiar la figura
 
     # Destruir el widget de la figura
+    if self.renderer is not None:
+      self.renderer.disconnect()
     if hasattr(self, 'canvas'):
         self.canvas.get_tk_widget().destroy()
     
     # Crear un nuevo gráfico principal basado en el tipo de gráfico
     if plot_type == "Scan A":
+        time_scale = min(self.time_scale.get(), self.max_time["Scan A"])
+        self.time_scale.set(time_scale)
         self.create_plot_main(scan_type="Scan A")
     elif plot_type == "Scan C":
-        time_scale = min(self.time_scale.get(), 4)
+        time_scale = min(self.time_scale.get(), self.max_time["Scan C"])
         self.time_scale.set(time_scale)
         self.create_plot_main(scan_type="Scan C")
 
@@ -661,6 +761,11 @@ def on_closing(app):
   PARAMS = [app.stop_event, app.enable_plot, app.enable_save, app.enable_process]
   QUEUE = [app.queue_plot, app.queue_save,  app.queue_process]
 
+  # Detener los consumidores (terminan en tiempo acotado y cierran sus archivos)
+  for process in (app.data_saver, app.data_process):
+    if process is not None:
+      process.stop(timeout=1)
+
   # Detener procesos
   for process, param, queue in zip(PROCESS, PARAMS, QUEUE):
     if process is not None:
@@ -671,15 +776,16 @@ def on_closing(app):
         param.clear()         # Desactivar bandera de procesamiento
         process.terminate()   # Terminar proceso
         process.join(timeout=0.3) # Esperar a que termine
-      if queue is not None:       # Si hay una cola
-        while not queue.empty():  # Mientras la cola no esté vacía
-          try:    queue.get_nowait()  # Obtener elemento de la cola      
-          except: break               # Salir si no hay elementos                
-
-  # Cerrar el Manager y otras colas si fuese necesario
-  try:
-    app.manager.shutdown()           # Cerrar el Manager
-  except Exception as e:
-    print(f"Error al cerrar el Manager: {e}")
+
+  # Liberar los anillos de memoria compartida
+  for queue in QUEUE:
+    if queue is not None:
+      queue.close()
+
+  # Detener los cuadros de los gráficos
+  app.scheduler.stop()
+
+  # Liberar el bloque de control de alarmas
+  app.alarm_control.close()
   # Cierra la ventana principal
   app.root.destroy()                 # Destruir ventana principal  
@@ -0,0 +1,91 @@
+#%% ===========================================================================
+# Importar librerías principales
+# =============================================================================
+import numpy as np                    # Operaciones matemáticas
+from recording import channel_names   # Nombres de columna b{cuerpo}_s{sensor}
+
+#%% ===========================================================================
+# Descripción de la herramienta
+# =============================================================================
+END_MARK = b";****"   # Marca de fin de cada trama
+
+class ToolLayout:
+  """
+  Descripción de la herramienta MFL: cuerpos, sensores por cuerpo, formato
+  de la trama serial y orden de los canales. Todas las etapas (adquisición,
+  guardado, alarma y gráficos) reciben el mismo objeto y usan sus mapas de
+  índices, que se construyen una sola vez.
+
+  Los canales van agrupados por cuerpo: el canal del sensor k del cuerpo b es
+  b * n_sensors + k, de modo que cada cuerpo ocupa un bloque contiguo de
+  columnas y se obtiene como vista.
+  """
+  def __init__(self, n_bodies=3, n_sensors=10, sensor_order=None):
+    """
+    :param n_bodies: Número de cuerpos de la herramienta.
+    :param n_sensors: Sensores por cuerpo (lecturas por trama).
+    :param sensor_order: Posición en la trama de cada sensor del cuerpo
+      (el sensor k se lee de la lectura sensor_order[k]); None si la trama
+      ya viene en el orden de los sensores.
+    """
+    if sensor_order is None:
+      sensor_order = np.arange(n_sensors)
+    sensor_order = np.asarray(sensor_order, dtype=np.intp)
+    if sorted(sensor_order.tolist()) != list(range(n_sensors)):
+      raise ValueError("sensor_order debe ser una permutación de los "
+                       f"{n_sensors} sensores")
+    self.n_bodies = n_bodies                  # cuerpos
+    self.n_sensors = n_sensors                # sensores por cuerpo
+    self.n_channels = n_bodies * n_sensors    # columnas por muestra
+    self.sensor_order = sensor_order          # trama -> sensor
+    self.reordered = bool((sensor_order != np.arange(n_sensors)).any())
+
+    # Trama ">{n}Hc2c;****": n lecturas uint16 big-endian, 2 bytes de
+    # control, el cuerpo como dígito ASCII y la marca de fin
+    self.frame_format = f">{n_sensors}Hc2c"   # formato struct de la trama
+    self.frame_dtype = np.dtype([
+      ("values", ">u2", (n_sensors,)),        # lecturas de los sensores
+      ("ctrl", "S2"),                         # bytes de control
+      ("body", "u1"),                         # cuerpo en ASCII ('0', '1', ...)
+      ("end", f"S{len(END_MARK)}"),           # marca de fin ';****'
+    ])
+    self.frame_size = self.frame_dtype.itemsize             # bytes por trama
+    self.frame_payload = self.frame_size - len(END_MARK)    # antes de la marca
+
+    # Mapas de índices (canal -> cuerpo, sensor) y nombres
+    self.body_of = np.repeat(np.arange(n_bodies), n_sensors)  # cuerpo del canal
+    self.sensor_of = np.tile(np.arange(n_sensors), n_bodies)  # sensor del canal
+    self.names = channel_names(n_bodies, n_sensors)           # b1_s0, ...
+    self.labels = [f"s{k+1}" for k in range(n_sensors)]       # s1, s2, ...
+
+  def __repr__(self):
+    return f"ToolLayout({self.n_bodies} cuerpos x {self.n_sensors} sensores)"
+
+  def body_slice(self, body):
+    """Columnas (slice) de los sensores de un cuerpo."""
+    return slice(body * self.n_sensors, (body + 1) * self.n_sensors)
+
+  def channels(self, bodies, sensors):
+    """
+    Índice de canal de pares (cuerpo, sensor), vectorizado.
+    :param bodies: Cuerpo(s) desde 0.
+    :param sensors: Sensor(es) desde 0.
+    """
+    return np.asarray(bodies) * self.n_sensors + np.asarray(sensors)
+
+  def by_body(self, data):
+    """Vista (..., cuerpos, sensores) de un arreglo (..., canales)."""
+    data = np.asarray(data)
+    return data.reshape(data.shape[:-1] + (self.n_bodies, self.n_sensors))
+
+  def reorder(self, values):
+    """Lecturas (n, sensores) de la trama en el orden de los sensores."""
+    return values[:, self.sensor_order] if self.reordered else values
+
+  def describe(self):
+    """Descripción de la herramienta (para el encabezado de las grabaciones)."""
+    return {"n_bodies": self.n_bodies, "n_sensors": self.n_sensors,
+            "sensor_order": self.sensor_order.tolist()}
+
+# Herramienta estándar: 3 cuerpos x 10 sensores
+DEFAULT_LAYOUT = ToolLayout()
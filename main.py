@@ -4,14 +4,27 @@
 import tkinter as tk        # Importar librería para crear la interfaz
 from interface import MainInterFace  # Importar la clase MainInterFace
 from interface import on_closing     # Importar función para cerrar la aplicación
+from layout import ToolLayout        # Cuerpos y sensores de la herramienta
 import multiprocessing        # Importar librería para procesos paralelos
+import argparse               # Argumentos de línea de comandos
 
 #%% ========================================================================
 # Iniciar la aplicación
 # ==========================================================================
 if __name__ == "__main__":  # Si se ejecuta el script principal
   multiprocessing.freeze_support()    # Congelar soporte para Windows
+  parser = argparse.ArgumentParser(description="Adquisición de datos MFL")
+  parser.add_argument("--replay", default=None,   # Grabación a reproducir
+    help="grabación .mfl o .csv a reproducir en lugar de los puertos")
+  parser.add_argument("--speed", type=float, default=1.0, # Velocidad
+    help="múltiplo del tiempo real; 0 para reproducir lo más rápido posible")
+  parser.add_argument("--bodies", type=int, default=3,  # Cuerpos
+    help="número de cuerpos de la herramienta")
+  parser.add_argument("--sensors", type=int, default=10, # Sensores
+    help="sensores por cuerpo")
+  args = parser.parse_args()          # Leer los argumentos
+  layout = ToolLayout(args.bodies, args.sensors)  # Descripción de la herramienta
   root = tk.Tk()                      # Crear la ventana principal  
-  app = MainInterFace(root)           # Crear la interfaz principal 
+  app = MainInterFace(root, args.replay, args.speed, layout) # Interfaz principal
   root.protocol("WM_DELETE_WINDOW", lambda : on_closing(app))
   root.mainloop()                     # Iniciar el bucle principal
@@ -0,0 +1,177 @@
+#%% ===========================================================================
+# Importar librerías principales
+# =============================================================================
+import json                     # Mensajes de los sockets
+import queue                    # Cola de notificaciones pendientes
+import socket                   # Salida UDP / socket Unix
+import sys                      # Campana de la terminal
+import threading                # Hilo de notificación
+import time                     # Marcas de tiempo y limitación
+try:
+  import winsound               # Sonido en sistemas Windows
+except ImportError:             # Linux / macOS: se usa la campana
+  winsound = None
+
+#%% ===========================================================================
+# Salidas de notificación
+# =============================================================================
+# Nombre -> clase de la salida; se eligen por nombre en Notifier
+BACKENDS = {}
+
+def register(name):
+  """Decorador que añade una salida de notificación al registro."""
+  def wrapper(cls):
+    BACKENDS[name] = cls
+    return cls
+  return wrapper
+
+@register("campana")
+class BellBackend:
+  """Campana de la terminal (carácter BEL)."""
+  def emit(self, alarm):
+    """
+    Emite una notificación.
+    :param alarm: Diccionario con time, sent, latency, detector, channels y
+      count (alarmas agrupadas).
+    """
+    sys.stdout.write("\a")
+    sys.stdout.flush()
+
+  def close(self):
+    """Libera los recursos de la salida."""
+
+@register("sonido")
+class BeepBackend(BellBackend):
+  """Tono con winsound en Windows; campana de la terminal en otros sistemas."""
+  def __init__(self, frequency=2000, duration=800):
+    """
+    :param frequency: Frecuencia del tono [Hz].
+    :param duration: Duración del tono [ms].
+    """
+    self.frequency = frequency    # Frecuencia del sonido de alarma
+    self.duration = duration      # Duración del sonido
+
+  def emit(self, alarm):
+    if winsound is None:
+      super().emit(alarm)
+    else:
+      winsound.Beep(self.frequency, self.duration)  # bloquea solo este hilo
+
+@register("log")
+class LogBackend(BellBackend):
+  """Imprime cada notificación con su latencia."""
+  def emit(self, alarm):
+    print(f"Alarma {alarm['detector']}: sensores {alarm['channels']} "
+          f"({alarm['count']} agrupadas, latencia "
+          f"{alarm['latency'] * 1000:.1f} ms)")
+
+@register("socket")
+class SocketBackend(BellBackend):
+  """Envía cada notificación como JSON a un socket UDP o Unix (datagrama)."""
+  def __init__(self, address=("127.0.0.1", 50007)):
+    """
+    :param address: (host, puerto) para UDP o ruta de un socket Unix.
+    """
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    self.address = address                            # destino
+    self.sock = socket.socket(family, socket.SOCK_DGRAM)
+    self.sock.setblocking(False)                      # nunca esperar al receptor
+
+  def emit(self, alarm):
+    try:
+      self.sock.sendto(json.dumps(alarm).encode("utf-8"), self.address)
+    except OSError:                                   # receptor ausente o lleno
+      pass
+
+  def close(self):
+    self.sock.close()
+
+#%% ===========================================================================
+# Hilo de notificación
+# =============================================================================
+class Notifier(threading.Thread):
+  """
+  Emite las alarmas fuera del ciclo de detección. notify() solo encola y
+  regresa de inmediato; el hilo agrupa las alarmas que llegan mientras se
+  notifica o durante el intervalo mínimo y las emite como una sola.
+  """
+  def __init__(self, backends=("sonido",), min_interval=1.0, maxsize=256,
+               options=None):
+    """
+    :param backends: Nombres de las salidas (ver BACKENDS) o instancias.
+    :param min_interval: Tiempo mínimo entre notificaciones [s].
+    :param maxsize: Alarmas pendientes como máximo (las demás se descartan).
+    :param options: Diccionario nombre -> argumentos de cada salida.
+    """
+    super().__init__(daemon=True)
+    options = options or {}
+    self.backends = [BACKENDS[b](**options.get(b, {})) if isinstance(b, str)
+                     else b for b in backends]    # salidas activas
+    self.min_interval = min_interval              # limitación de frecuencia
+    self.pending = queue.Queue(maxsize)           # alarmas por notificar
+    self.stop_event = threading.Event()           # señal de paro
+    self.last_sent = 0.0                          # última notificación
+    self.dropped = 0                              # alarmas descartadas
+    self.sent = 0                                 # notificaciones emitidas
+
+  def notify(self, channels, detector="", timestamp=None):
+    """
+    Encola una alarma sin bloquear.
+    :param channels: Índices de los sensores en alarma.
+    :param detector: Nombre del detector que la generó.
+    :param timestamp: Momento de la detección; por defecto el actual.
+    """
+    try:
+      self.pending.put_nowait((time.time() if timestamp is None else timestamp,
+                               detector, [int(c) for c in channels]))
+    except queue.Full:
+      self.dropped += 1
+
+  def run(self):
+    """Espera alarmas, las agrupa y las emite respetando el intervalo."""
+    while not self.stop_event.is_set():
+      try:
+        first = self.pending.get(timeout=0.2)
+      except queue.Empty:
+        continue
+      if first is None:                           # despertado por stop()
+        continue
+      # esperar el intervalo mínimo desde la última notificación
+      wait = self.last_sent + self.min_interval - time.time()
+      if wait > 0 and self.stop_event.wait(wait):
+        break
+      alarms = [first]                            # agrupar las pendientes
+      while True:
+        try:
+          alarm = self.pending.get_nowait()
+        except queue.Empty:
+          break
+        if alarm is not None:
+          alarms.append(alarm)
+      self.last_sent = time.time()
+      alarm = {
+        "time": first[0],                         # primera detección
+        "sent": self.last_sent,                   # momento de la notificación
+        "latency": self.last_sent - first[0],     # detección -> notificación
+        "detector": alarms[-1][1],
+        "channels": sorted({c for _, _, chans in alarms for c in chans}),
+        "count": len(alarms),
+      }
+      for backend in self.backends:
+        try:
+          backend.emit(alarm)
+        except Exception as e:
+          print(f"Error al emitir alarma ({type(backend).__name__}): {e}")
+      self.sent += 1
+    for backend in self.backends:
+      backend.close()
+
+  def stop(self, timeout=1.0):
+    """Detiene el hilo y cierra las salidas."""
+    self.stop_event.set()
+    try:
+      self.pending.put_nowait(None)               # despertar la espera
+    except queue.Full:
+      pass
+    if self.is_alive():
+      self.join(timeout)
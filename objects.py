@@ -9,49 +9,1085 @@ import numpy as np							# Operaciones matemáticas
 from serial.tools import list_ports	# Lista de puertos COmm disponibles
 import time													# Tiempo		
 from multiprocessing import Process, Event	# Procesos y eventos multiproceso
-import winsound  # Permite generar sonidos en sistemas Windows
-from scipy.signal import butter, lfilter, lfilter_zi	# Filtros digitales
+from multiprocessing import Condition, shared_memory	# Memoria compartida
+from scipy.signal import butter, sosfilt, sosfilt_zi	# Filtros digitales
 import os													# Operaciones del sistema operativo
+import json												# Caché de puertos identificados
+from recording import RecordingWriter, open_recording			# Grabación binaria .mfl
+from recording import GAP_CODE						# Código de muestra perdida (hueco)
+from detectors import create_detectors		# Detectores de alarma
+from notifier import Notifier							# Notificación de alarmas
+from layout import DEFAULT_LAYOUT, END_MARK	# Cuerpos, sensores y tramas
+import threading									# Lectores concurrentes por puerto
+import queue											# Cola de mezcla entre hilos
+from collections import deque			# Colas monótonas de máximos
+from abc import ABC, abstractmethod	# Métodos que las subclases deben definir
+
+#%% ===========================================================================
+# Decodificación de las tramas seriales (formato en layout.ToolLayout)
+# =============================================================================
+def find_end_marks(raw, scan_from=0):
+	"""
+	Busca de forma vectorizada todas las marcas de fin en el arreglo de bytes.
+	:param raw: arreglo uint8 con los datos recibidos.
+	:param scan_from: posición desde la cual buscar (los bytes anteriores ya
+		fueron revisados).
+	:return: posiciones de inicio de cada marca ';****'.
+	"""
+	window = raw[scan_from:]							# región a revisar
+	n = len(window) - len(END_MARK) + 1		# posiciones candidatas
+	if n <= 0:														# no cabe una marca completa
+		return np.empty(0, dtype=np.intp)
+	mask = window[:n] == END_MARK[0]			# candidatos ';'
+	for k in range(1, len(END_MARK)):			# verificar los '*' siguientes
+		mask &= window[k:n + k] == END_MARK[k]
+	return np.flatnonzero(mask) + scan_from
+
+def decode_frames(buffer, scan_from=0, layout=DEFAULT_LAYOUT):
+	"""
+	Decodifica en una sola pasada todas las tramas completas del buffer.
+	Cada mensaje es lo que hay entre dos marcas de fin (o entre el inicio del
+	buffer y la primera marca); los mensajes con tamaño distinto al de la
+	trama o con un cuerpo que no pertenece a la herramienta se descartan.
+	:param buffer: bytes, bytearray o memoryview con los datos recibidos.
+	:param scan_from: posición desde la cual buscar marcas de fin.
+	:param layout: ToolLayout con el formato de la trama.
+	:return: (values, bodies, dropped, consumed): lecturas (n, sensores)
+		uint16 en el orden de los sensores, cuerpo de cada trama (n,), número
+		de tramas parciales o desalineadas descartadas y número de bytes
+		consumidos del inicio del buffer.
+	"""
+	frame_dtype = layout.frame_dtype							# estructura de la trama
+	raw = np.frombuffer(buffer, dtype=np.uint8)		# vista sin copia
+	ends = find_end_marks(raw, scan_from)					# marcas de fin
+	if len(ends) == 0:														# no hay tramas completas
+		return (np.empty((0, layout.n_sensors), np.uint16),
+			np.empty(0, np.intp), 0, 0)
+
+	starts = np.zeros_like(ends)									# inicio de cada mensaje
+	starts[1:] = ends[:-1] + len(END_MARK)				#  después de la marca previa
+	valid = (ends - starts) == layout.frame_payload	# mensajes de tamaño correcto
+	starts = starts[valid]
+	n = len(starts)
+	if n and starts[-1] - starts[0] == (n - 1) * frame_dtype.itemsize:
+		# tramas contiguas: se interpreta el buffer directamente
+		frames = np.frombuffer(buffer, dtype=frame_dtype, count=n,
+			offset=int(starts[0]))
+	else:
+		# tramas separadas por basura: se reúnen sus bytes
+		idx = starts[:, None] + np.arange(frame_dtype.itemsize)
+		frames = raw[idx].view(frame_dtype).reshape(n)
+
+	bodies = frames["body"].astype(np.intp) - ord("0")	# cuerpo en ASCII
+	ok = (bodies >= 0) & (bodies < layout.n_bodies)	# cuerpo de la herramienta
+	dropped = len(ends) - int(np.count_nonzero(ok))
+	values = layout.reorder(frames["values"][ok].astype(np.uint16))	# nativo
+	consumed = int(ends[-1]) + len(END_MARK)
+	return values, bodies[ok], dropped, consumed
+
+class ReceiveRing:
+	def __init__(self, capacity=65536, layout=DEFAULT_LAYOUT):
+		"""
+		Buffer de recepción de capacidad fija para un puerto serial.
+		El driver escribe directamente sobre memoria preasignada y las tramas se
+		decodifican sobre vistas de esa memoria. Los bytes pendientes están entre
+		el cursor de lectura y el de escritura; el cursor de búsqueda indica
+		hasta dónde ya se buscó la marca de fin.
+		:param capacity: Capacidad del buffer en bytes.
+		:param layout: ToolLayout con el formato de la trama.
+		"""
+		self.capacity = capacity								# capacidad en bytes
+		self.layout = layout										# formato de la trama
+		self.buffer = bytearray(capacity)				# memoria preasignada
+		self.view = memoryview(self.buffer)			# vista sin copia
+		self.read_pos = 0												# inicio de los bytes pendientes
+		self.write_pos = 0											# fin de los bytes pendientes
+		self.scan_pos = 0												# inicio de la búsqueda de marcas
+		self.overflow_bytes = 0									# bytes descartados por desbordamiento
+		self.dropped_frames = 0									# tramas descartadas por el decodificador
+
+	def __len__(self):
+		"""Número de bytes pendientes por decodificar."""
+		return self.write_pos - self.read_pos
+
+	def reset(self):
+		"""Descarta los bytes pendientes (p. ej. al reabrir el puerto)."""
+		self.read_pos = self.write_pos = self.scan_pos = 0
+
+	def reserve(self, n):
+		"""
+		Retorna una vista escribible de hasta n bytes a continuación de los
+		bytes pendientes. Si no cabe al final, el remanente sin decodificar
+		(menos de una trama en operación normal) se mueve al inicio; si tampoco
+		cabe, se descartan los bytes más antiguos y se contabilizan.
+		"""
+		n = min(n, self.capacity)								# nunca más que la capacidad
+		if self.write_pos + n > self.capacity:	# no cabe al final
+			lost = len(self) + n - self.capacity	# bytes que no caben
+			if lost > 0:													# desbordamiento
+				self.overflow_bytes += lost
+				self.read_pos += lost
+			pending = len(self)										# remanente a conservar
+			self.view[:pending] = self.view[self.read_pos:self.write_pos]
+			self.scan_pos = max(self.scan_pos - self.read_pos, 0)
+			self.read_pos, self.write_pos = 0, pending
+		return self.view[self.write_pos:self.write_pos + n]
+
+	def commit(self, n):
+		"""Confirma n bytes escritos en la vista entregada por reserve."""
+		self.write_pos += n
+
+	def fill_from(self, comm, min_size=1):
+		"""
+		Lee del puerto todo lo disponible (o al menos min_size bytes, con el
+		timeout del puerto) directamente sobre el buffer.
+		:return: número de bytes leídos.
+		"""
+		n = comm.readinto(self.reserve(comm.in_waiting or min_size)) or 0
+		self.commit(n)
+		return n
+
+	def decode(self):
+		"""
+		Decodifica todas las tramas completas pendientes y avanza los cursores.
+		:return: lecturas (n, sensores) uint16, cuerpo de cada trama (n,) y
+			número de tramas descartadas.
+		"""
+		pending = self.view[self.read_pos:self.write_pos]	# vista sin copia
+		values, bodies, dropped, consumed = decode_frames(
+			pending, self.scan_pos - self.read_pos, self.layout)
+		self.read_pos += consumed								# descartar lo decodificado
+		# los últimos bytes pueden contener parte de una marca de fin
+		self.scan_pos = max(self.read_pos, self.write_pos - len(END_MARK) + 1)
+		if self.read_pos == self.write_pos:			# buffer vacío: reiniciar
+			self.read_pos = self.write_pos = self.scan_pos = 0
+		self.dropped_frames += dropped
+		return values, bodies, dropped
 
 #%% ===========================================================================
 # Funciones auxiliares
 # =============================================================================
-def buffer_management( buffer, enable, queue, threshold,
-	printV=False, n_it=0,
-	start_time_loop=0):	
+class PublishBuffer:
+	def __init__(self, threshold, n_bodies=3, n_sensors=10, capacity=1200,
+							dtype=np.float32, enable=None, verbose=False, fill=0, rate=None):
+		"""
+		Buffer de publicación con memoria preasignada (capacity, n_bodies *
+		n_sensors). Cada cuerpo escribe en sus columnas con su propio contador
+		y se publican bloques de threshold filas alineadas entre cuerpos como
+		vistas de la misma memoria.
+		:param threshold: Filas por bloque publicado (300 guardado, ~50 ms de
+			visualización para el plot, 1 procesamiento).
+		:param n_bodies: Número de cuerpos.
+		:param n_sensors: Sensores por cuerpo.
+		:param capacity: Filas del buffer (múltiplo de threshold).
+		:param dtype: Tipo de dato almacenado.
+		:param enable: Evento que habilita la publicación (None: siempre).
+		:param verbose: Si True imprime el tiempo entre publicaciones.
+		:param fill: Valor inicial de las columnas (marca de hueco de los 
+			cuerpos que nunca escriben).
+		:param rate: Filas por segundo; con rate y start_time cada fila se 
+			publica con su tiempo de adquisición.
+		"""
+		assert capacity % threshold == 0, "capacity debe ser múltiplo de threshold"
+		self.threshold = threshold					# filas por bloque publicado
+		self.n_sensors = n_sensors					# sensores por cuerpo
+		self.capacity = capacity						# filas del buffer
+		self.enable = enable								# habilitación de la publicación
+		self.verbose = verbose							# imprimir la publicación
+		self.fill = fill										# marca de hueco
+		self.data = np.full((capacity, n_bodies * n_sensors), fill, dtype=dtype)
+		self.counts = np.zeros(n_bodies, dtype=np.int64)		# filas por cuerpo
+		self.stored = np.zeros(n_bodies, dtype=np.int64)		# filas en memoria
+		self.overflow = np.zeros(n_bodies, dtype=np.int64)	# filas descartadas
+		self.active = np.ones(n_bodies, dtype=bool)	# cuerpos que se alinean
+		self.published = 0									# filas publicadas
+		self.last_time = time.time()				# última publicación
+		self.rate = rate										# filas por segundo
+		self.start_time = None							# tiempo de la fila 0 [s]
+
+	def _store(self, body, start, block):
+		"""Copia filas del cuerpo desde la fila absoluta start (con vuelta)."""
+		n = len(block)
+		idx = int(start % self.capacity)						# posición de escritura
+		first = min(n, self.capacity - idx)					# filas hasta el final
+		cols = slice(body * self.n_sensors, (body + 1) * self.n_sensors)
+		self.data[idx:idx + first, cols] = block[:first]
+		self.data[:n - first, cols] = block[first:n]
+
+	def _fill_lost(self, body):
+		"""
+		Marca como hueco las filas descartadas del cuerpo que ya tienen lugar
+		en el buffer, para no publicar datos viejos en su casilla.
+		"""
+		start = int(self.stored[body])
+		stop = min(int(self.counts[body]), self.published + self.capacity)
+		if stop > start:
+			self._store(body, start, np.broadcast_to(np.asarray(self.fill,
+				self.data.dtype), (stop - start, self.n_sensors)))
+			self.stored[body] = stop
+
+	def append(self, body, block):
+		"""
+		Copia un bloque (n, n_sensors) del cuerpo en las columnas que le tocan.
+		Si el cuerpo va demasiado adelantado las filas nuevas que no caben se 
+		descartan, pero el contador avanza igual (quedan como hueco) para que
+		el cuerpo siga alineado con los demás.
+		"""
+		self._fill_lost(body)								# huecos que ya tienen lugar
+		n = len(block)
+		start = int(self.counts[body])
+		k = min(n, max(0, self.published + self.capacity - start))	# caben
+		if k < n:														# el cuerpo va demasiado adelantado
+			self.overflow[body] += n - k
+		self._store(body, start, block[:k])
+		self.stored[body] += k
+		self.counts[body] += n
+
+	def ready(self):
+		"""Filas alineadas en todos los cuerpos activos aún no publicadas."""
+		return int(self.counts[self.active].min()) - self.published
+
+	def publish(self, ring):
+		"""
+		Publica en el anillo todos los bloques completos de threshold filas.
+		:return: número de filas publicadas.
+		"""
+		n = self.ready() // self.threshold * self.threshold	# bloques completos
+		total = n
+		while n > 0:
+			for body in range(len(self.counts)):					# huecos por desborde
+				self._fill_lost(body)
+			idx = self.published % self.capacity					# múltiplo de threshold
+			k = min(n, self.capacity - idx)								# filas contiguas
+			if self.enable is None or self.enable.is_set():
+				times = None																# tiempo de cada fila
+				if self.rate and self.start_time is not None:
+					times = self.start_time + \
+						(self.published + np.arange(k)) / self.rate
+				ring.put(self.data[idx:idx + k], times)			# vista sin copia
+			self.published += k
+			n -= k
+		if total and self.verbose:
+			print("elapsed time : %.4f, rows %s, backlog %s =================" % (
+				time.time() - self.last_time, total,
+				(self.counts - self.published).tolist()))
+			self.last_time = time.time()
+		return total
+
+class FrameAligner:
+	def __init__(self, n_bodies=3, sf=300, window=1.0, tolerance=2, max_slip=10):
+		"""
+		Ubica las tramas de cada cuerpo en una grilla de tiempo común (una 
+		casilla por muestra). Cada cuerpo numera sus tramas (secuencia) y cada
+		lectura lleva el instante monotónico de recepción; el reloj del cuerpo
+		se estima como el mínimo en una ventana de (recepción - secuencia / sf),
+		que corresponde a la lectura con menor retardo. Con ese reloj se compara
+		la casilla de cada bloque con la esperada: si va atrasada hay tramas de
+		más (se descartan) y si va adelantada faltan tramas. Un salto pequeño 
+		es la deriva del reloj del cuerpo y se corrige repitiendo muestras; uno
+		mayor es un corte y se rellena con huecos.
+		:param n_bodies: Número de cuerpos.
+		:param sf: Frecuencia de muestreo [Hz].
+		:param window: Ventana del mínimo del reloj [s].
+		:param tolerance: Casillas de diferencia que se toleran sin corregir.
+		:param max_slip: Casillas faltantes que se corrigen repitiendo muestras
+			(deriva); más que eso es un corte.
+		"""
+		self.n_bodies = n_bodies				# número de cuerpos
+		self.sf = sf										# frecuencia de muestreo
+		self.window = window						# ventana del reloj
+		self.tolerance = tolerance			# tolerancia en casillas
+		self.max_slip = max_slip				# corrección máxima por deriva
+		self.reset()
+
+	def reset(self):
+		"""Reinicia la grilla, las secuencias y los contadores."""
+		self.t0 = None																		# origen de la grilla
+		self.seq = np.zeros(self.n_bodies, dtype=np.int64)		# tramas recibidas
+		self.next = np.zeros(self.n_bodies, dtype=np.int64)		# próxima casilla
+		self.dropped = np.zeros(self.n_bodies, dtype=np.int64)	# tramas perdidas
+		self.duplicated = np.zeros(self.n_bodies, dtype=np.int64)	# de más
+		self.repeated = np.zeros(self.n_bodies, dtype=np.int64)	# por deriva
+		self.offsets = np.full(self.n_bodies, np.nan)					# reloj de cada cuerpo
+		self.residual = np.full(self.n_bodies, np.nan)				# error de casilla
+		self.clocks = [deque() for _ in range(self.n_bodies)]	# (t, valor) crecientes
+
+	def restart(self, body):
+		"""Olvida el reloj de un cuerpo (tras un hueco o una reconexión)."""
+		self.clocks[body].clear()
+
+	def advance(self, body, n):
+		"""Avanza n casillas escritas (tramas o relleno) del cuerpo."""
+		self.next[body] += n
+
+	def align(self, body, n, t_recv):
+		"""
+		Ubica un bloque de n tramas consecutivas de un cuerpo.
+		:param t_recv: Instante monotónico de la lectura que las trajo.
+		:return: Casillas faltantes antes del bloque (> 0; ver is_outage) o 
+			tramas del inicio del bloque a descartar (< 0); 0 si el bloque es 
+			continuo.
+		"""
+		seq = int(self.seq[body])
+		self.seq[body] += n
+		# la última trama llegó a lo sumo en t_recv: mínimo en la ventana
+		value = t_recv - (seq + n - 1) / self.sf
+		clock = self.clocks[body]
+		while clock and clock[-1][1] >= value:	# ya no pueden ser mínimo
+			clock.pop()
+		clock.append((t_recv, value))
+		while clock[0][0] < t_recv - self.window:	# salieron de la ventana
+			clock.popleft()
+		self.offsets[body] = clock[0][1]				# reloj del cuerpo
+		if self.t0 is None:											# primera trama: casilla 0
+			self.t0 = self.offsets[body] + seq / self.sf
+		exact = (self.offsets[body] + seq / self.sf - self.t0) * self.sf
+		shift = round(exact) - int(self.next[body])
+		if self.is_outage(shift):								# corte: tramas perdidas
+			self.dropped[body] += shift
+		elif shift > self.tolerance:						# deriva: repetir muestras
+			self.repeated[body] += shift
+		elif shift < -self.tolerance:						# tramas de más
+			shift = -min(-shift, n)
+			self.duplicated[body] -= shift
+		else:																		# continuo
+			shift = 0
+		self.residual[body] = exact - self.next[body] - shift	# casilla real - escrita
+		return shift
+
+	def is_outage(self, shift):
+		"""True si las casillas faltantes son un corte y no deriva del reloj."""
+		return shift > self.max_slip
+
+	def skew(self):
+		"""
+		Desfase de las muestras de cada cuerpo respecto a la mediana de los 
+		cuerpos en una misma fila [ms].
+		"""
+		if np.isnan(self.residual).all():
+			return self.residual.copy()
+		return (self.residual - np.nanmedian(self.residual)) * 1000 / self.sf
+
+	def describe(self, body):
+		"""Resumen de una línea del cuerpo para el reporte periódico."""
+		return (f"cuerpo {body + 1}: desfase {self.skew()[body]:+.1f} ms, "
+			f"{self.dropped[body]} tramas perdidas, "
+			f"{self.repeated[body]} repetidas, "
+			f"{self.duplicated[body]} descartadas")
+
+class DisplayDecimator:
+	def __init__(self, n_channels=30, sf=300, display_rate=100, mode="decimate",
+							order=4):
+		"""
+		Reduce las muestras que se envían a la interfaz a la frecuencia de
+		visualización. Cada cuerpo se procesa por separado con su propio
+		contador; los grupos se alinean al índice absoluto de las muestras, de
+		modo que los cuerpos siguen alineados en el PublishBuffer.
+		:param n_channels: Número total de canales (sensores).
+		:param sf: Frecuencia de muestreo de los sensores [Hz].
+		:param display_rate: Filas por segundo deseadas para la interfaz.
+		:param mode: 'decimate' (pasa bajos antialias y una de cada step
+			muestras) o 'envelope' (par mínimo, máximo por grupo de step muestras).
+		:param order: Orden del filtro antialias.
+		"""
+		if mode not in ("decimate", "envelope"):
+			raise ValueError(f"Modo de visualización desconocido: {mode}")
+		rows = 1 if mode == "decimate" else 2		# filas por grupo
+		self.n_channels = n_channels						# Número de canales
+		self.mode = mode												# Modo de reducción
+		self.step = max(rows, round(rows * sf / display_rate))	# muestras por grupo
+		self.rate = rows * sf / self.step				# filas por segundo publicadas
+		self.filters = None											# sin filtro si no se reduce
+		if mode == "decimate" and self.step > 1:	# corte en 0.4 de la nueva tasa
+			self.filters = FilterBank(n_channels, order, [0.4 * self.rate], sf)
+		self.reset()
+
+	def reset(self):
+		"""Olvida el estado de todos los canales."""
+		self.counts = np.zeros(self.n_channels, dtype=np.int64)	# muestras vistas
+		self.low = np.full(self.n_channels, np.inf)		# grupo parcial: mínimo
+		self.high = np.full(self.n_channels, -np.inf)	# grupo parcial: máximo
+		if self.filters is not None:
+			self.filters.reset()
+
+	def skip(self, n, channels=slice(None)):
+		"""
+		Avanza n muestras perdidas de un cuerpo sin datos (hueco): descarta el
+		grupo parcial y reinicia el filtro, que arranca de nuevo con la 
+		primera muestra que llegue.
+		:return: Filas de salida que corresponden al hueco.
+		"""
+		count = int(self.counts[channels][0])			# índice absoluto actual
+		self.counts[channels] += n
+		self.low[channels], self.high[channels] = np.inf, -np.inf
+		if self.filters is not None:
+			self.filters.reset(channels)
+		rows = 1 if self.mode == "decimate" else 2	# filas por grupo
+		return ((count + n) // self.step - count // self.step) * rows
+
+	def apply(self, block, channels=slice(None)):
+		"""
+		Reduce un bloque de muestras de un cuerpo.
+		:param block: Arreglo (n, canales) en orden cronológico.
+		:param channels: Slice de los canales del bloque (p. ej. un cuerpo).
+		:return: Bloque reducido (m, canales); vacío si ningún grupo se completa.
+		"""
+		block = np.asarray(block, dtype=float)
+		count = int(self.counts[channels][0])			# índice absoluto de block[0]
+		self.counts[channels] += len(block)
+		if self.mode == "decimate":
+			if self.filters is not None:
+				block = self.filters.apply(block, channels)	# antialias
+			return block[(self.step - 1 - count) % self.step::self.step]
+		# envolvente: completar el grupo parcial del bloque anterior
+		low, high = self.low[channels], self.high[channels]	# vistas del estado
+		pairs = []
+		first = min(-count % self.step, len(block))	# muestras del grupo parcial
+		if first:
+			low[:] = np.minimum(low, block[:first].min(axis=0))
+			high[:] = np.maximum(high, block[:first].max(axis=0))
+			if (count + first) % self.step == 0:		# grupo completo
+				pairs.append(np.stack((low, high))[None])	# (1, 2, canales)
+				low[:], high[:] = np.inf, -np.inf
+		rest = block[first:]
+		full = len(rest) // self.step * self.step	# grupos completos
+		if full:
+			groups = rest[:full].reshape(-1, self.step, rest.shape[1])
+			pairs.append(np.stack((groups.min(axis=1), groups.max(axis=1)), axis=1))
+		if full < len(rest):											# iniciar el grupo parcial
+			low[:] = rest[full:].min(axis=0)
+			high[:] = rest[full:].max(axis=0)
+		if not pairs:
+			return block[:0]
+		return np.concatenate(pairs).reshape(-1, block.shape[1])	# min, max, ...
+
+class SensorConverter:
+	def __init__(self, n_channels=30, gain=9, offset=1650, max_volt=3300,
+							max_bin=4096):
+		"""
+		Convierte lecturas del ADC a campo magnético [A/m] con coeficientes
+		afines precalculados por sensor: H = scale * código + bias.
+		:param n_channels: Número de sensores.
+		:param gain: Ganancia del sensor [mV/Gauss], escalar o una por sensor.
+		:param offset: Offset del sensor [mV], escalar o uno por sensor.
+		:param max_volt: Voltaje de referencia del ADC [mV].
+		:param max_bin: Número de códigos del ADC (12 bits).
+		"""
+		self.n_channels = n_channels		# número de sensores
+		self.max_volt = max_volt				# referencia del ADC [mV]
+		self.max_bin = max_bin					# códigos del ADC
+		self.calibrate(gain, offset)		# coeficientes y tabla
+
+	def calibrate(self, gain=None, offset=None):
+		"""
+		Actualiza la ganancia [mV/Gauss] y el offset [mV] de los sensores y
+		recalcula los coeficientes y la tabla de códigos.
+		"""
+		if gain is not None:
+			self.gain = np.broadcast_to(np.asarray(gain, dtype=float),
+				(self.n_channels,)).copy()
+		if offset is not None:
+			self.offset = np.broadcast_to(np.asarray(offset, dtype=float),
+				(self.n_channels,)).copy()
+		mu_0 = 4 * np.pi * 1e-7								# Tesla * m / A
+		k = 1 / (self.gain * 10000 * mu_0)		# mV -> Gauss -> Tesla -> A/m
+		self.scale = self.max_volt / self.max_bin * k	# A/m por código
+		self.bias = -self.offset * k									# A/m en código 0
+		# tabla [código, sensor] para lecturas crudas enteras
+		self.table = np.arange(self.max_bin)[:, None] * self.scale + self.bias
+
+	def convert(self, block, channels=slice(None), out=None):
+		"""
+		Convierte un bloque (n, canales) de lecturas (filtradas o no).
+		:param channels: Slice de los sensores a los que corresponde el bloque.
+		:param out: Arreglo de salida; puede ser el mismo bloque (en sitio).
+		:return: Bloque en A/m.
+		"""
+		out = np.multiply(block, self.scale[channels], out=out)
+		return np.add(out, self.bias[channels], out=out)
+
+	def convert_codes(self, codes, channels=slice(None)):
+		"""
+		Convierte códigos enteros del ADC (n, canales) usando la tabla; las
+		muestras perdidas (GAP_CODE) quedan como NaN.
+		:param channels: Slice o índices de los sensores del bloque.
+		"""
+		cols = np.arange(self.n_channels)[channels]	# sensores del bloque
+		gap = codes == GAP_CODE											# fuera de la tabla
+		out = self.table[np.where(gap, 0, codes), cols]
+		out[gap] = np.nan
+		return out
+
+def load_recording(path, t0=None, t1=None, sensors=None, converter=None):
+	"""
+	Lee un intervalo de una grabación (.mfl o .csv) convertido a A/m sin 
+	filtrar, con los huecos como NaN.
+	:param t0: Tiempo inicial [s]; None desde el inicio.
+	:param t1: Tiempo final [s]; None hasta el final.
+	:param sensors: Selección de sensores (ver RecordingReader.columns).
+	:param converter: SensorConverter de la herramienta; por defecto la 
+		calibración nominal para todas las columnas de la grabación.
+	:return: (tiempos (n,), campo (n, sensores)).
+	"""
+	reader = open_recording(path)
+	try:
+		converter = converter or SensorConverter(reader.n_channels)
+		times, codes = reader.load(t0, t1, sensors)
+		return times, converter.convert_codes(codes, reader.columns(sensors))
+	finally:
+		reader.close()
+
+#%% ===========================================================================
+# Anillo de muestras en memoria compartida
+# =============================================================================
+class SharedSampleRing:
+	def __init__(self, n_channels=30, capacity=6000, dtype=np.float32,
+							consumers=("default",)):
+		"""
+		Anillo de muestras (filas de n_channels) en memoria compartida. El 
+		proceso de adquisición escribe cada bloque una sola vez y cada consumidor
+		lee vistas de la misma memoria con su propio cursor, sin serializar.
+		Un contador de secuencia indica el total de filas escritas y cada fila
+		lleva su tiempo de adquisición (NaN si el escritor no lo indica).
+		:param n_channels: Número de columnas de cada muestra.
+		:param capacity: Número de filas que conserva el anillo.
+		:param dtype: Tipo de dato de las muestras (np.float32, np.uint16).
+		:param consumers: Nombres de los consumidores, uno por cursor.
+		"""
+		self.n_channels = n_channels					# columnas por muestra
+		self.capacity = capacity							# filas del anillo
+		self.dtype = np.dtype(dtype)					# tipo de dato
+		self.consumers = list(consumers)			# nombres de consumidores
+		self.times_offset = self._header_size()	# inicio de los tiempos [bytes]
+		self.data_offset = self.times_offset + -(-capacity * 8 // 64) * 64	# datos
+		size = self.data_offset + capacity * n_channels * self.dtype.itemsize
+		self.shm = shared_memory.SharedMemory(create=True, size=size)
+		self.owner = True											# el creador libera la memoria
+		self.cond = Condition()								# aviso de datos nuevos
+		self._attach()
+		self.header[:] = 0										# secuencia, cursores y pérdidas
+		self.times[:] = np.nan								# sin tiempos todavía
+		self.last_read = slice(0, 0)					# filas de la última lectura
+
+	def _header_size(self):
+		"""Bytes del encabezado: secuencia, cursores y filas perdidas (int64)."""
+		n = 1 + 2 * len(self.consumers)
+		return -(-n * 8 // 64) * 64						# alineado a 64 bytes
+
+	def _attach(self):
+		"""Crea las vistas NumPy sobre la memoria compartida."""
+		n = len(self.consumers)
+		self.header = np.ndarray((1 + 2 * n,), np.int64, self.shm.buf)
+		self.cursors = self.header[1:1 + n]		# próxima fila de cada consumidor
+		self.overruns = self.header[1 + n:]		# filas perdidas por consumidor
+		self.times = np.ndarray((self.capacity,), np.float64, self.shm.buf,
+			offset=self.times_offset)						# tiempo de cada fila [s]
+		self.data = np.ndarray((self.capacity, self.n_channels), self.dtype,
+			self.shm.buf, offset=self.data_offset)
+
+	def __getstate__(self):
+		"""Al enviarse a otro proceso solo viaja el nombre de la memoria."""
+		state = self.__dict__.copy()
+		for key in ("shm", "header", "cursors", "overruns", "times", "data"):
+			state.pop(key)
+		state["name"] = self.shm.name
+		return state
+
+	def __setstate__(self, state):
+		"""Se conecta a la memoria compartida existente por su nombre."""
+		name = state.pop("name")
+		self.__dict__.update(state)
+		self.owner = False
+		self.shm = shared_memory.SharedMemory(name=name)
+		self._attach()
+
+	def _consumer(self, consumer):
+		"""Índice del cursor de un consumidor (por nombre o índice)."""
+		return consumer if isinstance(consumer, int) else \
+			self.consumers.index(consumer)
+
+	@property
+	def sequence(self):
+		"""Total de filas escritas desde la creación del anillo."""
+		return int(self.header[0])
+
+	def put(self, block, times=None):
+		"""
+		Escribe un bloque de muestras y avisa a los consumidores.
+		:param block: arreglo (n, n_channels) o diccionario {cuerpo: filas}, en
+			cuyo caso cada cuerpo ocupa sus columnas.
+		:param times: Tiempo de adquisición de cada fila (n,) [s]; None si no 
+			se conoce.
+		"""
+		if isinstance(block, dict):						# filas por cuerpo
+			arrays = [np.asarray(block[key]) for key in sorted(block)]
+			n = len(arrays[0])
+		else:
+			n = len(block)
+		if n == 0:
+			return
+		seq = self.sequence
+		for start in range(0, n, self.capacity):	# bloques mayores al anillo
+			stop = min(start + self.capacity, n)
+			idx = (seq + start) % self.capacity			# posición de escritura
+			first = min(stop - start, self.capacity - idx)	# filas hasta el final
+			for rows, dst in ((slice(start, start + first), slice(idx, idx + first)),
+				(slice(start + first, stop), slice(0, stop - start - first))):
+				if isinstance(block, dict):				# columnas de cada cuerpo
+					col = 0
+					for arr in arrays:
+						width = arr.shape[1]
+						self.data[dst, col:col + width] = arr[rows]
+						col += width
+				else:
+					self.data[dst] = block[rows]
+				self.times[dst] = np.nan if times is None else times[rows]
+		self.header[0] = seq + n								# publicar tras escribir
+		with self.cond:													# despertar a los consumidores
+			self.cond.notify_all()
+
+	def available(self, consumer=0):
+		"""Número de filas pendientes para el consumidor."""
+		return self.sequence - int(self.cursors[self._consumer(consumer)])
+
+	def empty(self, consumer=0):
+		"""True si el consumidor no tiene filas pendientes."""
+		return self.available(consumer) <= 0
+
+	def get(self, consumer=0, block=True, timeout=None, max_rows=None):
+		"""
+		Entrega las filas pendientes del consumidor como una vista de la memoria
+		compartida (hasta el final del anillo) y avanza su cursor. La vista es 
+		válida hasta que el escritor da una vuelta completa al anillo.
+		:raises queue.Empty: si no hay datos tras esperar timeout o si la
+			espera se interrumpe con wake().
+		"""
+		k = self._consumer(consumer)
+		if self.empty(k):												# esperar datos nuevos
+			if not block:
+				raise queue.Empty
+			with self.cond:
+				if self.empty(k):										# hasta un put() o wake()
+					self.cond.wait(timeout)
+			if self.empty(k):
+				raise queue.Empty
+		seq, cursor = self.sequence, int(self.cursors[k])
+		if seq - cursor > self.capacity:				# el escritor dio la vuelta
+			self.overruns[k] += seq - cursor - self.capacity
+			cursor = seq - self.capacity
+		idx = cursor % self.capacity						# posición de lectura
+		n = min(seq - cursor, self.capacity - idx)	# filas contiguas
+		if max_rows is not None:
+			n = min(n, max_rows)
+		self.cursors[k] = cursor + n
+		self.last_read = slice(idx, idx + n)		# para last_times()
+		return self.data[idx:idx + n]
+
+	def last_times(self):
+		"""Tiempos de adquisición de las filas de la última lectura (vista)."""
+		return self.times[self.last_read]
+
+	def get_nowait(self, consumer=0, max_rows=None):
+		"""Equivalente a get(consumer, block=False)."""
+		return self.get(consumer, block=False, max_rows=max_rows)
+
+	def seek_end(self, consumer=0):
+		"""Descarta las filas pendientes del consumidor."""
+		self.cursors[self._consumer(consumer)] = self.sequence
+
+	def wake(self):
+		"""Despierta a los consumidores en espera (p. ej. para detenerlos)."""
+		with self.cond:
+			self.cond.notify_all()
+
+	def close(self):
+		"""Libera las vistas y la memoria; el creador además la elimina."""
+		self.header = self.cursors = self.overruns = self.times = None
+		self.data = None
+		self.shm.close()
+		if self.owner:
+			self.shm.unlink()
+
+#%% ===========================================================================
+# Bloque de control de alarmas en memoria compartida
+# =============================================================================
+class AlarmControl:
+	def __init__(self, n_channels=30, threshold=40.0, algorithm=0, window=20,
+							max_detectors=16):
+		"""
+		Estado de alarmas y parámetros del detector en un bloque de memoria
+		compartida de formato fijo. La interfaz escribe umbral, algoritmo y 
+		ventana; el proceso de alarma escribe los bits de alarma de cada sensor e 
+		incrementa un contador de generación solo cuando cambian, de modo que
+		la interfaz solo redibuja cuando el estado cambia. El conteo por 
+		detector es informativo y se escribe fuera de la generación.
+		:param n_channels: Número de sensores.
+		:param threshold: Umbral de alarma inicial.
+		:param algorithm: Índice inicial del detector (orden de DETECTORS).
+		:param window: Largo inicial de la ventana de análisis [muestras].
+		:param max_detectors: Máximo de detectores con conteo de alarmas.
+		"""
+		self.n_channels = n_channels					# número de sensores
+		self.dtype = np.dtype([
+			("generation", "<u8"),		# par: estable; impar: escritura en curso
+			("threshold", "<f8"),			# umbral de alarma
+			("algorithm", "<i4"),			# índice del detector seleccionado
+			("window", "<i4"),				# largo de la ventana [muestras]
+			("counts", "<u8", (max_detectors,)),	# alarmas por detector (sin generación)
+			("alarms", "u1", (n_channels,)),			# bits de alarma por sensor
+		], align=True)
+		self.shm = shared_memory.SharedMemory(create=True,
+			size=self.dtype.itemsize)
+		self.owner = True											# el creador libera la memoria
+		self._attach()
+		self.block[()] = 0
+		self.threshold = threshold
+		self.algorithm = algorithm
+		self.window = window
+
+	def _attach(self):
+		"""Crea la vista NumPy (estructura 0-d) sobre la memoria compartida."""
+		self.block = np.ndarray((), self.dtype, self.shm.buf)
+
+	def __getstate__(self):
+		"""Al enviarse a otro proceso solo viaja el nombre de la memoria."""
+		state = self.__dict__.copy()
+		for key in ("shm", "block"):
+			state.pop(key)
+		state["name"] = self.shm.name
+		return state
+
+	def __setstate__(self, state):
+		"""Se conecta a la memoria compartida existente por su nombre."""
+		name = state.pop("name")
+		self.__dict__.update(state)
+		self.owner = False
+		self.shm = shared_memory.SharedMemory(name=name)
+		self._attach()
+
+	def _field(name, doc):
+		"""Propiedad que lee y escribe un campo escalar del bloque."""
+		def get(self):
+			return self.block[name].item()
+		def set(self, value):
+			self.block[name] = value
+		return property(get, set, doc=doc)
+
+	threshold = _field("threshold", "Umbral de alarma.")
+	algorithm = _field("algorithm", "Índice del detector seleccionado.")
+	window = _field("window", "Largo de la ventana de análisis [muestras].")
+	generation = property(lambda self: self.block["generation"].item(),
+		doc="Contador de cambios del estado de alarmas.")
+	del _field
+
+	def publish(self, alarms, counts=()):
+		"""
+		Escribe el conteo por detector y, si cambiaron, los bits de alarma
+		(un solo escritor).
+		:param alarms: Arreglo booleano (n_channels,).
+		:param counts: Alarmas acumuladas por detector.
+		:return: True si las alarmas cambiaron y se publicaron.
+		"""
+		counts = np.asarray(counts, dtype=np.uint64)
+		self.block["counts"][:len(counts)] = counts	# informativo: sin generación
+		alarms = np.asarray(alarms, dtype=np.uint8)
+		if np.array_equal(self.block["alarms"], alarms):
+			return False
+		self.block["generation"] += 1					# impar: escritura en curso
+		self.block["alarms"] = alarms
+		self.block["generation"] += 1					# par: estado estable
+		return True
+
+	def read(self, retries=8):
+		"""
+		Copia consistente del estado de alarmas. Si el escritor murió a mitad
+		de una escritura la generación queda impar para siempre, por lo que 
+		solo se reintenta unas pocas veces cediendo el procesador.
+		:param retries: Intentos antes de rendirse.
+		:return: (generación, alarmas (n_channels,), conteos por detector), o
+			None si no se obtuvo una copia consistente.
+		"""
+		for _ in range(retries):
+			generation = self.generation
+			if generation % 2 == 0:								# sin escritura en curso
+				alarms = self.block["alarms"].copy()
+				counts = self.block["counts"].copy()
+				if self.generation == generation:	# nadie escribió mientras tanto
+					return generation, alarms, counts
+			time.sleep(0)												# ceder al escritor
+		return None
+
+	def close(self):
+		"""Libera la vista y la memoria; el creador además la elimina."""
+		self.block = None
+		self.shm.close()
+		if self.owner:
+			self.shm.unlink()
+
+#%% ===========================================================================
+# Salud y lectura de un puerto serial
+# =============================================================================
+class PortHealth:
+	def __init__(self, port, backoff=0.1, max_backoff=2.0):
+		"""
+		Estado de un puerto: bytes y tramas recibidos, tiempo desde la última 
+		trama, fallas y reconexiones, y la espera (creciente) antes de 
+		reintentar abrirlo.
+		:param port: Nombre del puerto.
+		:param backoff: Espera inicial entre reintentos [s].
+		:param max_backoff: Espera máxima entre reintentos [s].
+		"""
+		self.port = port											# nombre del puerto
+		self.backoff = backoff								# espera inicial
+		self.max_backoff = max_backoff				# espera máxima
+		self.delay = backoff									# espera actual
+		self.connected = True									# conexión abierta
+		self.bytes = 0												# bytes recibidos
+		self.frames = 0												# tramas recibidas
+		self.failures = 0											# fallas del puerto
+		self.reconnects = 0										# reaperturas exitosas
+		self.last_frame = time.monotonic()		# última trama recibida
+		self.retry_at = 0.0										# próximo reintento
+		self.mark = (self.last_frame, 0, 0)		# referencia de las tasas
+
+	def record(self, n_bytes, n_frames):
+		"""Contabiliza una lectura."""
+		self.bytes += n_bytes
+		self.frames += n_frames
+		if n_frames:
+			self.last_frame = time.monotonic()
+
+	@property
+	def silence(self):
+		"""Tiempo desde la última trama [s]."""
+		return time.monotonic() - self.last_frame
+
+	def down(self, gap_after):
+		"""True si el puerto está caído o lleva más de gap_after s sin tramas."""
+		return not self.connected or self.silence > gap_after
+
+	def failed(self):
+		"""Registra una falla y programa el próximo reintento."""
+		self.connected = False
+		self.failures += 1
+		self.retry_at = time.monotonic() + self.delay
+		self.delay = min(2 * self.delay, self.max_backoff)
+
+	def should_retry(self):
+		"""True si ya pasó la espera para reintentar abrir el puerto."""
+		return time.monotonic() >= self.retry_at
+
+	def recovered(self):
+		"""Registra la reapertura del puerto."""
+		self.connected = True
+		self.reconnects += 1
+		self.delay = self.backoff
+		self.last_frame = time.monotonic()
+
+	def rates(self):
+		"""Bytes/s y tramas/s desde la llamada anterior."""
+		now = time.monotonic()
+		t, n_bytes, n_frames = self.mark
+		dt = max(now - t, 1e-9)
+		self.mark = (now, self.bytes, self.frames)
+		return (self.bytes - n_bytes) / dt, (self.frames - n_frames) / dt
+
+	def describe(self):
+		"""Resumen de una línea para el reporte periódico."""
+		byte_rate, frame_rate = self.rates()
+		state = "conectado" if self.connected else "reconectando"
+		return (f"{self.port}: {state}, {byte_rate:.0f} B/s, "
+			f"{frame_rate:.0f} tramas/s, última trama hace {self.silence:.2f} s, "
+			f"{self.failures} fallas, {self.reconnects} reconexiones")
+
+class PortReader(threading.Thread):
+	def __init__(self, index, comm, ring, merge_queue, min_size=1,
+							port=None, open_port=None, stall_timeout=2.0):
+		"""
+		Lector de un puerto: lee, decodifica sus tramas y las entrega a la 
+		etapa de mezcla común, de modo que un puerto lento o en silencio no 
+		retrasa a los demás. Como hilo bloquea en el puerto; sin iniciar el 
+		hilo, poll() lee por turnos. Si el puerto falla (o no envía tramas 
+		durante stall_timeout) lo cierra y lo reabre con espera creciente, 
+		sin afectar a los demás puertos.
+		:param index: Índice del puerto en DataAdquisition.
+		:param comm: Conexión serial abierta (admite URLs como 'loop://').
+		:param ring: ReceiveRing del puerto.
+		:param merge_queue: Cola donde se publican (index, values, bodies, 
+			t_recv), con el instante monotónico de la lectura.
+		:param min_size: Bytes a esperar cuando no hay datos disponibles.
+		:param port: Nombre del puerto para reabrirlo (por defecto comm.port).
+		:param open_port: Función que abre el puerto y retorna la conexión o 
+			None; sin ella el lector termina con la primera falla.
+		:param stall_timeout: Silencio que se trata como falla [s].
+		"""
+		super().__init__(daemon=True)
+		self.index = index							# índice del puerto
+		self.comm = comm								# conexión serial (None: caído)
+		self.ring = ring								# buffer de recepción
+		self.merge_queue = merge_queue	# etapa de mezcla
+		self.min_size = min_size				# tamaño mínimo de lectura
+		self.port = port or comm.port		# nombre del puerto
+		self.open_port = open_port			# reapertura del puerto
+		self.stall_timeout = stall_timeout	# silencio máximo
+		self.health = PortHealth(self.port)	# estado del puerto
+		self.stop_event = threading.Event()	# parada del hilo
+		self.error = None								# última excepción del puerto
+
+	def close_comm(self):
+		"""Cierra la conexión actual sin propagar errores."""
+		if self.comm is not None:
+			try:
+				self.comm.close()
+			except Exception:
+				pass
+			self.comm = None
+
+	def reopen(self):
+		"""Reintenta abrir el puerto si ya pasó la espera."""
+		if not self.health.should_retry():
+			return
+		comm = self.open_port(self.port)
+		if comm is None:
+			self.health.failed()
+			return
+		self.comm = comm
+		self.ring.reset()								# descartar la trama cortada
+		self.health.recovered()
+		print(f"Puerto {self.port} recuperado " + \
+			f"(reconexión {self.health.reconnects})")
+
+	def poll(self):
+		"""
+		Una lectura del puerto (o un intento de reabrirlo).
+		:return: (values, bodies, t_recv) de las tramas nuevas, o None si no 
+			hubo.
+		"""
+		if self.comm is None:						# caído: reintentar
+			self.reopen()
+			return None
+		try:
+			n = self.ring.fill_from(self.comm, self.min_size)	# esperar datos
+			t_recv = time.monotonic()												# instante de recepción
+			values, bodies, _ = self.ring.decode()					# decodificar
+		except Exception as e:					# puerto cerrado o desconectado
+			self.error = e
+			print(f"Error leyendo el puerto {self.port}: {e}")
+			self.close_comm()
+			self.health.failed()
+			return None
+		self.health.record(n, len(bodies))
+		if len(bodies):
+			return values, bodies, t_recv
+		if self.health.silence > self.stall_timeout:	# adaptador colgado
+			print(f"Puerto {self.port} sin tramas; se reabrirá")
+			self.close_comm()
+			self.health.failed()
+		return None
+
+	def run(self):
+		"""Bucle de lectura: bloquea en el puerto hasta su timeout."""
+		while not self.stop_event.is_set():
+			if self.comm is None and self.open_port is None:	# sin recuperación
+				break
+			frames = self.poll()
+			if frames is not None:					# publicar las tramas nuevas
+				self.merge_queue.put((self.index,) + frames)
+			elif self.comm is None:					# esperar el próximo reintento
+				self.stop_event.wait(0.05)
+
+	def stop(self, timeout=1):
+		"""Detiene el hilo y espera a que termine."""
+		self.stop_event.set()
+		if self.is_alive():
+			self.join(timeout)
+
+#%% ===========================================================================
+# Identificación de los puertos
+# =============================================================================
+# Caché puerto -> cuerpo de la última conexión (con el número de serie del
+# adaptador, que se conserva aunque cambie el nombre del puerto)
+PORT_CACHE = os.path.join(os.path.expanduser("~"), ".mfl_puertos.json")
+
+def load_port_cache(path=PORT_CACHE):
+	"""
+	Lee la caché de puertos.
+	:return: Diccionario cuerpo -> {"port": ..., "serial_number": ...}; vacío
+		si no existe o no se puede leer.
 	"""
-	Función para gestionar los buffers de datos y publicarlos en las colas."""
-	min_len = min(len(lst) for lst in buffer.values())
-
-	n_it =  n_it + 1 if printV else n_it
-	if min_len >= threshold:
-		if printV:
-			elapsed = time.time() - start_time_loop
-			print("elapsed time : %.4f, n_it %s =================" % (
-				elapsed, n_it ))
-		buffer_publish = {}
-		for j, data in buffer.items():
-			buffer_publish[j] = data[:threshold]
-			buffer[j] = data[threshold:]
-			if printV:
-				print(f"Para el cuerpo {j} el tamaño es {len(data)}")
-				n_it = 0		
-		if enable.is_set():
-			queue.put(buffer_publish)
-	return queue, buffer, n_it
-
-def convert(value_bin):
-	"""Convierte un valor binario a kVA."""
-	max_volt = 3300  # mV
-	max_bin = 4096
-	V_mV = max_volt * (np.array(value_bin) / max_bin)
-	offset = 1650  # mV
-	sensor_gain = 9  # mV/Gauss
-	B = (V_mV - offset) / sensor_gain / 10000 # Tesla
-
-	mu_0 = 4 * np.pi * 1e-7  # Tesla * m / A
-	return B / mu_0  # A/m
-	#return value_bin
+	try:
+		with open(path, encoding="utf-8") as f:
+			return {int(body): entry for body, entry in json.load(f).items()}
+	except (OSError, ValueError, AttributeError):
+		return {}
+
+def save_port_cache(entries, path=PORT_CACHE):
+	"""Guarda la caché de puertos (cuerpo -> puerto y número de serie)."""
+	try:
+		with open(path, "w", encoding="utf-8") as f:
+			json.dump({str(body): entry for body, entry in entries.items()}, f,
+				indent=1)
+	except OSError as e:
+		print(f"No se pudo guardar la caché de puertos: {e}")
+
+class PortProbe(threading.Thread):
+	def __init__(self, port, open_port, layout, deadline, rx_capacity=4096,
+							min_size=1):
+		"""
+		Hilo que abre un puerto y lee hasta identificar el cuerpo que transmite
+		por él o hasta el plazo. Si lo identifica deja la conexión abierta (con
+		su buffer) para la adquisición; si no, o si la prueba fue abandonada,
+		la cierra.
+		:param port: Nombre del puerto (o URL).
+		:param open_port: Función que abre el puerto y retorna la conexión o None.
+		:param layout: ToolLayout con el formato de la trama.
+		:param deadline: Plazo de la prueba (time.monotonic()).
+		:param rx_capacity: Capacidad del buffer de recepción [bytes].
+		:param min_size: Bytes a esperar cuando no hay datos disponibles.
+		"""
+		super().__init__(daemon=True)
+		self.port = port								# puerto a probar
+		self.open_port = open_port			# apertura del puerto
+		self.layout = layout						# formato de la trama
+		self.deadline = deadline				# plazo global
+		self.rx_capacity = rx_capacity	# capacidad del buffer
+		self.min_size = min_size				# tamaño mínimo de lectura
+		self.comm = None								# conexión identificada
+		self.ring = None								# buffer de recepción
+		self.body = None								# cuerpo identificado
+		self.abandoned = False					# el resultado ya fue recogido
+		self.lock = threading.Lock()		# resultado vs abandono
+
+	def run(self):
+		comm = self.open_port(self.port)
+		if comm is None:								# no se pudo abrir
+			return
+		ring = ReceiveRing(self.rx_capacity, self.layout)
+		body = None
+		try:
+			while body is None and not self.abandoned and \
+					time.monotonic() < self.deadline:
+				ring.fill_from(comm, self.min_size)			# espera el timeout
+				_, bodies, _ = ring.decode()
+				if len(bodies):												# primera trama válida
+					body = int(bodies[-1])
+		except Exception as e:						# puerto desconectado
+			print(f"Error probando el puerto {self.port}: {e}")
+		with self.lock:
+			if body is None or self.abandoned:	# sin cuerpo o ya descartado
+				comm.close()
+				return
+			self.comm, self.ring, self.body = comm, ring, body
+
+	def result(self):
+		"""
+		Abandona la prueba y entrega su resultado; una prueba que termine
+		después cerrará su propia conexión.
+		:return: (comm, ring, body) o (None, None, None).
+		"""
+		with self.lock:
+			self.abandoned = True
+			return self.comm, self.ring, self.body
 
 #%% ===========================================================================
 # Proceso de Adquisición de Datos
@@ -60,15 +1096,44 @@ class DataAdquisition(Process):
   def __init__(self, queue_save, queue_plot,  queue_process, stop_event, 
               enable_plot=Event(), enable_process=Event(), enable_save=Event(),
               acquisition_active=None,
-              real_data=True,
+              real_data=True, rx_capacity=65536, concurrent_readers=True,
+              sensor_gain=9, sensor_offset=1650,
+              replay_path=None, replay_speed=1.0, display=None, layout=None,
+              probe_timeout=2.0, port_cache=PORT_CACHE,
+              gap_after=0.25, stall_timeout=2.0, report_every=10.0,
+              sampling_rate=300, align_window=1.0,
         ):
     """ Inicializa el proceso de adquisición de datos.
-    :param queue_save: Cola para enviar datos al proceso de guardado.
-    :param queue_plot: Cola para enviar datos al proceso de plot.
+    :param queue_save: SharedSampleRing (uint16) para el proceso de guardado.
+    :param queue_plot: SharedSampleRing (float32) para el plot.
+    :param queue_process: SharedSampleRing (float32) para el proceso de alarma.
     :param stop_event: Evento para detener el proceso.
     :param enable_save: Si True se activará los datos para guardar.
     :param enable_plot: Si True se activará el plot en tiempo real.
     :param enable_process: Si True se activará el procesamiento de los datos.
+    :param rx_capacity: Capacidad en bytes del buffer de recepción por puerto.
+    :param concurrent_readers: Si True cada puerto se lee en su propio hilo; 
+      si False los puertos se leen por turnos.
+    :param sensor_gain: Ganancia [mV/Gauss], escalar o una por sensor.
+    :param sensor_offset: Offset [mV], escalar o uno por sensor.
+    :param replay_path: Grabación (.mfl o .csv) a reproducir en lugar de 
+      leer los puertos.
+    :param replay_speed: Velocidad de reproducción (1 tiempo real, N veces 
+      más rápido); 0 o None para reproducir lo más rápido posible.
+    :param display: DisplayDecimator que reduce los datos del plot a la 
+      frecuencia de visualización (por defecto 100 filas/s).
+    :param layout: ToolLayout con los cuerpos, sensores y formato de la 
+      trama (por defecto 3 cuerpos x 10 sensores).
+    :param probe_timeout: Plazo total para identificar los puertos [s].
+    :param port_cache: Archivo JSON con la caché puerto -> cuerpo (None 
+      para no usarla).
+    :param gap_after: Silencio de un puerto tras el cual sus cuerpos se 
+      rellenan con marcas de hueco para que los demás sigan publicando [s].
+    :param stall_timeout: Silencio tras el cual un puerto se reabre [s].
+    :param report_every: Intervalo entre reportes de salud de los puertos [s].
+    :param sampling_rate: Frecuencia de muestreo de los cuerpos [Hz].
+    :param align_window: Ventana del reloj de cada cuerpo para alinearlos en
+      el tiempo [s].
     """
     super().__init__()
     self.queue_save = queue_save        # Fila para guardar los datos
@@ -76,19 +1141,35 @@ class DataAdquisition(Process):
     self.queue_process = queue_process  # Fila para processar los datos
     self.stop_event = stop_event        # evento de los dtaos
 
+    # Descripción de la herramienta (cuerpos, sensores y trama)
+    self.layout = layout if layout is not None else DEFAULT_LAYOUT
+    n_channels = self.layout.n_channels # Sensores de la herramienta
+
     # Formato y parámetros de comunicación
-    self.bin_msm_format = ">10Hc2c"     # Formato del mensaje binario    
+    self.bin_msm_format = self.layout.frame_format  # Formato del mensaje binario
     self.baudrate = 115200              # Velocidad de transmisión
     self.msm_size = struct.calcsize(    # El tamaño del mensaje es el 
       self.bin_msm_format             #   tamaño del struct más la 
-      ) + len(";****".encode())       #   longitud de la marca de fin
+      ) + len(END_MARK)               #   longitud de la marca de fin
 
-    # Lista de puertos Comm disponibles 
-    self.ports = [port.device for port in list_ports.comports()]
+    # Lista de puertos Comm disponibles y número de serie de cada uno
+    ports = list_ports.comports()
+    self.ports = [port.device for port in ports]
+    self.serial_numbers = {port.device: port.serial_number for port in ports}
+    self.probe_timeout = probe_timeout  # Plazo de identificación [s]
+    self.port_cache = port_cache        # Caché puerto -> cuerpo
     
     # Estas variables se inicializarán al abrir los puertos
     self.serial_connections = []        # Lista de conexiones seriales
-    self.buffers = []                   # Buffer para cada conexión
+    self.buffers = []                   # Buffer de recepción por conexión
+    self.rx_capacity = rx_capacity      # Capacidad de cada buffer [bytes]
+    self.concurrent_readers = concurrent_readers  # Un hilo lector por puerto
+    self.readers = []                   # Lectores activos (uno por puerto)
+    self.gap_after = gap_after          # Silencio antes de rellenar [s]
+    self.stall_timeout = stall_timeout  # Silencio antes de reabrir [s]
+    self.report_every = report_every    # Reporte de salud de los puertos [s]
+    self.bodies = list(range(self.layout.n_bodies)) # Cuerpos en los puertos
+    self.merge_queue = None             # Cola de mezcla de los lectores
 
     # Flags para activar el guardado y el plot
     self.enable_save = enable_save          # habilitar fila de guardado 
@@ -98,11 +1179,40 @@ class DataAdquisition(Process):
     # Variable booleana compartida (tipo multiprocessing.Value)
     self.acquisition_active = acquisition_active # Monitorea la adquisición de datos
 
-    # definir filtros para cada cuerpo
-    self.filters = {i: LowPassFilter() for i in range(3)}
+    # banco de filtros con estado propio para todos los sensores
+    self.filters = FilterBank(n_channels=n_channels, sf=sampling_rate)
+    # alineación de los cuerpos en una grilla de tiempo común
+    self.aligner = FrameAligner(self.layout.n_bodies, sampling_rate,
+      align_window)
+    self.warmup_frames = 100            # Tramas descartadas al arrancar
+    # conversión a A/m con la calibración de cada sensor
+    self.converter = SensorConverter(n_channels, sensor_gain, sensor_offset)
+    # reducción de los datos del plot a la frecuencia de visualización
+    self.display = display if display is not None else \
+      DisplayDecimator(n_channels)
     
     # Si es True, usa datos reales; si es False, simula datos
     self.real_data = real_data
+    # Reproducción de una grabación en lugar de los puertos
+    self.replay_path = replay_path      # ruta de la grabación
+    self.replay_speed = replay_speed    # múltiplo del tiempo real
+
+  def open_port(self, port):
+    """Abre un puerto serial (o URL); retorna la conexión o None."""
+    try:                                  # intente abrir el puerto
+      comm = serial.serial_for_url(       #  abrir el puerto (o URL)
+        port,															#  puerto					
+        baudrate=self.baudrate,						#  velocidad de transmisión
+        parity=serial.PARITY_NONE,				#  paridad
+        stopbits=serial.STOPBITS_ONE,			#  bits de parada
+        bytesize=serial.EIGHTBITS,				#	tamaño de los bytes	
+        timeout=0.1												#  tiempo de espera										
+      )
+      print(f"Puerto {port} abierto exitosamente.")
+      return comm
+    except Exception as e:					# si no se puede abrir el puerto
+      print(f"No se pudo abrir el puerto {port}: {e}")
+      return None
 
   def open_serial_ports(self):
     """Abre los puertos serial disponibles y crea un buffer para cada uno."""
@@ -110,143 +1220,340 @@ class DataAdquisition(Process):
     self.ports = []                         # nuevos puertos
     self.serial_connections = []            # buffers para almecenamiento
     for port in ports_orig:                 # puertos disponibles
-      try:                                  # intente abrir los puertos
-        comm = serial.Serial(               #  abrir el puerto
-          port=port,												#  puerto					
-          baudrate=self.baudrate,						#  velocidad de transmisión
-          parity=serial.PARITY_NONE,				#  paridad
-          stopbits=serial.STOPBITS_ONE,			#  bits de parada
-          bytesize=serial.EIGHTBITS,				#	tamaño de los bytes	
-          timeout=0.1												#  tiempo de espera										
-        )
+      comm = self.open_port(port)
+      if comm is not None:
         self.serial_connections.append(comm) 	#	añadir la conexión
         self.ports.append(port)								# añadir el puerto
-        print(f"Puerto {port} abierto exitosamente.")
-      except Exception as e:					# si no se puede abrir el puerto
-        print(f"No se pudo abrir el puerto {port}: {e}")
-    self.buffers = [bytearray() for _ in self.ports]
+    self.buffers = [ReceiveRing(self.rx_capacity, self.layout)
+                    for _ in self.ports]
 
   def close_serial_ports(self):
     """Cierra todas las conexiones serial."""
     for comm in self.serial_connections:		# para cada conexión
       comm.close()													# cerrar la conexión
       print(f"Puerto {comm.port} cerrado exitosamente.")
+    self.serial_connections = []						# reabrir en la próxima conexión
 
-  def decode_serial_message(self, message):
-    """Decodifica el mensaje binario recibido."""
-    value = struct.unpack(self.bin_msm_format, message)	# decodificar el mensaje
-    return list(value[:10]), int(value[12])	# retornar los valores y el cuerpo
-
-  def read_port_data(self, i):
-    """
-    Lee datos del puerto i y busca el delimitador b';****' 
-    para extraer un mensaje completo.
-    """
-    comm = self.serial_connections[i]										# conexión serial
-    data = comm.read(comm.in_waiting or self.msm_size)	# leer los datos
-    self.buffers[i].extend(data)												# añadir los datos al buffer
-    end = self.buffers[i].find(b";****")							# buscar el delimitador				
-    values, body = None, None													# valores y cuerpo
-    if end >= 0:																			# si se encuentra el delimitador
-      message = self.buffers[i][:end]									# extraer el mensaje
-      # Actualizamos el buffer eliminando el mensaje leído y el delimitador
-      self.buffers[i] = self.buffers[i][end + len(b";****"):]	# actualizar el buffer
-      if len(message) == self.msm_size - len(b";****"):	# si el mensaje tiene el tamaño correcto
-        # decodificar el mensaje y retornar  los valores y el cuerpo
-        return self.decode_serial_message(message)		
-    return values, body	  # retornar los valores y el cuerpo como None
+  def start_port_readers(self):
+    """
+    Crea un lector por puerto; con lectores concurrentes cada uno corre en 
+    su propio hilo y alimenta la cola de mezcla.
+    """
+    self.merge_queue = queue.Queue()		# etapa de mezcla común
+    self.readers = [
+      PortReader(i, comm, self.buffers[i], self.merge_queue, self.msm_size,
+        port=self.ports[i], open_port=self.open_port,
+        stall_timeout=self.stall_timeout)
+      for i, comm in enumerate(self.serial_connections)]
+    if self.concurrent_readers:					# iniciar los hilos lectores
+      for reader in self.readers:
+        reader.start()
+
+  def stop_port_readers(self):
+    """Detiene los lectores antes de cerrar los puertos."""
+    for reader in self.readers:
+      reader.stop_event.set()						# señalar a todos primero
+    for reader in self.readers:
+      reader.stop()										# esperar a cada uno
+    # conexiones vigentes (los lectores pudieron reabrirlas)
+    self.serial_connections = [reader.comm for reader in self.readers
+                               if reader.comm is not None]
+    self.readers = []
+
+  def collect_frames(self, timeout=0.1):
+    """
+    Entrega los bloques de tramas recibidos desde la última llamada.
+    Con lectores concurrentes espera en la cola de mezcla hasta timeout y 
+    luego la vacía; en caso contrario lee los puertos por turnos.
+    :return: lista de (values, bodies, t_recv).
+    """
+    if not self.concurrent_readers:			# lectura por turnos
+      frames = [reader.poll() for reader in self.readers]
+      return [block for block in frames if block is not None]
+    blocks = []
+    try:
+      blocks.append(self.merge_queue.get(timeout=timeout)[1:])	# esperar datos
+      while True:												# vaciar lo pendiente
+        blocks.append(self.merge_queue.get_nowait()[1:])
+    except queue.Empty:
+      pass
+    return blocks
+
+  def create_publish_buffers(self):
+    """Crea los buffers de publicación de guardado, plot y procesamiento."""
+    shape = dict(n_bodies=self.layout.n_bodies,					# columnas de los
+      n_sensors=self.layout.n_sensors)									#  buffers
+    self.buffer_acquisition = PublishBuffer(300, dtype=np.uint16,  # 300 filas
+      enable=self.enable_save, verbose=True, fill=GAP_CODE,
+      rate=self.aligner.sf, **shape)
+    plot_rows = max(1, int(self.display.rate // 20))		# ~50 ms por bloque
+    self.buffer_plot = PublishBuffer(plot_rows, capacity=80 * plot_rows,
+      enable=self.enable_plot, fill=np.nan, **shape)
+    self.display.reset()																# grupos desde cero
+    self.buffer_process = PublishBuffer(1, enable=self.enable_process,	# 1 fila
+      fill=np.nan, **shape)
+    for buffer in (self.buffer_acquisition, self.buffer_plot, self.buffer_process):
+      buffer.active[:] = False													# alinear solo los
+      buffer.active[self.bodies] = True									#  cuerpos identificados
+    self.aligner.reset()																# grilla desde cero
+    self.total_iter = np.zeros(self.layout.n_bodies, dtype=np.int64)	# por cuerpo
+
+  def publish_buffers(self):
+    """Publica los bloques completos de cada buffer en su anillo."""
+    if self.buffer_acquisition.start_time is None:
+      self.buffer_acquisition.start_time = self.start_time()
+    self.buffer_plot.publish(self.queue_plot)						# bloques de ~50 ms
+    self.buffer_process.publish(self.queue_process)			# bloques de 1
+    self.buffer_acquisition.publish(self.queue_save)		# bloques de 300
+
+  def start_time(self):
+    """
+    Tiempo (época) [s] de la primera fila publicada: el origen de la grilla
+    de tiempo más el arranque del filtro o, sin tramas alineadas (simulación
+    y reproducción), el instante actual menos las filas acumuladas.
+    """
+    if self.aligner.t0 is not None:					# reloj monotónico -> época
+      return self.aligner.t0 + time.time() - time.monotonic() + \
+        self.warmup_frames / self.aligner.sf
+    return time.time() - self.buffer_acquisition.counts.max() / self.aligner.sf
+
+  def process_frames(self, block, bodies):
+    """Filtra, convierte y acumula un bloque de tramas en los buffers."""
+    for body in np.unique(bodies).tolist():		# tramas de cada cuerpo
+      values = block[bodies == body]					# lecturas crudas (n, sensores)
+      channels = self.layout.body_slice(body)	# sensores del cuerpo
+      filtered_values = self.filters.apply(values, channels)	# filtrar el bloque
+      scaled_values = self.converter.convert(filtered_values, channels)	# a A/m
+      self.aligner.advance(body, len(values))	# casillas de la grilla
+
+      # descartar las primeras tramas de cada cuerpo mientras el filtro se 
+      # estabiliza (por casillas, de modo que los cuerpos siguen alineados)
+      skip = max(0, self.warmup_frames - int(self.total_iter[body]))
+      self.total_iter[body] += len(values)		# incrementar el total de datos
+      if skip >= len(values):
+        continue
+      # llenar los buffers de publicación paralelos
+      self.buffer_acquisition.append(body, values[skip:])	# datos crudos
+      if self.enable_plot.is_set():						# si se activa el plot
+        self.buffer_plot.append(body,										# datos escalados
+          self.display.apply(scaled_values[skip:], channels))	#  y reducidos
+      if self.enable_process.is_set():				# si se activa el procesamiento
+        self.buffer_process.append(body, filtered_values[skip:])	# datos filtrados
+
+  def pad_body(self, body, n):
+    """
+    Rellena n muestras perdidas de un cuerpo con marcas de hueco (GAP_CODE 
+    en los datos crudos, NaN en los de plot y alarma), de modo que los demás
+    cuerpos siguen alineados y publicando.
+    """
+    if n <= 0:
+      return
+    channels = self.layout.body_slice(body)		# sensores del cuerpo
+    self.filters.reset(channels)						# reiniciar al volver los datos
+    self.aligner.advance(body, n)						# casillas de la grilla
+    skip = max(0, self.warmup_frames - int(self.total_iter[body]))	# arranque
+    self.total_iter[body] += n
+    n -= min(n, skip)
+    if n == 0:
+      return
+    shape = (n, self.layout.n_sensors)
+    self.buffer_acquisition.append(body, np.full(shape, GAP_CODE, np.uint16))
+    if self.enable_plot.is_set():						# filas de plot que se pierden
+      rows = self.display.skip(n, channels)
+      self.buffer_plot.append(body, np.full((rows, shape[1]), np.nan))
+    if self.enable_process.is_set():
+      self.buffer_process.append(body, np.full(shape, np.nan))
+
+  def merge_frames(self, block, bodies, t_recv):
+    """
+    Ubica las tramas de una lectura en la grilla de tiempo común antes de 
+    acumularlas: rellena con huecos los cortes, repite muestras para 
+    compensar la deriva del reloj y descarta las tramas de más, de modo que
+    cada fila publicada reúne muestras simultáneas de los cuerpos.
+    :param t_recv: Instante monotónico de la lectura.
+    """
+    for body in np.unique(bodies).tolist():		# tramas de cada cuerpo
+      values = block[bodies == body]
+      shift = self.aligner.align(body, len(values), t_recv)
+      if self.aligner.is_outage(shift):			# corte: huecos y filtro nuevo
+        self.pad_body(body, shift)
+      elif shift > 0:												# deriva: repetir la primera
+        values = np.concatenate((np.repeat(values[:1], shift, axis=0), values))
+      elif shift < 0:												# tramas de más
+        values = values[-shift:]
+      if len(values):
+        self.process_frames(values, np.full(len(values), body))
+
+  def process_rows(self, body, rows):
+    """
+    Procesa las muestras (n, sensores) de un cuerpo que pueden contener 
+    filas de hueco (GAP_CODE, p. ej. de una grabación): los tramos con datos
+    se filtran y los huecos se rellenan.
+    """
+    gap = (rows == GAP_CODE).all(axis=1)			# filas perdidas
+    if not gap.any():
+      self.process_frames(rows, np.full(len(rows), body))
+      return
+    edges = np.flatnonzero(np.diff(gap.astype(np.int8))) + 1	# cambios
+    for run in np.split(np.arange(len(rows)), edges):					# tramos
+      if gap[run[0]]:
+        self.pad_body(body, len(run))
+      else:
+        self.process_frames(rows[run], np.full(len(run), body))
+
+  def pad_down_ports(self):
+    """
+    Rellena con huecos los cuerpos de los puertos caídos o en silencio 
+    hasta alcanzar al cuerpo más adelantado de los puertos sanos.
+    """
+    down = [self.bodies[reader.index] for reader in self.readers
+            if reader.health.down(self.gap_after)]
+    if not down:
+      return
+    slots = self.aligner.next									# casillas por cuerpo
+    up = [body for body in self.bodies if body not in down]
+    if not up:																# nada que alinear
+      return
+    lead = int(slots[up].max())								# cuerpo más adelantado
+    for body in down:
+      self.aligner.restart(body)							# reloj nuevo al volver
+      self.pad_body(body, lead - int(slots[body]))
+
+  def report_health(self):
+    """
+    Imprime el estado de cada puerto y el desfase, las tramas perdidas y 
+    las descartadas de cada cuerpo cada report_every segundos.
+    """
+    now = time.monotonic()
+    if now - self.last_report < self.report_every:
+      return
+    self.last_report = now
+    for reader in self.readers:
+      print(reader.health.describe())
+    for body in self.bodies:
+      print(self.aligner.describe(body))
+
+  def cached_port(self, entry):
+    """
+    Puerto actual de una entrada de la caché: el que tiene el mismo número 
+    de serie o, si no lo hay, el mismo nombre; None si ya no existe.
+    """
+    serial_number = entry.get("serial_number")
+    if serial_number:
+      for port, number in self.serial_numbers.items():
+        if number == serial_number:
+          return port
+    return entry.get("port") if entry.get("port") in self.ports else None
+
+  def start_probes(self, ports, deadline):
+    """
+    Inicia en paralelo la prueba de varios puertos.
+    :param ports: Puertos a probar.
+    :param deadline: Plazo de las pruebas (time.monotonic()).
+    :return: Lista de PortProbe.
+    """
+    probes = [PortProbe(port, self.open_port, self.layout, deadline,
+      self.rx_capacity, self.msm_size) for port in ports]
+    for probe in probes:												# probar todos a la vez
+      probe.start()
+    return probes
+
+  def wait_probes(self, probes, until):
+    """
+    Espera hasta until, hasta que terminen todas las pruebas o hasta 
+    identificar todos los cuerpos.
+    """
+    while time.monotonic() < until and \
+        any(probe.is_alive() for probe in probes) and \
+        len({probe.body for probe in probes} - {None}) < self.layout.n_bodies:
+      time.sleep(0.005)
+
+  def collect_probes(self, probes, found):
+    """
+    Recoge (o abandona) las pruebas.
+    :param found: Diccionario cuerpo -> (puerto, conexión, buffer) que se 
+      completa con los cuerpos identificados.
+    """
+    for probe in probes:
+      comm, ring, body = probe.result()
+      if comm is None:
+        continue
+      if body in found:													# cuerpo repetido
+        print(f"El puerto {probe.port} repite el cuerpo {body + 1}")
+        comm.close()
+        continue
+      found[body] = (probe.port, comm, ring)
+      print(f"El puerto {probe.port} corresponde al cuerpo {body + 1}")
 
   def identify_comm_mfl(self):
     """
-    Identifica qué puerto corresponde a cada cuerpo leyendo mensajes 
-    hasta obtener 3 identificaciones.Se espera que cada mensaje incluya en 
-    el campo 'body' la identificación del cuerpo.
-    """
-    port_to_body = {}					# diccionario de puerto a cuerpo
-    max_attempts = 50					# número máximo de intentos
-    self.open_serial_ports()	# abrir los puertos	
-
-    while len(port_to_body) < 3:	# mientras no se identifiquen los 3 cuerpos
-      for i in range(len(self.ports)):	# para cada puerto
-        port = self.ports[i]						# puerto
-        comm = self.serial_connections[i] # conexión
-        # Si el puerto ya fue asignado, se omite
-        if port in port_to_body.values(): 	# si el puerto ya fue asignado	
-          continue													# continuar
-        if len(port_to_body) >= 3:	# si ya se identificaron los 3 cuerpos
-          break															# salir										
-        attempts = 0								# intentos
-        while attempts < max_attempts:    # mientras no se alcance el número máximo de intentos
-          _ , body = self.read_port_data(i) # leer los datos del puerto
-          if body is not None:					# si se identifica el cuerpo
-            port_to_body[body] = port				# añadir el puerto al diccionario
-            print(f"El puerto {port} corresponde al cuerpo {body + 1}")
-            comm.close()										# cerrar la conexión
-            break														# salir									
-          attempts += 1									# incrementar los intentos
-          if attempts == max_attempts and port not in port_to_body.values():
-            print("No se pudo identificar un cuerpo para el puerto" + \
-              f"{port} después de {max_attempts} intentos.")
-      # Ordenamos los puertos según la identificación de cada cuerpo
-      self.ports = [port_to_body[i] for i in sorted(port_to_body.keys())]
-      print(f"Los puertos identificados en orden son {self.ports}")
+    Identifica qué puerto corresponde a cada cuerpo. Primero prueba los 
+    puertos guardados en la caché y, si en un cuarto del plazo faltan 
+    cuerpos, prueba también todos los demás en paralelo; las pruebas de la 
+    caché siguen hasta el plazo global (cada puerto se abre una sola vez y 
+    un puerto muerto no retrasa a los demás). Los puertos identificados 
+    quedan abiertos para la adquisición y la caché se actualiza; si un 
+    cuerpo no aparece se continúa sin él.
+    """
+    start = time.monotonic()					# inicio de la identificación
+    deadline = start + self.probe_timeout	# plazo global
+    found = {}												# cuerpo -> (puerto, conexión, buffer)
+    cache = load_port_cache(self.port_cache) if self.port_cache else {}
+    cached = [self.cached_port(entry) for entry in cache.values()]
+    cached = [port for port in dict.fromkeys(cached) if port is not None]
+    probes = self.start_probes(cached, deadline)	# caché: hasta el plazo
+    self.wait_probes(probes, start + self.probe_timeout / 4)
+    if len({probe.body for probe in probes} - {None}) < self.layout.n_bodies:
+      probes += self.start_probes(					# buscar en los demás puertos
+        [port for port in self.ports if port not in cached], deadline)
+      self.wait_probes(probes, deadline)
+    self.collect_probes(probes, found)
+
+    missing = sorted(set(range(self.layout.n_bodies)) - set(found))
+    if missing:
+      print("No se identificaron los cuerpos " + \
+        f"{[body + 1 for body in missing]}; se continúa sin ellos.")
+    # Ordenamos los puertos según la identificación de cada cuerpo
+    self.bodies = sorted(found)
+    self.ports = [found[body][0] for body in self.bodies]
+    self.serial_connections = [found[body][1] for body in self.bodies]
+    self.buffers = [found[body][2] for body in self.bodies]
+    print(f"Los puertos identificados en orden son {self.ports} " + \
+      f"({time.monotonic() - start:.2f} s)")
+    if self.port_cache and found:			# recordar para la próxima conexión
+      cache.update({body: {"port": port,
+        "serial_number": self.serial_numbers.get(port)}
+        for body, (port, _, _) in found.items()})
+      save_port_cache(cache, self.port_cache)
 
   def simulate_data_acquisition(self):
     """
-    Simula la adquisición de datos generando valores aleatorios para 3 cuerpos.
+    Simula la adquisición de datos generando valores aleatorios para todos 
+    los cuerpos de la herramienta.
     """
     # Informar que la adquisición está activa
     if self.acquisition_active is not None:
       self.acquisition_active.value = True
 
-    n_bodies = 3  # Número de cuerpos simulados
-    buffer_acquisition = {i: [] for i in range(n_bodies)}
-    buffer_plot = {i: [] for i in range(n_bodies)}
-    buffer_process = {i: [] for i in range(n_bodies)}
-    
-    # Variables para el control de la publicación de datos
-    n_it = 0
-    start_time_loop = time.time()
-    self.total_iter = 0
+    n_bodies = self.layout.n_bodies   # Número de cuerpos simulados
+    n_sensors = self.layout.n_sensors # Sensores por cuerpo
+    # Rango de valores de cada cuerpo (se repiten si hay más de 3 cuerpos)
+    ranges = [(2100, 2800), (2100, 3000), (2600, 3300)]
+    self.create_publish_buffers()   # Buffers de publicación
 
     print("Iniciando simulación de datos...")
 
     # Bucle principal de simulación de datos
     while not self.stop_event.is_set():
-      for body in range(n_bodies):
-        # Generar 10 valores aleatorios por sensor (simulando los 10 sensores)
-        # Valores entre 2048 y 4096 (rango típico para los datos reales)
-        if body == 0:
-          values = np.random.randint(2100, 2800, 10).tolist()
-        elif body == 1:
-          values = np.random.randint(2100, 3000, 10).tolist()
-        else:
-          values = np.random.randint(2600, 3300, 10).tolist()
-
-        # Aplicar filtro a los datos simulados
-        filtered_values = list(self.filters[body].apply(values))
-        
-        # Convertir los valores filtrados
-        scaled_values = convert(filtered_values)
-
-        self.total_iter += 1
-        if self.total_iter > 100:  # Comenzar a llenar buffers después de 100 iteraciones
-          buffer_acquisition[body].append(values)
-          if self.enable_plot.is_set():
-            buffer_plot[body].append(scaled_values)
-          if self.enable_process.is_set():
-            buffer_process[body].append(filtered_values)
-
-      # Gestión de buffers (igual que en datos reales)
-      self.queue_plot, buffer_plot, _ = buffer_management(
-        buffer_plot, self.enable_plot, self.queue_plot, 15)
-
-      self.queue_process, buffer_process, _ = buffer_management(
-        buffer_process, self.enable_process, self.queue_process, 1)
-
-      self.queue_save, buffer_acquisition, n_it = buffer_management(
-        buffer_acquisition, self.enable_save, self.queue_save, 300,
-        True, n_it, start_time_loop)
+      # Generar un valor aleatorio por sensor en cada cuerpo
+      # Valores entre 2048 y 4096 (rango típico para los datos reales)
+      block = np.vstack([np.random.randint(*ranges[body % 3], n_sensors)
+                         for body in range(n_bodies)]).astype(np.uint16)
+      bodies = np.arange(n_bodies)            # una trama por cuerpo
+
+      # Filtrar, convertir y acumular igual que con datos reales
+      self.process_frames(block, bodies)
+      self.publish_buffers()  # Gestión de buffers (igual que en datos reales)
 
       # Simular la velocidad de adquisición real
       time.sleep(1/300)  # 10ms de delay para simular la velocidad de datos
@@ -255,6 +1562,75 @@ class DataAdquisition(Process):
     if self.acquisition_active is not None:
       self.acquisition_active.value = False
 
+  def check_recording_layout(self, reader):
+    """
+    Verifica que la grabación corresponda a la herramienta configurada: los
+    filtros, el conversor, el plot y los buffers tienen la forma del layout.
+    El encabezado .mfl indica cuerpos y sensores; de un CSV solo se conoce 
+    el número de columnas.
+    :raises ValueError: Si la grabación tiene otra forma.
+    """
+    header = reader.header
+    recorded = (header.get("n_bodies"), header.get("n_sensors"))
+    expected = (self.layout.n_bodies, self.layout.n_sensors)
+    if reader.n_channels != self.layout.n_channels or \
+        (recorded[0] is not None and recorded != expected):
+      shape = f"{recorded[0]}x{recorded[1]}" if recorded[0] is not None \
+        else f"{reader.n_channels} columnas"
+      raise ValueError(f"{self.replay_path} tiene {shape} sensores y la "
+        f"herramienta configurada {expected[0]}x{expected[1]}; use --bodies "
+        "y --sensors con la forma de la grabación")
+
+  def replay_data_acquisition(self, rows=30, report_every=5.0):
+    """
+    Reproduce una grabación por el mismo camino que los datos reales 
+    (filtro, conversión y buffers de publicación) e informa el rendimiento.
+    :param rows: Muestras por cuerpo entregadas en cada paso (30 = 0.1 s).
+    :param report_every: Intervalo entre reportes de rendimiento [s].
+    """
+    reader = open_recording(self.replay_path)	# .mfl o .csv
+    self.check_recording_layout(reader)				# misma herramienta
+    if self.acquisition_active is not None:
+      self.acquisition_active.value = True
+
+    n_bodies = self.layout.n_bodies						# cuerpos grabados
+    self.bodies = list(range(n_bodies))				# cuerpos a publicar
+    self.create_publish_buffers()							# buffers de publicación
+    rate = reader.sampling_rate								# frecuencia de muestreo
+    speed = self.replay_speed or 0						# 0: lo más rápido posible
+    total = len(reader)												# muestras de la grabación
+    print(f"Reproduciendo {self.replay_path}: {total / rate:.1f} s a " + \
+      (f"{speed:g}x" if speed else "máxima velocidad"))
+
+    start = last_report = time.perf_counter()	# tiempos de referencia
+    sample = 0																# muestra actual
+    while sample < total and not self.stop_event.is_set():
+      data = reader.read_rows(sample, min(sample + rows, total))	# (n, canales)
+      n = len(data)
+      # misma forma que las tramas recibidas: un bloque (n, sensores) por cuerpo
+      for body in range(n_bodies):								# con huecos grabados
+        self.process_rows(body, data[:, self.layout.body_slice(body)])
+      self.publish_buffers()									# publicar los bloques completos
+      sample += n
+
+      now = time.perf_counter()
+      if speed:																# esperar el tiempo de la grabación
+        delay = start + sample / (rate * speed) - now
+        if delay > 0:
+          time.sleep(delay)
+      if now - last_report >= report_every:		# reporte periódico
+        last_report = now
+        print(f"Reproducción: {sample / total:.0%}, " + \
+          f"{sample / (now - start):.0f} muestras/s")
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Reproducción terminada: {sample} muestras en {elapsed:.2f} s " + \
+      f"({sample / elapsed:.0f} muestras/s, {sample / rate / elapsed:.1f}x " + \
+      "tiempo real)")
+    reader.close()
+    if self.acquisition_active is not None:
+      self.acquisition_active.value = False
+
   def publish_data_loop(self):
     """
     Lee continuamente de los puertos, acumula datos y, cuando se tiene 
@@ -264,51 +1640,28 @@ class DataAdquisition(Process):
     if self.acquisition_active is not None:
       self.acquisition_active.value = True
 
-    n_ports = len(self.ports)				# número de puertos
-    buffer_acquisition = {i: [] for i in range(n_ports)}	# buffer de adquisición
-    buffer_plot = {i: [] for i in range(n_ports)}			# buffer de plot
-    buffer_process = {i: [] for i in range(n_ports)}	# buffer de procesamiento
-    
-    #	Variables para el control de la publicación de datos
-    n_it = 0												# número de iteraciones
-    start_time_loop = time.time()		# tiempo de inicio del bucle
+    self.create_publish_buffers()		# buffers de publicación
 
-    # Reabrir los puertos para la adquisición
-    self.open_serial_ports()				# abrir los puertos
-    self.total_iter = 0						# total de datos
+    # Reusar los puertos abiertos al identificarlos (o abrirlos)
+    if not self.serial_connections:
+      self.open_serial_ports()				# abrir los puertos
+    self.start_port_readers()				# un lector por puerto
+    self.last_report = time.monotonic()	# último reporte de salud
     # Bucle principal de adquisición de datos
     while not self.stop_event.is_set():	# mientras no se reciba la señal de paro
-      for i in range(n_ports):				# para cada puerto
-        values, body = self.read_port_data(i)  # Leer datos de cada puerto
-        if body is not None:					# si se identifica el cuerpo
-          filtered_values = list(self.filters[body].apply(values) ) # Filtrar los datos
-          scaled_values = convert(filtered_values)	# convertir los valore
-
-          self.total_iter += 1						# incrementar el total de datos
-          if self.total_iter>100:				# si se tienen más de 1000 datos
-            # llenar las colas de datos paralelas
-            buffer_acquisition[body].append(values)	# añadir los valores al buffer de adquisición
-            if self.enable_plot.is_set():					# si se activa el plot
-              buffer_plot[body].append(scaled_values)		# añadir los valores escalados al plot
-            if self.enable_process.is_set():			# si se activa el procesamiento
-              buffer_process[body].append(filtered_values)	# añadir los valores al buffer de procesamiento
-
-      self.queue_plot, buffer_plot, _ =  buffer_management( # manejar el buffer de plot 
-        buffer_plot, self.enable_plot, self.queue_plot, 15)	#  con 10 datos
-
-      self.queue_process, buffer_process, _ =  buffer_management(		# manejar el buffer de procesamiento
-        buffer_process, self.enable_process, self.queue_process, 1)	# con 1 dato
-
-      self.queue_save, buffer_acquisition, n_it =  buffer_management( # manejar el buffer de adquisición
-        buffer_acquisition, self.enable_save, self.queue_save, 300,   # con 300 datos
-        True,   #True,  # seleccione si imprime o no. 
-        n_it, start_time_loop)																	# imprimir los datos
-
-      time.sleep(0.002)													# esperar 1 ms
+      for block, bodies, t_recv in self.collect_frames():	# tramas recibidas
+        self.merge_frames(block, bodies, t_recv)	# alinear en el tiempo y acumular
+      self.pad_down_ports()										# huecos de puertos caídos
+      self.publish_buffers()									# publicar los bloques completos
+      self.report_health()										# salud de los puertos
+
+      if not self.concurrent_readers:	# los lectores ya bloquean en los puertos
+        time.sleep(0.002)												# esperar 2 ms
     else:	# si se recibe la señal de paro
       # Informar que la adquisición está inactiva
       if self.acquisition_active is not None:
         self.acquisition_active.value = False
+    self.stop_port_readers()										# detener los lectores
     self.close_serial_ports()										# cerrar los puertos
 
   def run(self):
@@ -316,196 +1669,483 @@ class DataAdquisition(Process):
     Método principal del proceso: primero identifica los puertos asociados a cada cuerpo y luego
     inicia el bucle de publicación de datos.
     """
-    if self.real_data:
+    if self.replay_path:
+      self.replay_data_acquisition()						# reproducir una grabación
+    elif self.real_data:
       self.identify_comm_mfl()									# identificar los puertos
       self.publish_data_loop()									# publicar los datos
     else:
       print("Simulando datos de adquisición...")
       self.simulate_data_acquisition()
 
+#%% ===========================================================================
+# Procesos consumidores del anillo compartido
+# =============================================================================
+class RingConsumer(Process, ABC):
+	drain_on_stop = False		# procesar las filas pendientes al detenerse
+
+	def __init__(self, ring, consumer, run_event, timeout=0.25, batch_rows=None):
+		"""
+		Base de los procesos que consumen un SharedSampleRing. Bloquea en el
+		anillo (sin consumir CPU) hasta que hay datos o se pide detenerlo,
+		procesa todas las filas pendientes en lotes y termina en a lo sumo
+		`timeout` segundos después de limpiar run_event (de inmediato con stop).
+		:param ring: SharedSampleRing a consumir.
+		:param consumer: Nombre del consumidor en el anillo.
+		:param run_event: Evento que mantiene vivo el proceso.
+		:param timeout: Espera máxima en el anillo antes de revisar run_event [s].
+		:param batch_rows: Filas máximas por lote; None para todas las pendientes.
+		"""
+		super().__init__()
+		self.ring = ring								# anillo compartido
+		self.consumer = consumer				# nombre del consumidor
+		self.run_event = run_event			# evento de ejecución
+		self.timeout = timeout					# espera máxima por datos
+		self.batch_rows = batch_rows		# tamaño máximo de lote
+
+	def setup(self):
+		"""Se ejecuta en el proceso antes de consumir datos."""
+
+	@abstractmethod
+	def process(self, block):
+		"""
+		Procesa un lote de filas (cada subclase debe definirlo).
+		:param block: Vista (n, canales) del anillo; válida hasta la siguiente
+			lectura.
+		"""
+
+	def idle(self):
+		"""Se ejecuta cuando pasa `timeout` sin datos."""
+
+	def teardown(self):
+		"""Se ejecuta en el proceso al terminar (también tras un error)."""
+
+	def drain(self):
+		"""Procesa las filas pendientes sin bloquear."""
+		while not self.ring.empty(self.consumer):
+			self.process(self.ring.get_nowait(self.consumer, self.batch_rows))
+
+	def run(self):
+		""" Método principal del proceso. """
+		self.ring.seek_end(self.consumer)		# empezar con datos nuevos
+		self.setup()
+		try:
+			while self.run_event.is_set():
+				try:
+					block = self.ring.get(self.consumer, timeout=self.timeout,
+						max_rows=self.batch_rows)			# esperar datos o la señal
+				except queue.Empty:
+					self.idle()
+					continue
+				try:
+					self.process(block)
+					self.drain()									# el resto de lo pendiente
+				except Exception as e:
+					print(f"Error en {type(self).__name__}: {e}")
+			if self.drain_on_stop:
+				self.drain()
+		finally:
+			self.teardown()
+
+	def stop(self, timeout=None):
+		"""
+		Pide al proceso que termine, despierta su espera y lo espera.
+		:param timeout: Espera máxima por el proceso [s].
+		"""
+		self.run_event.clear()
+		self.ring.wake()
+		if self.is_alive():
+			self.join(timeout)
+
 #%% ===========================================================================
 # Proceso de Guardado de Datos en CSV
 # =============================================================================
-class DataSaver(Process):
-	def __init__(self, queue_save, run_event, name=""):
+class DataSaver(RingConsumer):
+	drain_on_stop = True		# guardar lo recibido antes de la parada
+
+	def __init__(self, queue_save, run_event, name="", file_format="mfl",
+							compression=None, metadata=None, layout=None, sampling_rate=300):
 		""" 
-		Proceso que guarda en un archivo CSV los datos que recibe de la cola.
-		:param queue_save: Cola de datos a guardar.
+		Proceso que guarda en un archivo los datos que recibe del anillo.
+		:param queue_save: SharedSampleRing con los datos crudos a guardar.
 		:param run_event: Evento para iniciar o detener el proceso.
-		:param name: Nombre del archivo CSV. Si no se especifica, 
+		:param name: Nombre del archivo. Si no se especifica, 
 			se usará la fecha y hora actual.
+		:param file_format: "mfl" (binario, ver recording.py) o "csv".
+		:param compression: None o "zlib" para comprimir cada bloque (mfl).
+		:param metadata: Datos adicionales del encabezado (p. ej. el filtro).
+		:param layout: ToolLayout de la herramienta (columnas del archivo).
+		:param sampling_rate: Frecuencia de muestreo [Hz] de la grabación.
 		"""
-		super().__init__()
+		super().__init__(queue_save, "saver", run_event)
+		self.layout = layout if layout is not None else DEFAULT_LAYOUT
 		self.queue_save = queue_save
-		self.run_event = run_event
 		self.header_written = False
 		self.writer = None
 		self.csv_file = None
 		self.name = name if len(name)==0 else "_" + name 
+		self.file_format = file_format	# formato del archivo
+		self.compression = compression	# compresión de los bloques
+		self.sampling_rate = sampling_rate	# frecuencia de muestreo
+		self.metadata = {"layout": self.layout.describe(),	# encabezado
+			**(metadata or {})}																#  adicional
 
-	def create_csv_file(self, num_bodies):
-		"""Crea un archivo CSV con los datos recibidos."""
+	def create_filename(self, extension):
+		"""Ruta del archivo en Documents/datos_mlf con la fecha y hora actual."""
 		# Obtener la carpeta Documents del usuario
-		user_profile = os.getenv('USERPROFILE')  # Ej: C:\Users\Usuario
+		user_profile = os.getenv('USERPROFILE') or os.path.expanduser("~")
 		documents_folder = os.path.join(user_profile, "Documents")
 		# Definir la carpeta de datos dentro de Documents
 		data_folder = os.path.join(documents_folder, "datos_mlf")
 		os.makedirs(data_folder, exist_ok=True)  # Crear la carpeta si no existe
 
 		timestamp = datetime.now().strftime("%Y%m%d_%H%M%S" + self.name)
-		filename = os.path.join(				# Crear el nombre del archivo
-			data_folder, f"datos_{timestamp}.csv")
-		self.csv_file = open(filename, 'w', newline='')
+		return os.path.join(				# Crear el nombre del archivo
+			data_folder, f"datos_{timestamp}.{extension}")
+
+	def create_csv_file(self):
+		"""Crea un archivo CSV con los datos recibidos."""
+		self.csv_file = open(self.create_filename("csv"), 'w', newline='')
 		self.writer = csv.writer(self.csv_file)
-		headers = []
-		for body in range(num_bodies):
-			for sensor in range(10):
-				headers.append(f"b{body+1}_s{sensor}")
-		self.writer.writerow(headers)
+		self.writer.writerow(self.layout.names)	# b{cuerpo}_s{sensor}
 		self.header_written = True
 
-	def run(self):
-		while self.run_event.is_set():
-			try:
-				data = self.queue_save.get(timeout=0.5)
-				if not self.header_written:
-					num_bodies = len(data)
-					self.create_csv_file(num_bodies)
-				bodies = sorted(data.keys())
-				array_list = []
-				for body in bodies:
-					body_data = np.array(data[body], dtype=np.uint16)
-					array_list.append(body_data)
-				data_array = np.concatenate(array_list, axis=1)
-				csv_rows = data_array.tolist()
-				self.writer.writerows(csv_rows)
-				self.csv_file.flush()
-
-			except Exception as e:
-				print(f"Esperando datos para guardar... {e}")
+	def create_recording_file(self):
+		"""Crea una grabación binaria .mfl con su encabezado."""
+		self.writer = RecordingWriter(self.create_filename("mfl"),
+			self.layout.n_bodies, self.layout.n_sensors, self.sampling_rate,
+			compression=self.compression, metadata=self.metadata)
+		self.header_written = True
+
+	def write_block(self, data_array):
+		"""Escribe un bloque (n, canales) uint16 en el archivo abierto."""
+		if self.file_format == "csv":
+			self.writer.writerows(data_array.tolist())
+			self.csv_file.flush()
+		else:
+			first = self.ring.last_times()[:1]		# adquisición de la primera fila
+			timestamp = float(first[0]) if len(first) and np.isfinite(first[0]) \
+				else None													# sin tiempo: el actual
+			self.writer.write(data_array, timestamp)	# uint16 sin conversión
+			self.writer.flush()
+
+	def close_file(self):
+		"""Cierra el archivo abierto."""
+		if self.file_format == "csv" and self.csv_file is not None:
+			self.csv_file.close()
+		elif self.writer is not None:
+			self.writer.close()
+
+	def process(self, data_array):
+		"""Escribe un bloque (n, canales) uint16 del anillo, creando el archivo."""
+		if not self.header_written:
+			if self.file_format == "csv":
+				self.create_csv_file()
+			else:
+				self.create_recording_file()
+		self.write_block(data_array)
+
+	def teardown(self):
+		self.close_file()
+
+#%% ===========================================================================
+# Estadísticas en ventana móvil
+# =============================================================================
+class RollingStats:
+	def __init__(self, n_channels=30, window=20, recompute_every=None):
+		"""
+		Media, media cuadrática, varianza y máximo de las últimas `window`
+		muestras de cada canal con costo O(1) por muestra, sin importar el
+		largo de la ventana. Guarda las muestras en un anillo fijo, lleva sumas
+		acumuladas (desplazadas por una referencia para evitar cancelación) y
+		una cola monótona por canal para el máximo.
+		:param n_channels: Número de canales (sensores).
+		:param window: Largo de la ventana [muestras].
+		:param recompute_every: Muestras entre recálculos exactos de las sumas
+			(acota el error acumulado); por defecto una ventana.
+		"""
+		self.n_channels = n_channels							# Número de canales
+		self.recompute_every = recompute_every		# Recálculo de las sumas
+		self.window = 0														# Sin anillo todavía
+		self.resize(window)												# Crear el anillo vacío
+
+	def resize(self, window):
+		"""
+		Cambia el largo de la ventana conservando las últimas muestras.
+		:param window: Nuevo largo de la ventana [muestras].
+		"""
+		kept = self.values().copy() if self.window else None	# historia previa
+		self.window = int(window)															# largo de la ventana
+		self.buffer = np.zeros((self.window, self.n_channels))	# anillo fijo
+		self.shift = np.zeros(self.n_channels)								# referencia de las sumas
+		self.sum = np.zeros(self.n_channels)									# suma de (x - shift)
+		self.sumsq = np.zeros(self.n_channels)								# suma de (x - shift)²
+		self.max_queues = [deque() for _ in range(self.n_channels)]	# (muestra, valor)
+		self.t = 0																						# muestras recibidas
+		self.reset()
+		if kept is not None:
+			self.update(kept[-self.window:])
+
+	def reset(self):
+		"""Vacía la ventana."""
+		self.pos = 0								# próxima fila a escribir
+		self.count = 0							# muestras en la ventana
+		self.since_recompute = 0		# muestras desde el último recálculo
+		self.sum[:] = 0
+		self.sumsq[:] = 0
+		for q in self.max_queues:
+			q.clear()
+
+	def keep_last(self, k):
+		"""
+		Descarta todo menos las últimas k muestras de la ventana.
+		:param k: Muestras a conservar.
+		"""
+		kept = self.values()[self.count - min(k, self.count):].copy()
+		t = self.t - len(kept)					# índice de la primera conservada
+		self.reset()
+		self.t = t
+		self.update(kept)
+
+	def values(self):
+		"""Muestras de la ventana en orden cronológico (n, canales)."""
+		rows = (self.pos - self.count + np.arange(self.count)) % self.window
+		return self.buffer[rows]
+
+	def update(self, block):
+		"""
+		Añade una muestra (canales,) o un bloque (n, canales) a la ventana.
+		:param block: Muestras nuevas en orden cronológico.
+		"""
+		block = np.asarray(block, dtype=float)
+		if block.ndim == 1:												# una sola muestra
+			block = block[None, :]
+		if len(block) > self.window:							# solo cuentan las últimas
+			self.t += len(block) - self.window
+			block = block[-self.window:]
+		n = len(block)
+		if n == 0:
+			return
+		if self.count == 0:												# referencia: primera muestra
+			self.shift[:] = block[0]
+
+		# sumas: restar las muestras que salen y sumar las que entran
+		n_out = max(0, self.count + n - self.window)
+		if n_out:
+			old = self.buffer[(self.pos - self.count + np.arange(n_out))
+				% self.window] - self.shift
+			self.sum -= old.sum(axis=0)
+			self.sumsq -= (old * old).sum(axis=0)
+		new = block - self.shift
+		self.sum += new.sum(axis=0)
+		self.sumsq += (new * new).sum(axis=0)
+		self.buffer[(self.pos + np.arange(n)) % self.window] = block
+		self.pos = (self.pos + n) % self.window
+		self.count = min(self.count + n, self.window)
+
+		# colas monótonas decrecientes: el frente es el máximo de la ventana
+		first = self.t + n - self.count						# primera muestra vigente
+		for q, column in zip(self.max_queues, block.T.tolist()):
+			for i, v in enumerate(column, self.t):
+				while q and q[-1][1] <= v:						# ya no pueden ser máximo
+					q.pop()
+				q.append((i, v))
+			while q[0][0] < first:									# salieron de la ventana
+				q.popleft()
+		self.t += n
+
+		self.since_recompute += n
+		if self.since_recompute >= (self.recompute_every or self.window):
+			self._recompute()
+
+	def _recompute(self):
+		"""Recalcula las sumas desde el anillo para acotar el error numérico."""
+		data = self.values()
+		self.shift = data.mean(axis=0)						# nueva referencia
+		data -= self.shift
+		self.sum = data.sum(axis=0)
+		self.sumsq = (data * data).sum(axis=0)
+		self.since_recompute = 0
+
+	@property
+	def full(self):
+		"""True si la ventana está completa."""
+		return self.count >= self.window
+
+	@property
+	def last(self):
+		"""Última muestra recibida (canales,)."""
+		return self.buffer[(self.pos - 1) % self.window]
+
+	@property
+	def mean(self):
+		"""Media de cada canal."""
+		return self.shift + self.sum / max(self.count, 1)
+
+	@property
+	def var(self):
+		"""Varianza poblacional de cada canal (como np.var)."""
+		n = max(self.count, 1)
+		return np.maximum(self.sumsq / n - (self.sum / n) ** 2, 0)
+
+	@property
+	def std(self):
+		"""Desviación estándar de cada canal (como np.std)."""
+		return np.sqrt(self.var)
+
+	@property
+	def mean_square(self):
+		"""Media de los cuadrados de cada canal."""
+		n = max(self.count, 1)
+		return self.shift ** 2 + 2 * self.shift * self.sum / n + self.sumsq / n
+
+	@property
+	def rms(self):
+		"""Valor RMS de cada canal."""
+		return np.sqrt(np.maximum(self.mean_square, 0))
+
+	@property
+	def max(self):
+		"""Máximo de cada canal en la ventana."""
+		return np.array([q[0][1] if q else np.nan for q in self.max_queues])
 
 # =============================================================================
 # Proceso de Alarma de Datos
 # =============================================================================
-class DataAlarm(Process):
-	def __init__(self, queue_alarm, run_event, threshold, alarms, shared_alg):
+class DataAlarm(RingConsumer):
+	def __init__(self, queue_alarm, run_event, control,
+							notify_backends=("sonido",), notify_interval=1.0, layout=None):
 		"""
 		Proceso que detecta alarmas en los datos recibidos y emite un sonido.
-		:param queue_alarm: Cola de datos para procesar.
+		:param queue_alarm: SharedSampleRing con los datos filtrados a procesar.
 		:param run_event: Evento para iniciar o detener el proceso.
-		:param threshold: Umbral para detectar alarmas.
-		:param alarms: Diccionario de alarmas detectadas.
+		:param control: AlarmControl con umbral, detector y ventana (escritos
+			por la interfaz) y donde se publican las alarmas detectadas.
+		:param notify_backends: Salidas de notificación (ver notifier.BACKENDS).
+		:param notify_interval: Tiempo mínimo entre notificaciones [s].
+		:param layout: ToolLayout de la herramienta (número de sensores).
 		"""
-		super().__init__()						# inicializar la clase
+		# lotes de a lo sumo media ventana para que el máximo vea todas las filas
+		window = control.window				# largo de la ventana
+		super().__init__(queue_alarm, "alarm", run_event,
+			batch_rows=max(1, window // 2))
 		self.queue = queue_alarm			# cola de datos
-		self.run_event = run_event		# evento de ejecución
-		self.data = None							# datos
-		self.threshold = threshold		# umbral
-		self.alarms = alarms					# alarmas
-		self.shared_alg = shared_alg	# tipo de algoritmo
+		self.control = control				# bloque de control compartido
+		self.window = window					# largo de la ventana
+		self.layout = layout if layout is not None else DEFAULT_LAYOUT
+		n_channels = self.layout.n_channels		# sensores de la herramienta
+		self.stats = RollingStats(n_channels, window)	# estadísticas de la ventana
+		self.detectors = create_detectors(n_channels)	# detectores registrados
+		self.names = list(self.detectors)			# índice -> nombre del detector
+		self.counts = np.zeros(len(self.names), dtype=np.uint64)	# alarmas
+		self.notify_backends = notify_backends	# salidas de notificación
+		self.notify_interval = notify_interval	# intervalo entre notificaciones
 		
-	def run(self):
-		""" Método principal del proceso. """		
+	def setup(self):
 		print("Alarm process is run ", self.run_event.is_set())
-		# mientras el evento de ejecución esté activo
-		while self.run_event.is_set():	
-			current_threshold = self.threshold.value	# umbral actual
-			try:												# intentar
-				# Procesa todos los datos disponibles en la cola sin bloquear
-				while not self.queue.empty(): # mientras la cola no esté vacía
-					data = self.queue.get_nowait() # obtener los datos
-					try:										# intentar 	tamaño (30,1)
-						data_array = np.column_stack(	# concatenar los datos
-							[np.array(data[key]) for key in sorted(data.keys())])
-					except Exception as e:	# si hay un error 
-						print(f"Error al concatenar datos: {e}")
-						continue
-
-					# matriz de datos (30, x)
-					if self.data is None:	# si no hay datos
-						self.data = data_array # asignar los datos
-					else:			# si hay datos empezar a concatenar
-						self.data = np.vstack((self.data, data_array))
-
-					# 1. CONSTRUCCIÓN DE LA MUESTRA DE DATOS (30,20)
-					sample_size = 20 						# tamaño de la muestra
-					if len(self.data) > sample_size:		# si la muestra es mayor al tamaño
-						self.data = self.data[-sample_size:, :] # reducir la muestra
-
- 					# 2. PROCESAMIENTO DE LA MUESTRA SI ES SUFICIENTEMENTE GRANDE
-					if len(self.data) >= sample_size:    # Si se tiene el tamaño nesario de la muestra
-						# Convierte la muestra en un arreglo de NumPy para procesamiento
-						#print(f"Algoritmo usado es {self.shared_alg.algorithm}")
-						if self.shared_alg.algorithm == "Algoritmo RMS":
-							rms = np.sqrt(np.mean(self.data ** 2, axis=0))  # Calcula el RMS de cada sensor
-							ymax = np.max(self.data, axis=0)  # Encuentra los valores máximos de cada sensor
-
-							# Identifica alarmas si los valores máximos exceden el umbral RMS + threshold
-							eval_alarmas = ymax > (rms + current_threshold)	# evaluar las alarmas
-						else:
-							#print(f"Algoritmo usado es {self.shared_alg.algorithm}")
-							std = np.std(self.data, axis=0)  # Calcula la desviación estándar de cada sensor
-							mean = np.mean(self.data, axis=0) # Calcula la media de cada sensor
-							value = data_array.reshape(data_array.shape[1],)
-							eval_alarmas = value  > (mean + 6*std) # evaluar las alarmas  
-						alarms = eval_alarmas*1												# convertir a 0 y 1
-						alarms = alarms.reshape((len(alarms), 1))			# redimensionar
-						self.alarms.update({		# separar las alarmas por cuerpo
-								0: alarms[:10, :],	# actualizar las alarmas
-								1: alarms[10:20],	
-								2: alarms[20:]
-						})
-						# 3. ACCIÓN EN CASO DE ALARMA
-						if any(eval_alarmas):  # Si se detecta una alarma		
-							try:									# intentar 
-								frequency = 2000  # Frecuencia del sonido de alarma en Hz
-								duration = 800  # Duración del sonido en milisegundos
-								winsound.Beep(frequency, duration)  # Genera el sonido
-								# Reduce la muestra a la mitad para evitar alarmas repetitivas
-								self.data = self.data[-10:]	# reducir la muestra
-							except Exception as e:			# si hay un error
-								print(f"Error al emitir alarma sonora: {e}")
-
-			except Exception as e:		# si hay un error
-				print(f"Error en update_plot: {e}")	# si hay un error
+		self.notifier = Notifier(self.notify_backends, self.notify_interval)
+		self.notifier.start()						# notificaciones fuera de este ciclo
+
+	def teardown(self):
+		self.notifier.stop()						# detener las notificaciones
+
+	def process(self, data_array):
+		"""Actualiza la ventana, evalúa los detectores y notifica las alarmas."""
+		current_threshold = self.control.threshold	# umbral actual
+		data_array = np.asarray(data_array, dtype=float)	# bloque (n, canales)
+		if self.control.window != self.window:	# la interfaz cambió la ventana
+			self.window = self.control.window
+			self.stats.resize(self.window)					# conserva la historia
+			self.batch_rows = max(1, self.window // 2)
+
+		# huecos (NaN) de un puerto caído: se reemplazan por la media de la 
+		# ventana para no alterar las estadísticas y esos canales no dan alarma
+		gap = np.isnan(data_array)
+		if gap.any():
+			data_array = np.where(gap, self.stats.mean, data_array)
+
+		# 1. ACTUALIZAR LA VENTANA DE ANÁLISIS (O(1) por muestra)
+		self.stats.update(data_array)
+
+		# 2. TODOS LOS DETECTORES EN UNA PASADA SOBRE LA MISMA VENTANA
+		# (el algoritmo elegido se puede cambiar sin reiniciar)
+		results = {name: detector.update(data_array, self.stats,
+			current_threshold) for name, detector in self.detectors.items()}
+		if not self.stats.full:    # Si no se tiene el tamaño nesario de la muestra
+			return
+		self.counts += [results[name].any() for name in self.names]
+		algorithm = self.names[min(self.control.algorithm, len(self.names) - 1)]
+		eval_alarmas = results[algorithm] & ~gap.any(axis=0)	# sin los huecos
+
+		# publicar los bits de alarma (la interfaz redibuja si cambian)
+		self.control.publish(eval_alarmas, self.counts)
+		# 3. ACCIÓN EN CASO DE ALARMA
+		if any(eval_alarmas):  # Si se detecta una alarma		
+			# encolar la notificación sin detener la detección
+			self.notifier.notify(np.flatnonzero(eval_alarmas), algorithm)
+			# Reduce la muestra a la mitad para evitar alarmas repetitivas
+			self.stats.keep_last(self.window // 2)	# reducir la muestra
 
 #%% ===========================================================================
 #  real time low pass
 # =============================================================================
-class LowPassFilter:
-	def __init__(self, btype='lowpass', sf=300, f=[20], num_sensors=1):
-		"""Filtro pasa bajos de 3er orden."""
-		self.sf = sf					# Frecuencia de muestreo
-		self.f = f						# Frecuencias de corte
-		self.btype = btype		# Tipo de	filtro
-		self.num_sensors = num_sensors	# Número de sensores
-		self._create_filter()						# Crear el filtro
+class FilterBank:
+	def __init__(self, n_channels=30, order=3, f=[20], sf=300, btype='lowpass'):
+		"""
+		Banco de filtros Butterworth en secciones de segundo orden (sosfilt) con
+		estado independiente para cada canal. Filtra bloques (n, canales) y da
+		la misma salida si las muestras llegan de a una o en bloques.
+		:param n_channels: Número total de canales (sensores).
+		:param order: Orden del filtro.
+		:param f: Frecuencias de corte [Hz] (dos para pasa banda).
+		:param sf: Frecuencia de muestreo [Hz].
+		:param btype: Tipo de filtro ('lowpass', 'highpass', 'bandpass', ...).
+		"""
+		self.n_channels = n_channels	# Número de canales
+		self.order = order						# Orden del filtro
+		self.f = f										# Frecuencias de corte
+		self.sf = sf									# Frecuencia de muestreo
+		self.btype = btype						# Tipo de	filtro
+		self._create_filter()					# Crear el filtro
 
 	def _create_filter(self):
-		"""Crea el filtro Butterworth."""
-		# Normaliza las frecuencias de corte
-		Ns = self.sf * 0.5					# Frecuencia de Nyquist
-		Wn = np.array(self.f) / Ns	# Frecuencias de corte normalizadas	
-		# Coeficientes del filtro pasa bajos Butterworth de 3er orden
-		self.sb, self.sa = butter( #sb: numerador, sa: denominador
-																3, Wn=Wn, btype=self.btype)
-		
-		# Inicializa zi para todos los sensores (shape: [num_sensors, len(zi)])
-		# zi es un vector de condiciones iniciales para lfilter
-		zi_single = lfilter_zi(self.sb, self.sa)	
-		self.zi = np.tile(zi_single, (self.num_sensors, 1))  # [num_sensors, len(zi)]
-
-	def apply(self, samples):
-		"""Aplica el filtro a los datos de entrada."""
-		# Convierte la lista de muestras en un arreglo 2D
-		samples = np.asarray(samples).reshape(1, -1)  # [1, num_sensors]
-
-		# Aplica filtro vectorizado
-		y, self.zi = lfilter(			# Aplica el filtro lfiter= filtro lineal	
-				self.sb, self.sa, 		# Coeficientes del filtro
-				samples.T, 						# Transpone para que coincida con las dimensiones
-				axis=1,               # Procesa sensores a lo largo del eje 1
-				zi=self.zi         # Transpone para que coincida con las dimensiones
-		) # Devuelve la salida y y las nuevas condiciones iniciales zi
-		return y.flatten()        # Devuelve un arreglo 1D fitrad para n sensores 
+		"""Crea las secciones del filtro y reinicia el estado de los canales."""
+		Ns = self.sf * 0.5											# Frecuencia de Nyquist
+		Wn = np.atleast_1d(self.f) / Ns					# Frecuencias normalizadas
+		Wn = Wn[0] if Wn.size == 1 else Wn			# escalar para una sola corte
+		self.sos = butter(self.order, Wn, btype=self.btype, output='sos')
+		# Estado por canal con la forma que espera sosfilt en axis=0:
+		# [n_secciones, 2, n_canales]
+		self.zi = np.zeros((len(self.sos), 2, self.n_channels))
+		self.zi_unit = sosfilt_zi(self.sos)[:, :, None]	# régimen para entrada 1
+		self.started = np.zeros(self.n_channels, dtype=bool)	# canales iniciados
 
+	def describe(self):
+		"""Configuración del filtro (para el encabezado de las grabaciones)."""
+		return {"type": "butter", "order": self.order, "btype": self.btype,
+			"f": np.atleast_1d(self.f).tolist(), "sf": self.sf}
+
+	def reset(self, channels=slice(None)):
+		"""Olvida el estado de los canales (por defecto todos)."""
+		self.zi[:, :, channels] = 0
+		self.started[channels] = False
+
+	def apply(self, block, channels=slice(None)):
+		"""
+		Filtra un bloque de muestras y conserva el estado de cada canal.
+		:param block: Arreglo (n, canales) o una muestra (canales,).
+		:param channels: Slice de los canales del bloque (p. ej. un cuerpo).
+		:return: Bloque filtrado (n, canales) en float64.
+		"""
+		block = np.asarray(block, dtype=float)
+		if block.ndim == 1:												# una sola muestra
+			block = block[None, :]
+		if len(block) == 0:
+			return block
+		zi = self.zi[:, :, channels]							# vista del estado
+		new = ~self.started[channels]							# canales sin historia
+		if new.any():		# arrancar en régimen permanente con la primera muestra
+			zi[:, :, new] = self.zi_unit * block[0, new]
+			self.started[channels] = True
+		y, zi[...] = sosfilt(self.sos, block, axis=0, zi=zi)
+		return y
@@ -0,0 +1,435 @@
+#%% ===========================================================================
+# Importar librerías principales
+# =============================================================================
+import csv                      # Exportación a CSV
+import io                       # Lectura parcial de CSV
+import os                       # Tamaño de archivos
+import json                     # Encabezado autodescriptivo
+import struct                   # Encabezados binarios
+import time                     # Marcas de tiempo
+import zlib                     # Compresión opcional por bloque
+from datetime import datetime   # Fecha y hora de inicio
+import numpy as np              # Operaciones matemáticas
+
+#%% ===========================================================================
+# Formato de grabación binario (.mfl)
+# =============================================================================
+# Archivo = MAGIC + longitud del encabezado (uint32) + encabezado JSON,
+# rellenado a 16 bytes, seguido de bloques. Cada bloque tiene un encabezado
+# de 32 bytes y los datos uint16 little-endian (n, canales), crudos o zlib,
+# también rellenados a 16 bytes para que las vistas queden alineadas.
+MAGIC = b"MFLREC\x00\x01"              # Identificador del formato, versión 1
+CHUNK_TAG = b"CHNK"                    # Identificador de bloque
+# tag, filas, bytes de datos, códec, relleno, primera muestra, tiempo [s]
+CHUNK_HEADER = struct.Struct("<4sIIB3xQd")
+CODEC_RAW = 0                          # Datos sin comprimir
+CODEC_ZLIB = 1                         # Datos comprimidos con zlib
+ALIGN = 16                             # Alineación de los datos [bytes]
+DTYPE = np.dtype("<u2")                # Muestras uint16 little-endian
+GAP_CODE = 0xFFFF                      # Muestra perdida (fuera del ADC de 12 bits)
+# Tabla de bloques (también se guarda en el índice lateral <archivo>.idx)
+CHUNK_DTYPE = np.dtype([("offset", "i8"), ("n_rows", "i8"), ("length", "i8"),
+  ("codec", "u1"), ("first", "i8"), ("time", "f8")])
+
+def _padding(n):
+  """Bytes de relleno para llevar n a un múltiplo de ALIGN."""
+  return -n % ALIGN
+
+def index_path(path):
+  """Ruta del índice lateral de una grabación."""
+  return path + ".idx"
+
+def save_index(path, table, file_size):
+  """Guarda el índice lateral (tabla y tamaño del archivo indexado)."""
+  try:
+    with open(index_path(path), "wb") as f:
+      np.savez(f, table=table, file_size=np.int64(file_size))
+  except OSError as e:                      # p. ej. carpeta de solo lectura
+    print(f"No se pudo guardar el índice de {path}: {e}")
+
+def load_index(path):
+  """
+  Lee el índice lateral si existe.
+  :return: (tabla, tamaño del archivo indexado) o (None, 0).
+  """
+  try:
+    with np.load(index_path(path)) as f:
+      return f["table"], int(f["file_size"])
+  except (OSError, KeyError, ValueError):
+    return None, 0
+
+def channel_names(n_bodies, n_sensors=10):
+  """Nombres de columna b{cuerpo}_s{sensor}, como en los CSV."""
+  return [f"b{body+1}_s{sensor}" for body in range(n_bodies)
+          for sensor in range(n_sensors)]
+
+#%% ===========================================================================
+# Escritura
+# =============================================================================
+class RecordingWriter:
+  """Escribe bloques (n, canales) uint16 en un archivo .mfl."""
+  def __init__(self, path, n_bodies=3, n_sensors=10, sampling_rate=300,
+               compression=None, level=1, metadata=None):
+    """
+    Crea el archivo y escribe el encabezado.
+    :param path: Ruta del archivo.
+    :param n_bodies: Número de cuerpos de la herramienta.
+    :param n_sensors: Sensores por cuerpo.
+    :param sampling_rate: Frecuencia de muestreo [Hz].
+    :param compression: None o "zlib" (compresión por bloque).
+    :param level: Nivel de compresión zlib.
+    :param metadata: Diccionario adicional (p. ej. configuración del filtro).
+    """
+    self.path = path                          # ruta del archivo
+    self.n_channels = n_bodies * n_sensors    # columnas por muestra
+    self.sampling_rate = sampling_rate        # frecuencia de muestreo
+    self.codec = CODEC_ZLIB if compression == "zlib" else CODEC_RAW
+    self.level = level                        # nivel de compresión
+    self.n_samples = 0                        # muestras escritas
+    self.start_timestamp = time.time()        # inicio de la grabación
+    self.chunks = []                          # tabla de bloques escritos
+    self.header = {
+      "version": 1,
+      "dtype": DTYPE.str,
+      "n_bodies": n_bodies,
+      "n_sensors": n_sensors,
+      "columns": channel_names(n_bodies, n_sensors),
+      "sampling_rate": sampling_rate,
+      "start_time": datetime.fromtimestamp(self.start_timestamp).isoformat(),
+      "start_timestamp": self.start_timestamp,
+      "compression": compression,
+      **(metadata or {}),
+    }
+    text = json.dumps(self.header).encode("utf-8")
+    self.file = open(path, "wb")
+    self.file.write(MAGIC + struct.pack("<I", len(text)) + text)
+    self.file.write(b"\0" * _padding(len(MAGIC) + 4 + len(text)))
+
+  def write(self, block, timestamp=None):
+    """
+    Añade un bloque de muestras como un nuevo bloque del archivo.
+    :param block: Arreglo (n, canales) de códigos del ADC.
+    :param timestamp: Tiempo [s] de la primera fila; por defecto el actual.
+    """
+    data = np.ascontiguousarray(block, dtype=DTYPE)   # sin copia si ya es <u2
+    if data.ndim != 2 or data.shape[1] != self.n_channels:
+      raise ValueError(f"Se esperaban bloques (n, {self.n_channels}), "
+                       f"se recibió {data.shape}")
+    payload = memoryview(data).cast("B")              # bytes sin copia
+    if self.codec == CODEC_ZLIB:
+      payload = zlib.compress(payload, self.level)
+    timestamp = time.time() if timestamp is None else timestamp
+    self.file.write(CHUNK_HEADER.pack(CHUNK_TAG, len(data), len(payload),
+      self.codec, self.n_samples, timestamp))
+    self.chunks.append((self.file.tell(), len(data), len(payload),
+      self.codec, self.n_samples, timestamp))
+    self.file.write(payload)
+    self.file.write(b"\0" * _padding(len(payload)))
+    self.n_samples += len(data)
+
+  def flush(self):
+    """Envía al disco lo escrito hasta ahora."""
+    self.file.flush()
+
+  def close(self):
+    """Cierra el archivo y guarda su índice lateral."""
+    size = self.file.tell()
+    self.file.close()
+    save_index(self.path, np.array(self.chunks, dtype=CHUNK_DTYPE), size)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+#%% ===========================================================================
+# Lectura
+# =============================================================================
+class _IntervalReader:
+  """
+  Acceso por intervalo de tiempo común a las grabaciones .mfl y CSV. Las
+  subclases definen header, n_channels, sampling_rate, __len__ y read_rows
+  y, si la grabación guarda tiempos por bloque, chunk_times.
+  """
+  def columns(self, sensors=None):
+    """
+    Índices de columna de una selección de sensores.
+    :param sensors: None (todos), slice, (inicio, fin) inclusivo, lista de
+      índices o de nombres ('b2_s3').
+    """
+    names = self.header["columns"]
+    if sensors is None:
+      return slice(None)
+    if isinstance(sensors, slice):
+      return sensors
+    if isinstance(sensors, tuple):                # rango X..Y inclusivo
+      first, last = (names.index(x) if isinstance(x, str) else x
+                     for x in sensors)
+      return slice(first, last + 1)
+    return [names.index(x) if isinstance(x, str) else x for x in sensors]
+
+  def chunk_times(self):
+    """
+    Primera muestra y tiempo [s desde el primer bloque] de cada bloque, o
+    None si no hay tiempos por bloque (el tiempo se obtiene entonces solo 
+    del índice de la muestra).
+    """
+    return None
+
+  def sample_at(self, t, rounding=np.floor):
+    """
+    Muestra que corresponde al tiempo t [s]. Con tiempos por bloque, las
+    pausas de la grabación (entre bloques) se respetan.
+    :param rounding: np.floor para el inicio de un intervalo, np.ceil para
+      el final.
+    """
+    times = self.chunk_times()
+    if times is None:
+      return int(np.clip(rounding(t * self.sampling_rate), 0, len(self)))
+    first, start = times
+    i = max(int(np.searchsorted(start, t, "right")) - 1, 0)   # bloque de t
+    k = rounding((t - start[i]) * self.sampling_rate)         # fila en el bloque
+    end = first[i + 1] if i + 1 < len(first) else len(self)   # fin del bloque
+    return int(first[i] + np.clip(k, 0, end - first[i]))
+
+  def row_times(self, s0, s1):
+    """Tiempo [s] de las muestras s0..s1-1 (ver chunk_times)."""
+    samples = np.arange(s0, s1)
+    times = self.chunk_times()
+    if times is None:
+      return samples / self.sampling_rate
+    first, start = times
+    i = np.searchsorted(first, samples, "right") - 1          # bloque de cada fila
+    return start[i] + (samples - first[i]) / self.sampling_rate
+
+  def samples(self, t0=None, t1=None):
+    """Intervalo de muestras [s0, s1) que cubre los tiempos t0..t1 [s]."""
+    s0 = 0 if t0 is None else self.sample_at(t0, np.floor)
+    s1 = len(self) if t1 is None else max(self.sample_at(t1, np.ceil), s0)
+    return s0, s1
+
+  def load(self, t0=None, t1=None, sensors=None):
+    """
+    Lee los sensores pedidos entre t0 y t1 [s desde el inicio].
+    :param t0: Tiempo inicial [s]; None desde el inicio.
+    :param t1: Tiempo final [s]; None hasta el final.
+    :param sensors: Selección de sensores (ver columns).
+    :return: (tiempos (n,), datos (n, sensores)).
+    """
+    s0, s1 = self.samples(t0, t1)
+    return self.row_times(s0, s1), self.read_rows(s0, s1, sensors)
+
+class RecordingReader(_IntervalReader):
+  """Lee un archivo .mfl mapeado en memoria."""
+  def __init__(self, path):
+    """
+    Mapea el archivo, lee el encabezado y obtiene la tabla de bloques del
+    índice lateral; si no existe o está desactualizado, recorre solo los
+    encabezados de bloque que falten (sin leer los datos) y lo actualiza.
+    :param path: Ruta del archivo.
+    """
+    self.path = path
+    self.mm = np.memmap(path, dtype=np.uint8, mode="r")   # archivo completo
+    if bytes(self.mm[:len(MAGIC)]) != MAGIC:
+      raise ValueError(f"{path} no es una grabación MFL")
+    size, = struct.unpack("<I", bytes(self.mm[len(MAGIC):len(MAGIC) + 4]))
+    start = len(MAGIC) + 4
+    self.header = json.loads(bytes(self.mm[start:start + size]))
+    self.n_channels = len(self.header["columns"])     # columnas por muestra
+    self.sampling_rate = self.header["sampling_rate"] # frecuencia de muestreo
+    self.data_offset = start + size + _padding(start + size)
+    self._scan_chunks()
+
+  def _scan_chunks(self):
+    """Construye la tabla (offset, filas, bytes, códec, muestra, tiempo)."""
+    table, size = load_index(self.path)
+    if table is not None and size == len(self.mm):    # índice vigente
+      self.chunks = table
+      return
+    if table is None or size > len(self.mm):          # índice inválido
+      table = np.empty(0, CHUNK_DTYPE)
+    rows = []
+    offset = self.data_offset                         # continuar tras el índice
+    if len(table):
+      offset = int(table["offset"][-1] + table["length"][-1])
+      offset += _padding(int(table["length"][-1]))
+    end = len(self.mm)
+    while offset + CHUNK_HEADER.size <= end:
+      tag, n, length, codec, first, stamp = CHUNK_HEADER.unpack(
+        bytes(self.mm[offset:offset + CHUNK_HEADER.size]))
+      data_start = offset + CHUNK_HEADER.size
+      if tag != CHUNK_TAG or data_start + length > end:
+        break                                   # bloque incompleto al final
+      rows.append((data_start, n, length, codec, first, stamp))
+      offset = data_start + length + _padding(length)
+    self.chunks = np.concatenate([table, np.array(rows, dtype=CHUNK_DTYPE)])
+    if offset == end:                           # archivo completo: indexar
+      save_index(self.path, self.chunks, end)
+
+  def __len__(self):
+    """Número total de muestras."""
+    return int(self.chunks["n_rows"].sum())
+
+  def chunk(self, i):
+    """
+    Datos del bloque i como arreglo (n, canales). Los bloques sin comprimir
+    son vistas del archivo mapeado; los comprimidos se descomprimen.
+    """
+    offset, n, length, codec, _, _ = self.chunks[i].tolist()
+    raw = self.mm[offset:offset + length]
+    if codec == CODEC_ZLIB:
+      raw = np.frombuffer(zlib.decompress(raw), dtype=np.uint8)
+    return raw.view(DTYPE).reshape(n, self.n_channels)
+
+  def __iter__(self):
+    """Recorre los bloques en orden."""
+    for i in range(len(self.chunks)):
+      yield self.chunk(i)
+
+  def read(self):
+    """Todas las muestras (n, canales); vista si hay un solo bloque crudo."""
+    if len(self.chunks) == 1:
+      return self.chunk(0)
+    if len(self.chunks) == 0:
+      return np.empty((0, self.n_channels), DTYPE)
+    return np.concatenate(list(self))
+
+  def chunk_times(self):
+    """
+    Primera muestra y tiempo [s desde el primer bloque] de cada bloque, o
+    None si los bloques no tienen tiempos válidos (el tiempo se obtiene
+    entonces solo del índice de la muestra).
+    """
+    times = self.chunks["time"]
+    if len(times) == 0 or not np.isfinite(times).all() or (times <= 0).any():
+      return None
+    return self.chunks["first"], times - times[0]
+
+  def read_rows(self, s0, s1, sensors=None):
+    """
+    Copia las muestras s0..s1-1 de los sensores pedidos tocando solo los
+    bloques (y, en bloques crudos, las páginas) que cubren el intervalo.
+    :param s0: Primera muestra.
+    :param s1: Muestra final (excluida).
+    :param sensors: Selección de sensores (ver columns).
+    :return: Arreglo (s1 - s0, sensores) uint16.
+    """
+    cols = self.columns(sensors)
+    out = np.empty((s1 - s0, len(np.arange(self.n_channels)[cols])), DTYPE)
+    first = self.chunks["first"]
+    start = max(int(np.searchsorted(first, s0, "right")) - 1, 0)
+    stop = int(np.searchsorted(first, s1, "left"))
+    for i in range(start, stop):                  # bloques del intervalo
+      a = max(s0, int(first[i]))                  # filas del bloque a copiar
+      b = min(s1, int(first[i] + self.chunks["n_rows"][i]))
+      if b > a:
+        block = self.chunk(i)
+        out[a - s0:b - s0] = block[a - int(first[i]):b - int(first[i]), cols]
+    return out
+
+  def close(self):
+    """Suelta el mapeo; se libera cuando no quedan vistas del archivo."""
+    self.mm = None
+
+#%% ===========================================================================
+# Lectura de grabaciones CSV antiguas
+# =============================================================================
+class CsvRecordingReader(_IntervalReader):
+  """Acceso por intervalo de tiempo a los CSV que generaba DataSaver."""
+  def __init__(self, path, sampling_rate=300, step=1000):
+    """
+    Abre el CSV y obtiene (o construye con una sola pasada) un índice lateral
+    disperso con la posición en bytes de cada step filas. El archivo queda
+    abierto con un cursor, de modo que las lecturas consecutivas (p. ej. la
+    reproducción) continúan donde terminó la anterior.
+    :param path: Ruta del CSV.
+    :param sampling_rate: Frecuencia de muestreo [Hz].
+    :param step: Filas entre entradas del índice.
+    """
+    self.path = path
+    self.sampling_rate = sampling_rate
+    self.step = step
+    with open(path, "rb") as f:
+      self.header = {"columns": f.readline().decode().strip().split(","),
+                     "sampling_rate": sampling_rate}
+      self.data_offset = f.tell()                 # primera fila de datos
+    self.n_channels = len(self.header["columns"])
+    table, size = load_index(path)
+    if table is None or size != os.path.getsize(path):
+      table = self._build_index()
+      save_index(path, table, os.path.getsize(path))
+    self.offsets = table["offset"]                # byte de cada step filas
+    self.n_rows = int(table["n_rows"].sum())
+    self.file = open(path, "rb")                  # lecturas por intervalo
+    self.cursor = (0, self.data_offset)           # (fila, byte) siguiente
+
+  def _build_index(self):
+    """Recorre el archivo una vez y anota el byte de cada step filas."""
+    rows = []
+    with open(self.path, "rb") as f:
+      f.seek(self.data_offset)
+      offset, n = f.tell(), 0
+      for line in f:
+        if n % self.step == 0:
+          rows.append([offset, 0, 0, 0, n, 0.0])
+        rows[-1][1] += 1                          # filas de la entrada
+        offset += len(line)
+        n += 1
+    return np.array([tuple(r) for r in rows], dtype=CHUNK_DTYPE)
+
+  def __len__(self):
+    """Número total de muestras."""
+    return self.n_rows
+
+  def read_rows(self, s0, s1, sensors=None):
+    """
+    Igual que RecordingReader.read_rows, leyendo solo las líneas necesarias:
+    si s0 es la fila del cursor se continúa desde ahí; si no, se salta a la
+    entrada del índice previa a s0.
+    """
+    cols = np.arange(self.n_channels)[self.columns(sensors)]
+    if s1 <= s0:
+      return np.empty((0, len(cols)), DTYPE)
+    row, offset = self.cursor
+    if row != s0:                                 # acceso no secuencial
+      row = s0 // self.step * self.step           # entrada previa a s0
+      offset = int(self.offsets[s0 // self.step])
+    self.file.seek(offset)
+    for _ in range(s0 - row):                     # líneas antes de s0
+      self.file.readline()
+    lines = [self.file.readline() for _ in range(s1 - s0)]
+    self.cursor = (s1, self.file.tell())
+    text = b"".join(lines).decode()
+    return np.loadtxt(io.StringIO(text), delimiter=",", dtype=DTYPE,
+                      usecols=cols.tolist(), ndmin=2)
+
+  def close(self):
+    """Cierra el archivo."""
+    self.file.close()
+
+def open_recording(path, **kwargs):
+  """Abre una grabación .mfl o un CSV antiguo para lectura por intervalos."""
+  if path.lower().endswith(".csv"):
+    return CsvRecordingReader(path, **kwargs)
+  return RecordingReader(path)
+
+#%% ===========================================================================
+# Exportación a CSV
+# =============================================================================
+def export_csv(path, csv_path=None):
+  """
+  Convierte una grabación .mfl al CSV que generaba DataSaver.
+  :param path: Ruta de la grabación.
+  :param csv_path: Ruta del CSV; por defecto la misma con extensión .csv.
+  :return: Ruta del CSV creado.
+  """
+  csv_path = csv_path or path.rsplit(".", 1)[0] + ".csv"
+  reader = RecordingReader(path)
+  with open(csv_path, "w", newline="") as f:
+    writer = csv.writer(f)
+    writer.writerow(reader.header["columns"])
+    for block in reader:                        # un bloque a la vez
+      writer.writerows(block.tolist())
+  reader.close()
+  return csv_path
@@ -0,0 +1,8 @@
+#%% ===========================================================================
+# Configuración de las pruebas
+# =============================================================================
+import os                       # Rutas
+import sys                      # Ruta de importación
+
+# los módulos de la interfaz están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,16 @@
+#%% ===========================================================================
+# Interfaz y registro de los detectores
+# =============================================================================
+import pytest
+from detectors import Detector, DETECTORS, create_detectors
+
+def test_detector_without_update_cannot_be_created():
+  class Incomplete(Detector):
+    name = "Incompleto"
+  with pytest.raises(TypeError, match="update"):
+    Incomplete(4)
+
+def test_registered_detectors_are_complete():
+  detectors = create_detectors(4)                 # ninguno es abstracto
+  assert list(detectors) == list(DETECTORS)
+  assert all(isinstance(d, Detector) for d in detectors.values())
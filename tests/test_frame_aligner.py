@@ -0,0 +1,78 @@
+#%% ===========================================================================
+# Alineación de las tramas de los cuerpos en la grilla de tiempo común
+# =============================================================================
+import numpy as np
+from multiprocessing import Event
+from objects import FrameAligner, DataAdquisition
+
+def readings(rate, duration, start=0.0, block=10, seed=0):
+  """
+  Lecturas (tramas, t_recv) de un cuerpo con reloj de rate Hz: un bloque
+  cada block tramas, recibido con un retardo aleatorio de hasta 5 ms.
+  """
+  rng = np.random.default_rng(seed)
+  for k in range(int(duration * rate) // block):
+    t_recv = start + (k + 1) * block / rate + rng.uniform(0, 0.005)
+    yield block, t_recv
+
+def shifts(aligner, body, stream):
+  """Desplazamientos que devuelve el alineador para cada lectura."""
+  result = []
+  for n, t_recv in stream:
+    shift = aligner.align(body, n, t_recv)
+    aligner.advance(body, n + shift)              # casillas escritas
+    result.append(shift)
+  return np.array(result)
+
+def test_late_start_is_an_outage():
+  aligner = FrameAligner(n_bodies=2)
+  shifts(aligner, 0, readings(300, 2.0))
+  late = shifts(aligner, 1, readings(300, 1.5, start=0.5, seed=1))
+  assert aligner.is_outage(late[0])               # medio segundo: huecos
+  assert abs(late[0] - 150) <= aligner.tolerance
+  assert (late[1:] == 0).all()
+
+def test_lost_frames_are_padded():
+  aligner = FrameAligner(n_bodies=1)
+  stream = list(readings(300, 4.0))
+  # se pierden 30 tramas (0.1 s) a los 2 s: el tiempo avanza sin tramas
+  stream = stream[:60] + stream[63:]
+  result = shifts(aligner, 0, stream)
+  assert abs(result.sum() - 30) <= aligner.tolerance  # retardo aleatorio
+  assert aligner.dropped[0] == result.sum()       # un corte, sin deriva
+  assert (result >= 0).all()
+
+def test_duplicated_frames_are_discarded():
+  aligner = FrameAligner(n_bodies=1)
+  stream = list(readings(300, 3.0))
+  # 5 tramas repetidas llegan junto a un bloque: sobran 5 casillas
+  stream[40] = (15, stream[40][1])
+  result = shifts(aligner, 0, stream)
+  assert result.sum() == -5 and aligner.duplicated[0] == 5
+  assert aligner.dropped[0] == 0
+
+def test_clock_drift_never_pads_nor_resets_filters(monkeypatch):
+  acquisition = DataAdquisition(None, None, None, Event())
+  acquisition.bodies = [0, 1, 2]
+  acquisition.create_publish_buffers()
+  acquisition.warmup_frames = 0
+  resets, pads = [], []
+  monkeypatch.setattr(acquisition.filters, "reset",
+                      lambda *args, **kwargs: resets.append(args))
+  monkeypatch.setattr(acquisition, "pad_body",
+                      lambda body, n: pads.append((body, n)))
+  # cuerpos a 299.7, 300 y 300.3 Hz (±0.1 %) durante un minuto
+  streams = [list(readings(rate, 60.0, seed=body))
+             for body, rate in enumerate((299.7, 300.0, 300.3))]
+  events = sorted((t_recv, body, n) for body, stream in enumerate(streams)
+                  for n, t_recv in stream)
+  values = np.full((10, 10), 2000, np.uint16)
+  for t_recv, body, n in events:
+    acquisition.merge_frames(values[:n], np.full(n, body), t_recv)
+    acquisition.buffer_acquisition.publish(None)  # sin guardado: solo avanza
+  assert not pads and not resets
+  buffer = acquisition.buffer_acquisition
+  assert not buffer.overflow.any()
+  assert acquisition.aligner.repeated[0] > 0      # lento: repite muestras
+  assert acquisition.aligner.duplicated[2] > 0    # rápido: descarta
+  assert np.ptp(buffer.counts) <= 2 * acquisition.aligner.tolerance + 10
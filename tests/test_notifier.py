@@ -0,0 +1,42 @@
+#%% ===========================================================================
+# Salida por socket del hilo de notificación
+# =============================================================================
+import json                     # Mensajes recibidos
+import socket                   # Receptor UDP
+import pytest                   # Limpieza del receptor
+from notifier import Notifier
+
+@pytest.fixture
+def receiver():
+  """Socket UDP local que recibe las notificaciones."""
+  sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+  sock.bind(("127.0.0.1", 0))
+  sock.settimeout(2.0)
+  yield sock
+  sock.close()
+
+def receive(sock):
+  """Siguiente notificación recibida como diccionario."""
+  return json.loads(sock.recv(65536).decode("utf-8"))
+
+def test_socket_backend_coalesces_and_limits_rate(receiver):
+  notifier = Notifier(("socket",), min_interval=0.3,
+                      options={"socket": {"address": receiver.getsockname()}})
+  # alarmas encoladas antes de iniciar el hilo: se emiten como una sola
+  notifier.notify([1, 2], "Algoritmo RMS", timestamp=100.0)
+  notifier.notify([2, 5], "Algoritmo RMS", timestamp=100.1)
+  notifier.notify([7], "Algoritmo STD", timestamp=100.2)
+  notifier.start()
+  try:
+    first = receive(receiver)
+    notifier.notify([3], "Algoritmo STD")         # dentro del intervalo
+    second = receive(receiver)
+  finally:
+    notifier.stop()
+  assert first["count"] == 3
+  assert first["channels"] == [1, 2, 5, 7]
+  assert first["time"] == 100.0                   # primera detección
+  assert first["detector"] == "Algoritmo STD"     # la más reciente
+  assert second["count"] == 1 and second["channels"] == [3]
+  assert second["sent"] - first["sent"] >= 0.3    # intervalo mínimo
+  assert notifier.sent == 2 and notifier.dropped == 0
@@ -0,0 +1,49 @@
+#%% ===========================================================================
+# Lectores de puerto sobre 'loop://'
+# =============================================================================
+import struct                                 # Tramas de prueba
+import time                                   # Plazo de lectura
+from multiprocessing import Event             # Señal de paro
+import numpy as np                            # Comparación de arreglos
+import pytest                                 # Parametrización
+import serial                                 # URLs de pyserial
+from layout import DEFAULT_LAYOUT, END_MARK   # Formato de la trama
+from objects import DataAdquisition, ReceiveRing
+
+def frame(values, body):
+  """Trama binaria con las lecturas de un cuerpo (desde 0)."""
+  return struct.pack(DEFAULT_LAYOUT.frame_format, *values, b"a", b"b",
+                     str(body).encode()) + END_MARK
+
+def collect(acquisition, n, timeout=2.0):
+  """Reúne los bloques de collect_frames() hasta tener n tramas."""
+  blocks, total = [], 0
+  deadline = time.monotonic() + timeout
+  while total < n and time.monotonic() < deadline:
+    for values, bodies, t_recv in acquisition.collect_frames():
+      blocks.append((values, bodies))
+      total += len(bodies)
+  return blocks
+
+@pytest.mark.parametrize("concurrent", [True, False])
+def test_collect_frames_on_loop(concurrent):
+  acquisition = DataAdquisition(None, None, None, Event(), port_cache=None,
+                                concurrent_readers=concurrent)
+  comm = serial.serial_for_url("loop://", timeout=0.1)
+  acquisition.ports = ["loop://"]
+  acquisition.serial_connections = [comm]
+  acquisition.buffers = [ReceiveRing(4096, DEFAULT_LAYOUT)]
+  acquisition.bodies = [1]
+  acquisition.start_port_readers()
+  try:
+    sent = np.arange(50, dtype=np.uint16).reshape(5, 10) * 7
+    comm.write(b"".join(frame(row, 1) for row in sent))
+    blocks = collect(acquisition, len(sent))
+  finally:
+    acquisition.stop_port_readers()
+    acquisition.close_serial_ports()
+  values = np.concatenate([values for values, _ in blocks])
+  bodies = np.concatenate([bodies for _, bodies in blocks])
+  np.testing.assert_array_equal(values, sent)
+  assert (bodies == 1).all()
+  assert acquisition.serial_connections == []
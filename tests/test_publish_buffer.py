@@ -0,0 +1,38 @@
+#%% ===========================================================================
+# Buffer de publicación: alineación de los cuerpos
+# =============================================================================
+import numpy as np
+from objects import PublishBuffer
+
+class RingStub:
+  """Anillo que solo acumula copias de las filas publicadas."""
+  def __init__(self):
+    self.rows = []
+
+  def put(self, block, times=None):
+    self.rows.append(np.array(block))
+
+def rows(body, start, n, n_sensors=2):
+  """Filas del cuerpo cuyo valor es el índice absoluto de la fila."""
+  return np.repeat(np.arange(start, start + n, dtype=float)[:, None],
+                   n_sensors, axis=1) + 1000 * body
+
+def test_overflow_keeps_bodies_aligned():
+  buffer = PublishBuffer(10, n_bodies=2, n_sensors=2, capacity=40,
+                         fill=np.nan)
+  ring = RingStub()
+  buffer.append(0, rows(0, 0, 60))                # 20 filas no caben
+  assert buffer.overflow.tolist() == [20, 0]
+  assert buffer.counts[0] == 60                   # sigue en su casilla
+  for start in range(0, 100, 10):                 # el cuerpo 1 se pone al día
+    buffer.append(1, rows(1, start, 10))
+    if start >= 60:
+      buffer.append(0, rows(0, start, 10))
+    buffer.publish(ring)
+  data = np.concatenate(ring.rows)
+  assert len(data) == 100
+  index = np.arange(100, dtype=float)
+  np.testing.assert_array_equal(data[:, 2], index + 1000)
+  lost = (index >= 40) & (index < 60)             # filas descartadas: hueco
+  assert np.isnan(data[lost, 0]).all()
+  np.testing.assert_array_equal(data[~lost, 0], index[~lost])
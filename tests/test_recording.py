@@ -0,0 +1,62 @@
+#%% ===========================================================================
+# Grabaciones .mfl: escritura, lectura por intervalos y conversión
+# =============================================================================
+import numpy as np
+import pytest
+from multiprocessing import Event
+from recording import RecordingWriter, RecordingReader, GAP_CODE
+from objects import SensorConverter, DataAdquisition, load_recording
+
+@pytest.fixture(params=[None, "zlib"])
+def paused_recording(request, tmp_path):
+  """
+  Grabación de 3 bloques de 1 s a 300 Hz; el tercero empieza tras una 
+  pausa de 3 s. Cada código es 10 * fila + columna.
+  """
+  path = str(tmp_path / "pausa.mfl")
+  data = (np.arange(900)[:, None] * 10 + np.arange(6)).astype(np.uint16)
+  with RecordingWriter(path, n_bodies=3, n_sensors=2,
+                       compression=request.param) as writer:
+    for block, start in zip(np.split(data, 3), (1000.0, 1001.0, 1005.0)):
+      writer.write(block, timestamp=start)
+  return path, data
+
+def test_round_trip_and_time_ranges(paused_recording):
+  path, data = paused_recording
+  reader = RecordingReader(path)
+  times, rows = reader.load()                     # todo
+  np.testing.assert_array_equal(rows, data)
+  np.testing.assert_allclose(times[[0, 299, 300, 599, 600]],
+    [0.0, 299 / 300, 1.0, 1 + 299 / 300, 5.0])
+  # intervalo que cruza dos bloques continuos, sensores por nombre
+  times, rows = reader.load(0.5, 1.5, sensors=("b1_s1", "b2_s1"))
+  np.testing.assert_array_equal(rows, data[150:450, 1:4])
+  np.testing.assert_allclose(times, np.arange(150, 450) / 300)
+  # dentro de la pausa no hay muestras; al cruzarla se salta al bloque 3
+  assert len(reader.load(3.0, 4.5)[1]) == 0
+  times, rows = reader.load(4.0, 5.5, sensors=[0, 5])
+  np.testing.assert_array_equal(rows, data[600:750][:, [0, 5]])
+  np.testing.assert_allclose(times, 5.0 + np.arange(150) / 300)
+  reader.close()
+
+def test_load_recording_converts_codes_and_masks_gaps(tmp_path):
+  path = str(tmp_path / "gaps.mfl")
+  codes = np.arange(60, dtype=np.uint16).reshape(-1, 6) * 50
+  codes[3:5, 2:4] = GAP_CODE                      # cuerpo 2 caído dos filas
+  with RecordingWriter(path, n_bodies=3, n_sensors=2) as writer:
+    writer.write(codes, timestamp=1000.0)
+  converter = SensorConverter(6, gain=np.arange(1, 7))
+  times, field = load_recording(path, sensors=[1, 2, 3], converter=converter)
+  expected = converter.convert(codes[:, 1:4].astype(float), slice(1, 4))
+  gap = codes[:, 1:4] == GAP_CODE
+  assert len(times) == len(codes)
+  assert np.isnan(field[gap]).all()
+  np.testing.assert_allclose(field[~gap], expected[~gap])
+
+def test_replay_rejects_recording_of_another_tool(tmp_path):
+  path = str(tmp_path / "6x16.mfl")
+  with RecordingWriter(path, n_bodies=6, n_sensors=16) as writer:
+    writer.write(np.zeros((30, 96), np.uint16), timestamp=1000.0)
+  acquisition = DataAdquisition(None, None, None, Event(), replay_path=path)
+  with pytest.raises(ValueError, match="6x16"):   # layout por defecto 3x10
+    acquisition.replay_data_acquisition()
@@ -0,0 +1,32 @@
+#%% ===========================================================================
+# Base de los procesos que consumen un anillo compartido
+# =============================================================================
+import numpy as np
+import pytest
+from multiprocessing import Event
+from objects import RingConsumer, SharedSampleRing
+
+@pytest.fixture
+def ring():
+  ring = SharedSampleRing(2, 16, np.float32)
+  yield ring
+  ring.close()
+
+def test_subclass_without_process_cannot_be_created(ring):
+  class Incomplete(RingConsumer):
+    def setup(self):
+      pass
+  with pytest.raises(TypeError, match="process"):
+    Incomplete(ring, "default", Event())
+
+def test_subclass_with_process_drains_in_place(ring):
+  class Collector(RingConsumer):
+    def process(self, block):
+      self.rows.append(np.array(block))
+  collector = Collector(ring, "default", Event(), batch_rows=3)
+  collector.rows = []
+  ring.put(np.arange(14, dtype=np.float32).reshape(7, 2))
+  collector.drain()                               # sin iniciar el proceso
+  assert [len(rows) for rows in collector.rows] == [3, 3, 1]
+  np.testing.assert_array_equal(np.concatenate(collector.rows).ravel(),
+                                np.arange(14))
@@ -0,0 +1,65 @@
+#%% ===========================================================================
+# Estadísticas de ventana móvil contra el cálculo directo
+# =============================================================================
+import numpy as np
+import pytest
+from objects import RollingStats
+
+def check(stats, history):
+  """Compara las estadísticas con las últimas `window` filas de history."""
+  window = history[-stats.window:]
+  np.testing.assert_array_equal(stats.values(), window)
+  np.testing.assert_allclose(stats.mean, window.mean(axis=0), rtol=1e-9)
+  np.testing.assert_allclose(stats.std, window.std(axis=0), rtol=1e-6,
+                             atol=1e-9)
+  np.testing.assert_allclose(stats.rms, np.sqrt((window ** 2).mean(axis=0)),
+                             rtol=1e-9)
+  np.testing.assert_array_equal(stats.max, window.max(axis=0))
+
+@pytest.mark.parametrize("recompute_every", [None, 7])
+def test_block_updates_match_brute_force(recompute_every):
+  rng = np.random.default_rng(0)
+  stats = RollingStats(n_channels=3, window=20,
+                       recompute_every=recompute_every)
+  # media grande para poner a prueba la cancelación de las sumas
+  history = np.empty((0, 3))
+  for n in [1, 5, 19, 20, 3, 45, 1, 1, 60, 7, 13]:  # incluye bloques > ventana
+    block = 4000 + rng.normal(0, 50, (n, 3))
+    stats.update(block)
+    history = np.concatenate((history, block))
+    check(stats, history)
+
+def test_single_samples_and_partial_window():
+  stats = RollingStats(n_channels=2, window=10)
+  history = np.array([[3.0, -1.0], [1.0, 4.0], [2.0, 2.0]])
+  for row in history:                             # muestras (canales,)
+    stats.update(row)
+  assert not stats.full
+  check(stats, history)
+
+def test_keep_last_then_update():
+  rng = np.random.default_rng(1)
+  stats = RollingStats(n_channels=2, window=16)
+  history = rng.normal(size=(40, 2))
+  stats.update(history)
+  stats.keep_last(8)                              # conserva media ventana
+  history = history[-8:]
+  check(stats, history)
+  for n in [3, 9, 30]:
+    block = rng.normal(size=(n, 2))
+    stats.update(block)
+    history = np.concatenate((history, block))
+    check(stats, history)
+
+@pytest.mark.parametrize("window", [8, 40])
+def test_resize_keeps_history(window):
+  rng = np.random.default_rng(2)
+  stats = RollingStats(n_channels=2, window=20)
+  history = rng.normal(size=(50, 2))
+  stats.update(history)
+  stats.resize(window)                            # más corta o más larga
+  check(stats, history[-min(window, 20):])        # solo había 20 guardadas
+  block = rng.normal(size=(25, 2))
+  stats.update(block)
+  history = np.concatenate((history[-min(window, 20):], block))
+  check(stats, history)